@@ -1,28 +1,169 @@
-aimport tkinter as tk
+import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
 import re
+import sys
+import ctypes
+import ctypes.util
+import struct
+import json
+import gzip
+import time
+import heapq
+import math
+import bisect
+import array
+import mmap
+import ast
+import textwrap
+import base64
+import zlib
+import collections
+import contextlib
+import concurrent.futures
+import multiprocessing
+import queue
 import keyword
 import builtins
+import logging
+import threading
+import tracemalloc
+import importlib.util
 from datetime import datetime
 
 # ══════════════════════════════════════════════════════════════════════════════
 # CAT'S CURSOR 2.0 - AI-POWERED NOTEPAD++ (NO EXTERNAL LLMS - LOCAL AI AGENTS)
 # ══════════════════════════════════════════════════════════════════════════════
 
+log = logging.getLogger("cats_cursor")
+
+
+def remap_line(line, start, removed, added):
+    """Map a line number through an edit that replaced removed newlines at start with added"""
+    if line <= start:
+        return line
+    if line >= start + removed:
+        return line + added - removed
+    return start
+
+
 class CustomText(tk.Text):
     def __init__(self, *args, **kwargs):
         tk.Text.__init__(self, *args, **kwargs)
+        self.history = None
+        self._edit_listeners = []
+        self.edit_generation = 0
+        self._batch_depth = 0
+        self._batch_edit = None
         self._orig = self._w + "_orig"
         self.tk.call("rename", self._w, self._orig)
         self.tk.createcommand(self._w, self._proxy)
 
+    def add_edit_listener(self, callback):
+        """Call callback(start_line, removed_lines, added_lines) after every edit"""
+        self._edit_listeners.append(callback)
+
+    def remove_edit_listener(self, callback):
+        if callback in self._edit_listeners:
+            self._edit_listeners.remove(callback)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Apply many edits as one undo step with a single change notification"""
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            self._batch_edit = None
+            generation = self.edit_generation
+            if self.history:
+                self.history.begin_group()
+            else:
+                self.edit_separator()
+                autoseparators = self.cget('autoseparators')
+                self.config(autoseparators=False)
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                if self.history:
+                    self.history.end_group()
+                else:
+                    self.config(autoseparators=autoseparators)
+                    self.edit_separator()
+                edit, self._batch_edit = self._batch_edit, None
+                if edit:
+                    start, old_total, tail, new_total = edit
+                    for callback in self._edit_listeners:
+                        callback(start, max(0, old_total - tail - start), max(0, new_total - tail - start))
+                if self.edit_generation != generation:
+                    self.event_generate("<<Change>>", when="tail")
+
+    def _record_batch_edit(self, edit):
+        """Fold one edit into the batch's (start, old_total, untouched_tail, new_total)"""
+        start, removed, added = edit
+        total = self._line_of("end-1c")
+        if self._batch_edit is None:
+            self._batch_edit = [start, total, total, total]
+        batch = self._batch_edit
+        batch[0] = min(batch[0], start)
+        batch[2] = min(batch[2], total - start - removed)
+        batch[3] = total + added - removed
+
+    def _line_of(self, index):
+        return int(self.tk.call(self._orig, "index", index).split('.')[0])
+
+    def _describe_edit(self, args):
+        if args[0] == "insert":
+            start = self._line_of(args[1])
+            last = self._line_of("end-1c")
+            return min(start, last), 0, ''.join(args[2::2]).count('\n')
+        start = self._line_of(args[1])
+        last = self._line_of("end-1c")
+        if args[0] == "delete":
+            # a single index deletes one character, which may be the newline ending the line
+            end = min(self._line_of(args[2] if len(args) > 2 else f"{args[1]}+1c"), last)
+            return start, max(0, end - start), 0
+        end = min(self._line_of(args[2]), last)
+        return start, max(0, end - start), ''.join(args[3::2]).count('\n')
+
     def _proxy(self, *args):
+        if self.history is not None and args[:1] == ("edit",) and len(args) == 2 \
+                and args[1] in UndoHistory.COMMANDS:
+            return self.history.handle(args[1])
+        edit = None
+        is_edit = bool(args) and args[0] in ("insert", "replace", "delete")
+        undo_ops = None
+        if is_edit and self.history is not None and not self.history.applying:
+            try:
+                undo_ops = self.history.describe(args)
+            except (tk.TclError, IndexError):
+                undo_ops = None
+        if is_edit and self._edit_listeners:
+            try:
+                edit = self._describe_edit(args)
+                if self._batch_depth:
+                    self._record_batch_edit(edit)
+            except (tk.TclError, IndexError):
+                edit = None
         try:
             result = self.tk.call((self._orig,) + args)
         except tk.TclError:
             return None
-        if args[0] in ("insert", "replace", "delete") or args[0:3] == ("mark", "set", "insert"):
+        if is_edit:
+            self.edit_generation += 1
+        if undo_ops:
+            self.history.record(undo_ops)
+        if self._batch_depth and is_edit:
+            return result
+        if edit:
+            for callback in self._edit_listeners:
+                callback(*edit)
+        if is_edit or args[0:3] == ("mark", "set", "insert"):
             self.event_generate("<<Change>>", when="tail")
         return result
 
@@ -34,6 +175,8 @@ class CustomText(tk.Text):
 class AIAgent:
     """Local AI Agent - Pattern-based code intelligence"""
     
+    COMPLETION_LIMIT = 15   # a list this long may have been cut short
+    
     PYTHON_PATTERNS = {
         'def ': 'Function definition',
         'class ': 'Class definition', 
@@ -130,7 +273,7 @@ Date: {date}
             if not stripped or stripped.startswith('#'):
                 continue
                 
-            for pattern, desc in AIAgent.PYTHON_PATTERNS.items():
+            for pattern, desc in RULES.patterns().items():
                 if stripped.startswith(pattern):
                     # Extract name if possible
                     if pattern in ('def ', 'class '):
@@ -167,49 +310,51 @@ Date: {date}
     @staticmethod
     def find_bugs(code):
         """Find potential bugs and issues"""
+        issues = [f"{icon} Line {line}: {msg}" for line, icon, msg in AIAgent.find_bug_items(code)]
+        
+        if not issues:
+            issues.append("✅ No obvious issues found! Code looks clean.")
+        
+        return '\n'.join(issues)
+    
+    @staticmethod
+    def find_bug_items(code):
+        """Find potential bugs as (line, icon, message) tuples"""
         issues = []
-        lines = code.split('\n')
+        newlines = None
         
-        # Check each pattern
-        for pattern, msg in AIAgent.COMMON_FIXES.items():
-            matches = list(re.finditer(pattern, code))
+        # Whole-source patterns
+        for rule in RULES.rules('source'):
+            started = time.perf_counter()
+            matches = list(rule.regex.finditer(code))
+            if matches and newlines is None:
+                newlines = [m.start() for m in re.finditer('\n', code)]
             for match in matches:
                 # Find line number
-                line_num = code[:match.start()].count('\n') + 1
-                issues.append(f"⚠️ Line {line_num}: {msg}")
-        
-        # Check indentation
-        for i, line in enumerate(lines, 1):
-            if line and not line.startswith((' ', '\t', '#')) and line[0].isspace():
-                issues.append(f"⚠️ Line {i}: Mixed indentation detected")
-        
-        # Check for common mistakes
-        for i, line in enumerate(lines, 1):
-            stripped = line.strip()
-            
-            # Missing colon
-            if re.match(r'^(if|elif|else|for|while|try|except|finally|with|def|class|async)\s+.*[^:]$', stripped):
-                if not stripped.endswith(':') and not stripped.endswith(','):
-                    issues.append(f"⚠️ Line {i}: Possibly missing colon ':'")
-            
-            # Unused variable hint
-            if '=' in stripped and '_' == stripped.split('=')[0].strip():
-                issues.append(f"💡 Line {i}: Underscore variable (intentionally unused)")
-            
-            # TODO/FIXME
-            if 'TODO' in stripped.upper():
-                issues.append(f"📝 Line {i}: TODO comment found")
-            if 'FIXME' in stripped.upper():
-                issues.append(f"🔧 Line {i}: FIXME comment found")
+                line_num = bisect.bisect_left(newlines, match.start()) + 1
+                issues.append((line_num, rule.icon, rule.message))
+            rule.record(len(matches), time.perf_counter() - started)
         
-        if not issues:
-            issues.append("✅ No obvious issues found! Code looks clean.")
+        # Per-line checks
+        line_issues = []
+        lines = code.split('\n')
+        for order, rule in enumerate(RULES.rules('line')):
+            started = time.perf_counter()
+            search = rule.regex.search
+            hits = [(i, order, rule.icon, rule.message) for i, line in enumerate(lines, 1) if search(line)]
+            line_issues.extend(hits)
+            rule.record(len(hits), time.perf_counter() - started)
+        line_issues.sort(key=lambda item: item[:2])
+        issues.extend((line, icon, msg) for line, _, icon, msg in line_issues)
         
-        return '\n'.join(issues)
+        return issues
     
     @staticmethod
     def generate_docstring(code):
         """Generate docstring for function/class"""
+        node = AIAgent._definition(code)
+        if node is not None:
+            return AIAgent._docstring_for(node, method=True)
         # Detect function
         func_match = re.match(r'def\s+(\w+)\s*\(([^)]*)\)', code.strip())
         if func_match:
@@ -247,6 +392,123 @@ Date: {date}
         
         return '"""Description."""'
     
+    @staticmethod
+    def _definition(code):
+        """First def/class in a snippet, which may be just a signature without a body"""
+        snippet = textwrap.dedent(code).strip('\n')
+        for candidate in (snippet, snippet + '\n    pass'):
+            try:
+                tree = ast.parse(candidate)
+            except (SyntaxError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    return node
+            return None
+        return None
+    
+    @staticmethod
+    def _docstring_for(node, method=False):
+        """Docstring text for an AST def/class, body indented by four spaces"""
+        if isinstance(node, ast.ClassDef):
+            attrs = []
+            for item in node.body:
+                if isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+                    attrs.append(f"        {item.target.id} ({ast.unparse(item.annotation)}): Description")
+                elif isinstance(item, ast.Assign):
+                    attrs.extend(f"        {t.id}: Description" for t in item.targets if isinstance(t, ast.Name))
+                elif isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name == '__init__':
+                    for sub in ast.walk(item):
+                        targets = sub.targets if isinstance(sub, ast.Assign) else \
+                            [sub.target] if isinstance(sub, ast.AnnAssign) else []
+                        for t in targets:
+                            if isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name) \
+                                    and t.value.id == 'self':
+                                attrs.append(f"        {t.attr}: Description")
+            attrs = list(dict.fromkeys(attrs)) or ["        attr: Description"]
+            return AIAgent.DOCSTRING_TEMPLATES['class'].format(
+                description=f"{node.name} class.", attrs='\n'.join(attrs))
+        
+        a = node.args
+        params = [(arg, None) for arg in a.posonlyargs + a.args]
+        if method and params and params[0][0].arg in ('self', 'cls'):
+            params = params[1:]
+        if a.vararg:
+            params.append((a.vararg, '*'))
+        params.extend((arg, None) for arg in a.kwonlyargs)
+        if a.kwarg:
+            params.append((a.kwarg, '**'))
+        args = []
+        for arg, star in params:
+            name = (star or '') + arg.arg
+            if arg.annotation is not None:
+                args.append(f"        {name} ({ast.unparse(arg.annotation)}): Description")
+            else:
+                args.append(f"        {name}: Description")
+        
+        if node.returns is not None:
+            returns = ast.unparse(node.returns)
+            if returns != 'None':
+                returns += ": Description of return value"
+        else:
+            returns = "None"
+            pending = list(node.body)
+            while pending:
+                sub = pending.pop()
+                if isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                    continue
+                if isinstance(sub, ast.Return) and sub.value is not None or \
+                        isinstance(sub, (ast.Yield, ast.YieldFrom)):
+                    returns = "Description of return value"
+                    break
+                pending.extend(ast.iter_child_nodes(sub))
+        return AIAgent.DOCSTRING_TEMPLATES['function'].format(
+            description=node.name.replace('_', ' ').strip().title() or node.name,
+            args='\n'.join(args) or "        None", returns=returns)
+    
+    @staticmethod
+    def document_file(code, max_edits=200):
+        """Docstring insertions for every undocumented def/class in a module.
+
+        Returns (count, edits) with edits as (start_index, end_index, text) in
+        bottom-up order, the same shape plan_replace_all produces. One-line
+        definitions are skipped. Raises SyntaxError if the module does not parse.
+        """
+        tree = ast.parse(code)
+        lines = code.split('\n')
+        inserts = []
+        pending = [(tree, False)]
+        while pending:
+            parent, in_class = pending.pop()
+            for node in ast.iter_child_nodes(parent):
+                if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    pending.append((node, in_class))
+                    continue
+                pending.append((node, isinstance(node, ast.ClassDef)))
+                first = node.body[0]
+                number = min([first.lineno] + [d.lineno for d in getattr(first, 'decorator_list', [])])
+                line = lines[number - 1]
+                if ast.get_docstring(node, clean=False) is not None or \
+                        (number == first.lineno and line.encode()[:first.col_offset].strip()):
+                    continue
+                indent = line[:len(line) - len(line.lstrip())]
+                body = AIAgent._docstring_for(node, method=in_class).split('\n')
+                text = [indent + body[0]] + [indent + l[4:] if l.strip() else '' for l in body[1:]]
+                inserts.append((number, '\n'.join(text) + '\n'))
+        if not inserts:
+            return 0, []
+        inserts.sort(reverse=True)
+        if len(inserts) > max_edits:
+            first, last = inserts[-1][0], inserts[0][0]
+            by_line = dict(inserts)
+            segment = []
+            for number in range(first, last):
+                segment.append(by_line.get(number, ''))
+                segment.append(lines[number - 1] + '\n')
+            segment.append(by_line[last])
+            return len(inserts), [(f"{first}.0", f"{last}.0", ''.join(segment))]
+        return len(inserts), [(f"{line}.0", f"{line}.0", text) for line, text in inserts]
+    
     @staticmethod
     def refactor_code(code):
         """Suggest refactoring improvements"""
@@ -310,12 +572,17 @@ Date: {date}
         return '\n'.join(suggestions)
     
     @staticmethod
-    def get_completion(prefix):
-        """Get code completion suggestions"""
+    def get_completion(prefix, context=(), model=None, budget=0.015, limit=COMPLETION_LIMIT):
+        """Get code completion suggestions; a trained NgramModel ranks first.
+
+        Returns at most limit suggestions; exactly limit means more may exist.
+        """
+        suggestions = []
+        if model is not None:
+            suggestions = [(word, word) for word in model.predict(list(context), prefix.strip(), limit, budget)]
         prefix = prefix.strip().lower()
         
-        suggestions = []
-        for key, template in AIAgent.COMPLETIONS.items():
+        for key, template in RULES.completions().items():
             if key.startswith(prefix):
                 suggestions.append((key, template))
         
@@ -326,10 +593,10 @@ Date: {date}
         
         # Check builtins
         for name in dir(builtins):
-            if name.startswith(prefix) and not name.startswith('_'):
+            if name.startswith(prefix) and not name.startswith('_') and name not in [s[0] for s in suggestions]:
                 suggestions.append((name, f"{name}()"))
         
-        return suggestions[:15]  # Limit results
+        return suggestions[:limit]
     
     @staticmethod
     def chat_response(message):
@@ -379,6 +646,208 @@ Date: {date}
         return f"🤔 I'm a local AI - I understand basic Python questions! Try asking about:\n• How to create lists/dicts/functions/classes\n• File operations\n• Loops and iteration\n• Error handling\n• Or use the AI tools on your code!"
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# RULE REGISTRY
+# ══════════════════════════════════════════════════════════════════════════════
+
+RULES_DIR = os.path.join(os.path.expanduser('~'), '.cats_cursor', 'rules')
+
+
+class Rule:
+    """A single analysis rule; its pattern is compiled the first time it runs.
+
+    Phases: 'source' rules are matched against the whole buffer, 'line'
+    rules are searched line by line.
+    """
+
+    PHASES = ('source', 'line')
+
+    def __init__(self, name, pattern, message, phase='source', icon='⚠️', flags=0, pack='builtin'):
+        if phase not in self.PHASES:
+            raise ValueError(f"Unknown rule phase {phase!r}")
+        self.name = name
+        self.pattern = pattern
+        self.message = message
+        self.phase = phase
+        self.icon = icon
+        self.flags = flags
+        self.pack = pack
+        self.enabled = True
+        self.hits = 0
+        self.runs = 0
+        self.total_time = 0.0
+        self._regex = None
+
+    @property
+    def regex(self):
+        if self._regex is None:
+            self._regex = re.compile(self.pattern, self.flags)
+        return self._regex
+
+    def record(self, hits, elapsed):
+        self.hits += hits
+        self.runs += 1
+        self.total_time += elapsed
+
+
+class RuleRegistry:
+    """Built-in AIAgent rules plus rule packs loaded from a directory.
+
+    A pack is either a JSON file::
+
+        {"rules": [{"name": "...", "pattern": "...", "message": "...",
+                    "phase": "line", "icon": "⚠️", "ignorecase": false}],
+         "completions": {"key": "template"},
+         "patterns": {"prefix ": "description"}}
+
+    or a Python module defining register(registry). Nothing is read until
+    the first lookup, and a pack's patterns compile only when its phase runs.
+    """
+
+    BUILTIN_LINE_RULES = [
+        ('mixed-indentation', r'^[^\S \t]', 'Mixed indentation detected', '⚠️', 0),
+        ('missing-colon', r'^\s*(if|elif|else|for|while|try|except|finally|with|def|class|async)\s+.*[^:,\s]\s*$',
+         "Possibly missing colon ':'", '⚠️', 0),
+        ('underscore-variable', r'^\s*_\s*=', 'Underscore variable (intentionally unused)', '💡', 0),
+        ('todo', r'todo', 'TODO comment found', '📝', re.IGNORECASE),
+        ('fixme', r'fixme', 'FIXME comment found', '🔧', re.IGNORECASE),
+    ]
+
+    def __init__(self, directory=RULES_DIR):
+        self.directory = directory
+        self.disabled = set()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._rules = []
+        self._completions = {}
+        self._patterns = {}
+        self.packs = {}     # pack name -> load error or None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load_builtins()
+            self._load_packs()
+            self._loaded = True
+
+    def _load_builtins(self):
+        for i, (pattern, msg) in enumerate(AIAgent.COMMON_FIXES.items()):
+            self.add_rule(Rule(f"builtin-{i}", pattern, msg))
+        for name, pattern, msg, icon, flags in self.BUILTIN_LINE_RULES:
+            self.add_rule(Rule(name, pattern, msg, phase='line', icon=icon, flags=flags))
+        self._patterns.update(AIAgent.PYTHON_PATTERNS)
+        self._completions.update(AIAgent.COMPLETIONS)
+
+    def _load_packs(self):
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return
+        for filename in names:
+            path = os.path.join(self.directory, filename)
+            pack, ext = os.path.splitext(filename)
+            try:
+                if ext == '.json':
+                    self._load_json_pack(pack, path)
+                elif ext == '.py':
+                    self._load_python_pack(pack, path)
+                else:
+                    continue
+                self.packs[pack] = None
+            except Exception as e:
+                self.packs[pack] = str(e)
+                log.warning("Could not load rule pack %s: %s", path, e)
+
+    def _load_json_pack(self, pack, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for i, spec in enumerate(data.get('rules', [])):
+            flags = re.IGNORECASE if spec.get('ignorecase') else 0
+            self.add_rule(Rule(spec.get('name', f"{pack}-{i}"), spec['pattern'], spec['message'],
+                               phase=spec.get('phase', 'source'), icon=spec.get('icon', '⚠️'),
+                               flags=flags, pack=pack))
+        self._completions.update(data.get('completions', {}))
+        self._patterns.update(data.get('patterns', {}))
+
+    def _load_python_pack(self, pack, path):
+        spec = importlib.util.spec_from_file_location(f"cats_cursor_rules_{pack}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.register(_PackRegistrar(self, pack))
+
+    def add_rule(self, rule):
+        """Register rule; names are the key for stats and enabling, so a second use is rejected"""
+        if any(other.name == rule.name for other in self._rules):
+            log.warning("Rule %r from pack %s ignored: name already registered", rule.name, rule.pack)
+            return False
+        rule.enabled = rule.name not in self.disabled
+        self._rules.append(rule)
+        return True
+
+    def add_completion(self, key, template):
+        self._completions[key] = template
+
+    def add_pattern(self, prefix, description):
+        self._patterns[prefix] = description
+
+    def rules(self, phase):
+        self._ensure_loaded()
+        return [rule for rule in self._rules if rule.phase == phase and rule.enabled]
+
+    def all_rules(self):
+        self._ensure_loaded()
+        return list(self._rules)
+
+    def completions(self):
+        self._ensure_loaded()
+        return self._completions
+
+    def patterns(self):
+        self._ensure_loaded()
+        return self._patterns
+
+    def set_enabled(self, name, enabled):
+        if enabled:
+            self.disabled.discard(name)
+        else:
+            self.disabled.add(name)
+        for rule in self._rules:
+            if rule.name == name:
+                rule.enabled = enabled
+
+    def reload(self):
+        with self._lock:
+            self._rules, self._completions, self._patterns, self.packs = [], {}, {}, {}
+            self._loaded = False
+
+    def stats(self):
+        """Rules sorted by cumulative time, slowest first"""
+        return sorted(self.all_rules(), key=lambda rule: rule.total_time, reverse=True)
+
+
+class _PackRegistrar:
+    """What a Python rule pack's register() receives; tags rules with the pack name"""
+
+    def __init__(self, registry, pack):
+        self._registry = registry
+        self._pack = pack
+
+    def add_rule(self, name, pattern, message, phase='source', icon='⚠️', flags=0):
+        self._registry.add_rule(Rule(name, pattern, message, phase, icon, flags, pack=self._pack))
+
+    def add_completion(self, key, template):
+        self._registry.add_completion(key, template)
+
+    def add_pattern(self, prefix, description):
+        self._registry.add_pattern(prefix, description)
+
+
+RULES = RuleRegistry()
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # FILE TYPES
 # ══════════════════════════════════════════════════════════════════════════════
@@ -407,6 +876,16 @@ LANG_MODES = {
 }
 
 
+def read_text_file(path):
+    """Read a file as text, falling back to latin-1 for non UTF-8 content"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(path, 'r', encoding='latin-1') as f:
+            return f.read()
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # THEMES
 # ══════════════════════════════════════════════════════════════════════════════
@@ -452,179 +931,1953 @@ THEMES = {
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-# EDITOR TAB
+# SESSION
 # ══════════════════════════════════════════════════════════════════════════════
 
-class EditorTab(tk.Frame):
-    def __init__(self, master, theme, *args, **kwargs):
-        super().__init__(master, *args, **kwargs)
-        self.filename = None
-        self.theme = theme
-        self.language = 'Text'
-        self.modified = False
-        
-        self.grid_rowconfigure(0, weight=1)
-        self.grid_columnconfigure(1, weight=1)
+SESSION_FILE = os.path.join(os.path.expanduser('~'), '.cats_cursor_session.json.gz')
 
-        # Scrollbars
-        self.v_scroll = ttk.Scrollbar(self, orient="vertical")
-        self.v_scroll.grid(row=0, column=2, sticky="ns")
-        self.h_scroll = ttk.Scrollbar(self, orient="horizontal")
-        self.h_scroll.grid(row=1, column=0, columnspan=2, sticky="ew")
 
-        # Line numbers
-        self.line_nums = tk.Text(self, width=5, padx=4, takefocus=0, border=0,
-                                 bg=theme['line_bg'], fg=theme['line_fg'],
-                                 state='disabled', wrap='none', font=("Consolas", 11))
-        self.line_nums.grid(row=0, column=0, sticky="ns")
+class SessionStore:
+    """Compact gzip'd JSON snapshot of open tabs, cursors and theme"""
 
-        # Text area
-        self.text = CustomText(self, wrap="none", undo=True,
-                               bg=theme['text_bg'], fg=theme['text_fg'],
-                               insertbackground=theme['cursor'],
-                               selectbackground=theme['select_bg'],
-                               font=("Consolas", 11), tabs=("4c",))
-        self.text.grid(row=0, column=1, sticky="nsew")
+    VERSION = 1
 
-        # Configure scrolling
-        self.text.config(yscrollcommand=self._on_yscroll, xscrollcommand=self.h_scroll.set)
-        self.v_scroll.config(command=self._scroll_both)
-        self.h_scroll.config(command=self.text.xview)
+    def __init__(self, path=None):
+        self.path = path or SESSION_FILE
 
-        # Events
-        self.text.bind("<<Change>>", self._on_change)
-        self.text.bind("<Configure>", self._on_change)
-        self.text.bind("<Key>", self._on_key)
-        
-        self._on_change()
+    def save(self, data):
+        data = dict(data, version=self.VERSION)
+        tmp = self.path + '.tmp'
+        try:
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
 
-    def _on_yscroll(self, first, last):
-        self.v_scroll.set(first, last)
-        self.line_nums.yview_moveto(first)
+    def load(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return None
+        return data
 
-    def _scroll_both(self, *args):
-        self.text.yview(*args)
-        self.line_nums.yview(*args)
 
-    def _on_change(self, event=None):
-        self._update_line_nums()
-        self.event_generate("<<CursorChange>>")
+# ══════════════════════════════════════════════════════════════════════════════
+# FILE WATCHER
+# ══════════════════════════════════════════════════════════════════════════════
 
-    def _on_key(self, event=None):
-        if event and event.keysym not in ('Shift_L', 'Shift_R', 'Control_L', 'Control_R', 'Alt_L', 'Alt_R'):
-            self.modified = True
+def file_signature(path):
+    """(mtime_ns, size, inode) of path, or None if it is gone"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
 
-    def _update_line_nums(self):
-        line_count = int(self.text.index('end-1c').split('.')[0])
-        txt = '\n'.join(str(i) for i in range(1, line_count + 1)) + '\n'
-        self.line_nums.config(state='normal')
-        self.line_nums.delete('1.0', 'end')
-        self.line_nums.insert('1.0', txt)
-        self.line_nums.yview_moveto(self.text.yview()[0])
-        self.line_nums.config(state='disabled')
 
-    def apply_theme(self, theme):
-        self.theme = theme
-        self.line_nums.config(bg=theme['line_bg'], fg=theme['line_fg'])
-        self.text.config(bg=theme['text_bg'], fg=theme['text_fg'],
-                         insertbackground=theme['cursor'], selectbackground=theme['select_bg'])
+class _Inotify:
+    """Minimal ctypes binding to Linux inotify, watching parent directories"""
 
-    def detect_language(self):
-        if self.filename:
-            _, ext = os.path.splitext(self.filename)
-            self.language = LANG_MODES.get(ext.lower(), 'Text')
+    MASK = 0x8 | 0x40 | 0x80 | 0x100 | 0x200 | 0x4  # CLOSE_WRITE, MOVED_FROM/TO, CREATE, DELETE, ATTRIB
+    OVERFLOW = 0x4000
+    EVENT = struct.Struct('iIII')
 
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}   # directory -> watch descriptor
+        self.wds = {}    # watch descriptor -> directory
 
-# ══════════════════════════════════════════════════════════════════════════════
-# AI SIDEBAR
-# ══════════════════════════════════════════════════════════════════════════════
+    def add(self, directory):
+        if directory in self.dirs:
+            return
+        wd = self._add(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.dirs[directory] = wd
+            self.wds[wd] = directory
 
-class AISidebar(tk.Frame):
-    def __init__(self, master, theme, get_selected_code, **kwargs):
-        super().__init__(master, **kwargs)
-        self.theme = theme
-        self.get_selected_code = get_selected_code
-        
-        self.config(bg=theme['sidebar_bg'])
-        
-        # Title
-        title = tk.Label(self, text="🤖 AI Assistant", font=("Segoe UI", 12, "bold"),
-                         bg=theme['sidebar_bg'], fg=theme['sidebar_fg'])
-        title.pack(pady=10, padx=10, anchor='w')
-        
-        # AI Tools buttons
-        tools_frame = tk.Frame(self, bg=theme['sidebar_bg'])
-        tools_frame.pack(fill='x', padx=10)
-        
-        self.btn_explain = tk.Button(tools_frame, text="📚 Explain", command=self._explain,
-                                     relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
-        self.btn_explain.pack(fill='x', pady=2)
-        
-        self.btn_debug = tk.Button(tools_frame, text="🐛 Debug", command=self._debug,
-                                   relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
-        self.btn_debug.pack(fill='x', pady=2)
-        
-        self.btn_refactor = tk.Button(tools_frame, text="🔄 Refactor", command=self._refactor,
-                                      relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
-        self.btn_refactor.pack(fill='x', pady=2)
-        
-        self.btn_docstring = tk.Button(tools_frame, text="📝 Docstring", command=self._docstring,
-                                       relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
-        self.btn_docstring.pack(fill='x', pady=2)
-        
-        # Separator
-        ttk.Separator(self, orient='horizontal').pack(fill='x', pady=10, padx=10)
-        
-        # Chat area
-        chat_label = tk.Label(self, text="💬 Chat", font=("Segoe UI", 10, "bold"),
-                              bg=theme['sidebar_bg'], fg=theme['sidebar_fg'])
-        chat_label.pack(anchor='w', padx=10)
-        
-        # Chat display
-        self.chat_display = scrolledtext.ScrolledText(self, height=15, wrap='word',
-                                                       bg=theme['chat_bg'], fg=theme['sidebar_fg'],
-                                                       font=("Consolas", 9))
-        self.chat_display.pack(fill='both', expand=True, padx=10, pady=5)
-        self.chat_display.config(state='disabled')
-        
-        # Chat input
-        input_frame = tk.Frame(self, bg=theme['sidebar_bg'])
-        input_frame.pack(fill='x', padx=10, pady=5)
-        
-        self.chat_input = tk.Entry(input_frame, bg=theme['text_bg'], fg=theme['text_fg'],
-                                   insertbackground=theme['cursor'])
-        self.chat_input.pack(side='left', fill='x', expand=True)
-        self.chat_input.bind('<Return>', self._send_chat)
-        
-        self.btn_send = tk.Button(input_frame, text="→", command=self._send_chat,
-                                  bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
-        self.btn_send.pack(side='right', padx=2)
-        
-        # Welcome message
-        self._add_ai_message("🐱 Hi! I'm your local AI assistant.\nNo API needed - I work offline!\n\nSelect code and use the tools above,\nor ask me coding questions!")
+    def remove(self, directory):
+        wd = self.dirs.pop(directory, None)
+        if wd is not None:
+            self.wds.pop(wd, None)
+            self._rm(self.fd, wd)
 
-    def _add_user_message(self, msg):
-        self.chat_display.config(state='normal')
-        self.chat_display.insert('end', f"\n👤 You:\n{msg}\n", 'user')
-        self.chat_display.config(state='disabled')
-        self.chat_display.see('end')
+    def read(self):
+        """Paths touched since the last read; None means the queue overflowed"""
+        paths = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return paths
+            except OSError:
+                return None
+            offset = 0
+            while offset + self.EVENT.size <= len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size
+                name = data[offset:offset + length].split(b'\0', 1)[0]
+                offset += length
+                if mask & self.OVERFLOW:
+                    return None
+                if wd in self.wds and name:
+                    paths.add(os.path.join(self.wds[wd], os.fsdecode(name)))
 
-    def _add_ai_message(self, msg):
-        self.chat_display.config(state='normal')
-        self.chat_display.insert('end', f"\n🤖 AI:\n{msg}\n", 'ai')
-        self.chat_display.config(state='disabled')
-        self.chat_display.see('end')
 
-    def _send_chat(self, event=None):
-        msg = self.chat_input.get().strip()
-        if msg:
-            self._add_user_message(msg)
-            response = AIAgent.chat_response(msg)
-            self._add_ai_message(response)
-            self.chat_input.delete(0, 'end')
+class FileWatcher:
+    """Notice when files open in tabs change on disk.
 
-    def _explain(self):
-        code = self.get_selected_code()
+    Each watched path keeps its (mtime, size, inode) signature. With inotify
+    the directories of open files are watched and only touched paths are
+    re-stat'ed; otherwise all paths are stat'ed in one batched sweep.
+    """
+
+    def __init__(self):
+        self.signatures = {}
+        self.counts = {}
+        try:
+            self.inotify = _Inotify() if sys.platform.startswith('linux') else None
+        except (OSError, AttributeError):
+            self.inotify = None
+
+    def watch(self, path):
+        path = os.path.abspath(path)
+        self.counts[path] = self.counts.get(path, 0) + 1
+        self.signatures[path] = file_signature(path)
+        if self.inotify:
+            self.inotify.add(os.path.dirname(path))
+
+    def unwatch(self, path):
+        path = os.path.abspath(path)
+        count = self.counts.get(path, 0) - 1
+        if count > 0:
+            self.counts[path] = count
+            return
+        self.counts.pop(path, None)
+        self.signatures.pop(path, None)
+        directory = os.path.dirname(path)
+        if self.inotify and not any(os.path.dirname(p) == directory for p in self.signatures):
+            self.inotify.remove(directory)
+
+    def record(self, path):
+        """Accept the current on-disk state of path (after load, save or reload)"""
+        path = os.path.abspath(path)
+        if path in self.signatures:
+            self.signatures[path] = file_signature(path)
+
+    def changed_since_recorded(self, path):
+        path = os.path.abspath(path)
+        return path in self.signatures and file_signature(path) != self.signatures[path]
+
+    def candidates(self):
+        """Paths worth re-stat'ing now, or None when every path needs a sweep"""
+        if not self.inotify:
+            return None
+        touched = self.inotify.read()
+        if touched is None:
+            return None
+        return [p for p in touched if p in self.signatures]
+
+    @staticmethod
+    def sweep(signatures, paths=None):
+        """Stat paths (default: all) against signatures; returns [(path, new_sig)]"""
+        changed = []
+        for path in (signatures if paths is None else paths):
+            sig = file_signature(path)
+            if sig != signatures.get(path):
+                changed.append((path, sig))
+        return changed
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SYMBOL INDEX
+# ══════════════════════════════════════════════════════════════════════════════
+
+class SymbolIndex:
+    """Per-tab table of classes, functions and methods with line ranges.
+
+    Symbols are grouped by top-level block. Edits only widen one pending
+    shift (old lines lo..hi became hi+delta) in O(1); the blocks after it
+    are moved on the next query and those touching the dirty range are
+    re-parsed on refresh().
+    """
+
+    DEF_RE = re.compile(r'^([ \t]*)(?:async[ \t]+)?(def|class)[ \t]+(\w+)')
+    CHUNK = 256
+
+    def __init__(self, text):
+        self.text = text
+        self.enabled = True
+        self.blocks = []   # [start, end, [(qualname, kind, rel_start, rel_end, depth), ...]]
+        self.dirty = None  # (lo, hi) line range needing a re-parse
+        self.full = True
+        self.shift = None  # [lo, hi, delta] in block coordinates, not yet applied
+        text.add_edit_listener(self.on_edit)
+
+    def invalidate(self):
+        self.blocks = []
+        self.dirty = None
+        self.full = True
+        self.shift = None
+
+    def on_edit(self, start, removed, added):
+        if self.full:
+            return
+        lo, hi = start, start + added
+        if self.dirty:
+            lo = min(lo, remap_line(self.dirty[0], start, removed, added))
+            hi = max(hi, remap_line(self.dirty[1], start, removed, added))
+        self.dirty = (lo, hi)
+        if added != removed and self.blocks:
+            if self.shift is None:
+                self.shift = [start, start + removed, added - removed]
+            else:
+                old_lo, old_hi, delta = self.shift
+                to_old = lambda line: line if line < old_lo else max(old_lo, line - delta)
+                self.shift = [min(old_lo, to_old(start)), max(old_hi, to_old(start + removed)),
+                              delta + added - removed]
+
+    def _settle(self):
+        """Move the blocks past the pending shift; ends inside it are clamped, the dirty range covers them"""
+        if self.shift is None:
+            return
+        lo, hi, delta = self.shift
+        self.shift = None
+        top = hi + delta
+        for block in self.blocks[self._first_block_ending_at(lo):]:
+            for i in (0, 1):
+                if block[i] > hi:
+                    block[i] += delta
+                elif block[i] >= lo:
+                    block[i] = max(lo, min(block[i], top))
+
+    def _first_block_ending_at(self, line):
+        lo, hi = 0, len(self.blocks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.blocks[mid][1] < line:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @staticmethod
+    def _is_boundary(line):
+        return bool(line) and line[0] not in ' \t#)]}'
+
+    def _iter_lines(self, start):
+        last = int(self.text.index('end-1c').split('.')[0])
+        line = start
+        while line <= last:
+            stop = min(line + self.CHUNK - 1, last)
+            for content in self.text.get(f'{line}.0', f'{stop}.0 lineend').split('\n'):
+                yield line, content
+                line += 1
+
+    def refresh(self):
+        """Re-parse the dirty region; returns True if the table changed"""
+        if not self.enabled:
+            changed = bool(self.blocks)
+            self.blocks, self.dirty, self.full, self.shift = [], None, False, None
+            return changed
+        if self.full:
+            self.blocks = self._parse(1, None)
+            self.full, self.dirty, self.shift = False, None, None
+            return True
+        self._settle()
+        if not self.dirty:
+            return False
+        lo, hi = self.dirty
+        self.dirty = None
+        first = self._first_block_ending_at(lo - 1)
+        last = first
+        while last < len(self.blocks) and self.blocks[last][0] <= hi + 1:
+            lo = min(lo, self.blocks[last][0])
+            hi = max(hi, self.blocks[last][1])
+            last += 1
+        self.blocks[first:last] = self._parse(max(1, lo), hi)
+        return True
+
+    def _parse(self, start, hi):
+        """Parse blocks from start, stopping at the first boundary after hi"""
+        blocks = []
+        block = None
+        stack = []
+        last_code = start
+        lineno = start
+
+        def close(indent):
+            while stack and stack[-1][0] >= indent:
+                _, sym = stack.pop()
+                sym[3] = last_code - block[0]
+
+        for lineno, content in self._iter_lines(start):
+            stripped = content.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            if self._is_boundary(content):
+                if block is not None:
+                    close(0)
+                    block[1] = lineno - 1
+                    block[2] = [tuple(sym) for sym in block[2]]
+                    blocks.append(block)
+                    block = None
+                if hi is not None and lineno > hi:
+                    break
+            indent = len(content) - len(content.lstrip())
+            match = self.DEF_RE.match(content)
+            if match and (block is not None or indent == 0):
+                if block is None:
+                    block = [lineno, lineno, []]
+                close(indent)
+                parent = stack[-1][1][0] + '.' if stack else ''
+                sym = [parent + match.group(3), match.group(2), lineno - block[0], 0, len(stack)]
+                block[2].append(sym)
+                stack.append((indent, sym))
+            elif block is not None:
+                close(indent)
+            last_code = lineno
+        if block is not None:
+            close(0)
+            block[1] = lineno
+            block[2] = [tuple(sym) for sym in block[2]]
+            blocks.append(block)
+        return blocks
+
+    def block_span(self, lo, hi):
+        """Widen lo..hi to cover every top-level block it touches"""
+        self._settle()
+        i = self._first_block_ending_at(lo)
+        while i < len(self.blocks) and self.blocks[i][0] <= hi:
+            lo = min(lo, self.blocks[i][0])
+            hi = max(hi, self.blocks[i][1])
+            i += 1
+        return lo, hi
+
+    def symbols(self):
+        """Flat list of (qualname, kind, start_line, end_line, depth)"""
+        self._settle()
+        result = []
+        for start, _, syms in self.blocks:
+            for name, kind, rel_start, rel_end, depth in syms:
+                result.append((name, kind, start + rel_start, start + rel_end, depth))
+        return result
+
+    def symbol_at(self, line):
+        """Innermost symbol enclosing line, or None"""
+        self._settle()
+        i = self._first_block_ending_at(line)
+        if i >= len(self.blocks) or self.blocks[i][0] > line:
+            return None
+        start, _, syms = self.blocks[i]
+        best = None
+        for name, kind, rel_start, rel_end, depth in syms:
+            if start + rel_start <= line <= start + rel_end:
+                best = (name, kind, start + rel_start, start + rel_end, depth)
+        return best
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# LIVE DIAGNOSTICS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class LiveDiagnostics:
+    """Idle-time linting of the blocks touched since the last pass.
+
+    After a typing pause the top-level blocks around the dirty lines are
+    snapshotted and run through AIAgent.find_bug_items (plus a compile of the
+    whole buffer) on a worker thread. If a pass overruns BUDGET the idle delay
+    doubles, and the compile step is dropped when it alone is too slow.
+    """
+
+    IDLE_DELAY = 600
+    BUDGET = 0.05
+    MAX_BACKOFF = 16
+    SEVERITY = {'❌': 'error', '⚠️': 'warning'}
+    RANK = {'error': 0, 'warning': 1, 'info': 2}
+
+    def __init__(self, tab):
+        self.tab = tab
+        self.text = tab.text
+        self.enabled = True
+        self.diags = {}        # line -> [(severity, message)]
+        self.syntax = None     # (line, message) from the compile step
+        self.dirty = []        # [(lo, hi)] line ranges not yet analysed
+        self.inflight = []     # ranges being analysed by the worker
+        self.full = True
+        self.backoff = 1
+        self.compile_enabled = True
+        self.running = False
+        self.needs_render = False
+        self.marks = {}
+        self._edit_gen = 0
+        self._job = None
+        self._viewport_job = None
+        self.text.add_edit_listener(self.on_edit)
+
+    def on_edit(self, start, removed, added):
+        self._edit_gen += 1
+        remap = lambda line: remap_line(line, start, removed, added)
+        self.dirty = [(remap(lo), remap(hi)) for lo, hi in self.dirty]
+        self.dirty.append((start, start + added))
+        self.inflight = [(remap(lo), remap(hi)) for lo, hi in self.inflight]
+        if self.diags and (removed or added):
+            diags = {}
+            for line, items in self.diags.items():
+                if not start < line < start + removed:
+                    diags.setdefault(remap(line), []).extend(items)
+            self.diags = diags
+            self.needs_render = True
+        if self.syntax:
+            self.syntax = (remap(self.syntax[0]), self.syntax[1])
+
+    def reset(self):
+        self.diags = {}
+        self.syntax = None
+        self.dirty = []
+        self.full = True
+        self.render()
+
+    def schedule(self):
+        if self.needs_render:
+            self.render()
+        if not self.enabled or not self.tab.symbols.enabled or not self.tab.loaded:
+            return
+        if not (self.dirty or self.full):
+            return
+        if self._job:
+            self.tab.after_cancel(self._job)
+        self._job = self.tab.after(self.IDLE_DELAY * self.backoff, self.run)
+
+    def _units(self):
+        last = int(self.text.index('end-1c').split('.')[0])
+        if self.full:
+            return [(1, last)]
+        symbols = self.tab.symbols
+        symbols.refresh()
+        units = []
+        for lo, hi in sorted(self.dirty):
+            lo, hi = symbols.block_span(max(1, lo), min(last, max(lo, hi)))
+            if units and lo <= units[-1][1] + 1:
+                units[-1] = (units[-1][0], max(hi, units[-1][1]))
+            else:
+                units.append((lo, hi))
+        return units
+
+    def run(self):
+        self._job = None
+        if self.running:
+            self.schedule()
+            return
+        units = self._units()
+        chunks = [(lo, self.text.get(f'{lo}.0', f'{hi}.0 lineend')) for lo, hi in units]
+        source = self.text.get('1.0', 'end-1c') if self.compile_enabled else None
+        filename = self.tab.filename or '<buffer>'
+        self.inflight = units
+        self.dirty = []
+        self.full = False
+        self.running = True
+        gen = self._edit_gen
+
+        def work():
+            start = time.perf_counter()
+            found = []
+            for lo, code in chunks:
+                for line, icon, msg in AIAgent.find_bug_items(code):
+                    found.append((lo + line - 1, self.SEVERITY.get(icon, 'info'), f"{icon} {msg}"))
+            mid = time.perf_counter()
+            syntax = None
+            if source is not None:
+                try:
+                    compile(source, filename, 'exec')
+                except SyntaxError as e:
+                    syntax = (e.lineno or 1, f"❌ {e.msg}")
+                except ValueError:
+                    pass
+            return found, syntax, mid - start, time.perf_counter() - mid
+
+        self.tab.winfo_toplevel()._run_background(work, lambda result: self._finish(gen, source is not None, result),
+                                                  lambda e: self._finish(gen, False, None))
+
+    def _finish(self, gen, compiled, result):
+        self.running = False
+        units, self.inflight = self.inflight, []
+        if result is None or gen != self._edit_gen:
+            self.dirty.extend(units)
+            self.schedule()
+            return
+        found, syntax, lint_time, compile_time = result
+        for lo, hi in units:
+            for line in [l for l in self.diags if lo <= l <= hi]:
+                del self.diags[line]
+        for line, severity, msg in found:
+            self.diags.setdefault(line, []).append((severity, msg))
+        if compiled:
+            self.syntax = syntax
+        
+        elapsed = lint_time + compile_time
+        if elapsed > self.BUDGET:
+            self.backoff = min(self.MAX_BACKOFF, self.backoff * 2)
+            if compile_time > self.BUDGET:
+                self.compile_enabled = False
+                self.syntax = None
+        elif elapsed < self.BUDGET / 2 and self.backoff > 1:
+            self.backoff //= 2
+        self.render()
+
+    def messages_at(self, line):
+        items = list(self.diags.get(line, []))
+        if self.syntax and self.syntax[0] == line:
+            items.insert(0, ('error', self.syntax[1]))
+        return items
+
+    def render(self):
+        self.needs_render = False
+        marks = {}
+        if self.enabled:
+            for line, items in self.diags.items():
+                marks[line] = min((sev for sev, _ in items), key=self.RANK.get)
+            if self.syntax:
+                marks[self.syntax[0]] = 'error'
+        self.marks = marks
+        self.tab.set_gutter_marks('diag', {line: f'diag_{sev}' for line, sev in marks.items()})
+        self.render_viewport()
+
+    def schedule_viewport(self):
+        if not self._viewport_job:
+            self._viewport_job = self.tab.after_idle(self.render_viewport)
+
+    def render_viewport(self):
+        """Underline diagnosed lines, but only those currently on screen"""
+        self._viewport_job = None
+        self.text.tag_remove('diag_underline', '1.0', 'end')
+        marks = self.marks
+        if not marks:
+            return
+        first = int(self.text.index('@0,0').split('.')[0])
+        last = int(self.text.index(f'@0,{self.text.winfo_height()}').split('.')[0])
+        for lo, hi in self.tab.visible_ranges(first, last):
+            for line in range(lo, hi + 1):
+                if line in marks:
+                    self.text.tag_add('diag_underline', f'{line}.0', f'{line}.0 lineend')
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BRACKET INDEX
+# ══════════════════════════════════════════════════════════════════════════════
+
+BRACKET_PAIRS = {'(': ')', '[': ']', '{': '}', ')': '(', ']': '[', '}': '{'}
+BRACKET_MODES = {'Python': 'python', 'C': 'c', 'C/C++': 'c', 'C++': 'c', 'Java': 'c', 'JavaScript': 'c',
+                 'TypeScript': 'c', 'CSS': 'c', 'JSON': 'c'}
+_BRACKET_TOKENS = {
+    'python': re.compile(r'[][(){}]|"""|\'\'\'|["\'#]'),
+    'c': re.compile(r'[][(){}]|/\*|//|["\']'),
+    'plain': re.compile(r'[][(){}]'),
+}
+_STRING_END = {'"': re.compile(r'(?:[^"\\]|\\.)*"'), "'": re.compile(r"(?:[^'\\]|\\.)*'")}
+_BLOCK_END = {'"""': re.compile(r'(?:[^\\]|\\.)*?"""', re.S), "'''": re.compile(r"(?:[^\\]|\\.)*?'''", re.S),
+              '/*': re.compile(r'.*?\*/', re.S)}
+
+
+def lex_brackets(line, state, mode):
+    """Brackets of one line outside strings/comments as ((col, char), ...), and the state after it.
+
+    state is None or the open multi-line delimiter ('\"\"\"', "'''" or '/*').
+    Columns are Tk columns, so astral characters count twice.
+    """
+    found = []
+    pos = 0
+    pattern = _BRACKET_TOKENS[mode]
+    while True:
+        if state:
+            end = _BLOCK_END[state].match(line, pos)
+            if not end:
+                break
+            pos, state = end.end(), None
+        match = pattern.search(line, pos)
+        if not match:
+            break
+        token = match.group()
+        pos = match.end()
+        if token in BRACKET_PAIRS:
+            found.append((match.start(), token))
+        elif token in ('#', '//'):
+            break
+        elif token in _BLOCK_END:
+            state = token
+        else:
+            end = _STRING_END[token].match(line, pos)
+            if not end:
+                break
+            pos = end.end()
+    if found and _NON_BMP.search(line):
+        found = [(tk_length(line[:col]), ch) for col, ch in found]
+    return tuple(found), state
+
+
+def _bracket_balance(brackets):
+    """(unmatched closers, unmatched openers) of a bracket sequence"""
+    closers = openers = 0
+    for _, ch in brackets:
+        if ch in '([{':
+            openers += 1
+        elif openers:
+            openers -= 1
+        else:
+            closers += 1
+    return closers, openers
+
+
+class BracketIndex:
+    """Per-tab bracket positions kept in step with edits, for O(log n) matching.
+
+    Every line stores its brackets (outside strings and comments), the
+    lexer state it ends in and its (unmatched closers, unmatched openers)
+    balance. Lines live in chunks of about CHUNK, and a segment tree over
+    the chunk balances finds the chunk holding a match without visiting
+    the ones in between. Edits splice placeholder lines in; flush()
+    re-lexes them and carries on only until the end-of-line state agrees
+    with what was stored before, so an edit costs O(CHUNK + chunks).
+    """
+
+    CHUNK = 256
+    EMPTY = ((), None, 0, 0)
+
+    def __init__(self, text):
+        self.text = text
+        self.mode = 'python'
+        self.chunks = []      # [[(brackets, end_state, closers, openers) or None, ...]]
+        self.sums = []        # per-chunk (closers, openers)
+        self.starts = []      # first line (0-based) of each chunk
+        self.tree = []
+        self.size = 1
+        self.dirty = None     # (lo, hi) 1-based lines holding placeholders
+        self.full = True
+        text.add_edit_listener(self.on_edit)
+
+    def invalidate(self):
+        self.chunks = []
+        self.dirty = None
+        self.full = True
+
+    # ── maintenance ───────────────────────────────────────────────────────
+    def on_edit(self, start, removed, added):
+        if self.full:
+            return
+        self._splice(start - 1, removed + 1, [None] * (added + 1))
+        lo, hi = start, start + added
+        if self.dirty:
+            lo = min(lo, remap_line(self.dirty[0], start, removed, added))
+            hi = max(hi, remap_line(self.dirty[1], start, removed, added))
+        self.dirty = (lo, hi)
+
+    def _locate(self, line):
+        """(chunk, offset) of a 0-based line"""
+        k = max(0, bisect.bisect_right(self.starts, line) - 1)
+        return k, line - self.starts[k]
+
+    def _lines(self):
+        return self.starts[-1] + len(self.chunks[-1]) if self.chunks else 0
+
+    def _entry(self, line):
+        k, i = self._locate(line)
+        return self.chunks[k][i]
+
+    def _splice(self, lo, count, entries):
+        """Replace count lines from 0-based lo with entries, re-chunking only the chunks touched"""
+        k0, i0 = self._locate(lo)
+        k1, _ = self._locate(min(lo + count, self._lines()) - 1) if count else (k0, i0)
+        k1 = max(k0, k1)
+        merged = [entry for chunk in self.chunks[k0:k1 + 1] for entry in chunk]
+        merged[i0:i0 + count] = entries
+        pieces = [merged[i:i + self.CHUNK] for i in range(0, len(merged), self.CHUNK)] or [[]]
+        self.chunks[k0:k1 + 1] = pieces
+        self.sums[k0:k1 + 1] = [self._chunk_sum(piece) for piece in pieces]
+        self._reindex()
+
+    @staticmethod
+    def _chunk_sum(chunk):
+        closers = openers = 0
+        for entry in chunk:
+            if entry is not None:
+                c, o = entry[2], entry[3]
+                closers += max(0, c - openers)
+                openers = o + max(0, openers - c)
+        return closers, openers
+
+    def _reindex(self):
+        starts, total = [], 0
+        for chunk in self.chunks:
+            starts.append(total)
+            total += len(chunk)
+        self.starts = starts
+        size = 1
+        while size < len(self.sums):
+            size *= 2
+        tree = [(0, 0)] * (2 * size)
+        tree[size:size + len(self.sums)] = self.sums
+        for node in range(size - 1, 0, -1):
+            (c1, o1), (c2, o2) = tree[2 * node], tree[2 * node + 1]
+            tree[node] = (c1 + max(0, c2 - o1), o2 + max(0, o1 - c2))
+        self.tree, self.size = tree, size
+
+    def _lex(self, line, state):
+        if state is None and not _BRACKET_TOKENS[self.mode].search(line):
+            return self.EMPTY
+        brackets, state = lex_brackets(line, state, self.mode)
+        if not brackets and state is None:
+            return self.EMPTY
+        return (brackets, state) + _bracket_balance(brackets)
+
+    def flush(self):
+        """Re-lex placeholder lines, continuing until the lexer state re-converges"""
+        if self.full:
+            state = None
+            entries = []
+            for line in self.text.get('1.0', 'end-1c').split('\n'):
+                entry = self._lex(line, state)
+                state = entry[1]
+                entries.append(entry)
+            self.chunks = [entries[i:i + self.CHUNK] for i in range(0, len(entries), self.CHUNK)]
+            self.sums = [self._chunk_sum(chunk) for chunk in self.chunks]
+            self._reindex()
+            self.full = False
+            self.dirty = None
+            return
+        if not self.dirty:
+            return
+        lo, hi = self.dirty
+        self.dirty = None
+        total = self._lines()
+        line = lo - 1
+        state = self._entry(line - 1)[1] if line > 0 else None
+        touched = set()
+        while line < total:
+            stop = min(total, max(hi, line + self.CHUNK))
+            for chars in self.text.get(f'{line + 1}.0', f'{stop}.0 lineend').split('\n'):
+                k, i = self._locate(line)
+                old = self.chunks[k][i]
+                entry = self._lex(chars, state)
+                self.chunks[k][i] = entry
+                touched.add(k)
+                state = entry[1]
+                line += 1
+                if line >= hi and old is not None and old[1] == state:
+                    break
+            else:
+                continue
+            break
+        for k in touched:
+            self.sums[k] = self._chunk_sum(self.chunks[k])
+        self._reindex()
+
+    # ── queries ───────────────────────────────────────────────────────────
+    def line(self, line):
+        """((col, char), ...) of the brackets counted on 1-based line"""
+        self.flush()
+        return self._entry(line - 1)[0]
+
+    def _find_forward(self, line, need):
+        """First line > line where need unmatched closers are reached, and the need left for it"""
+        k, i = self._locate(line)
+        chunk = self.chunks[k]
+        for j in range(i + 1, len(chunk)):
+            c, o = chunk[j][2], chunk[j][3]
+            if c >= need:
+                return self.starts[k] + j, need
+            need += o - c
+        # Walk the tree nodes covering chunks k+1.. left to right
+        lo, hi = k + 1 + self.size, 2 * self.size
+        left_nodes, right_nodes = [], []
+        while lo < hi:
+            if lo & 1:
+                left_nodes.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right_nodes.append(hi)
+            lo //= 2
+            hi //= 2
+        for node in left_nodes + right_nodes[::-1]:
+            c, o = self.tree[node]
+            if c < need:
+                need += o - c
+                continue
+            while node < self.size:
+                c, o = self.tree[2 * node]
+                if c >= need:
+                    node = 2 * node
+                else:
+                    need += o - c
+                    node = 2 * node + 1
+            k = node - self.size
+            for j, entry in enumerate(self.chunks[k]):
+                if entry[2] >= need:
+                    return self.starts[k] + j, need
+                need += entry[3] - entry[2]
+        return None, need
+
+    def _find_backward(self, line, need):
+        """Last line < line where need unmatched openers are reached, and the need left for it"""
+        k, i = self._locate(line)
+        chunk = self.chunks[k]
+        for j in range(i - 1, -1, -1):
+            c, o = chunk[j][2], chunk[j][3]
+            if o >= need:
+                return self.starts[k] + j, need
+            need += c - o
+        lo, hi = self.size, k + self.size
+        left_nodes, right_nodes = [], []
+        while lo < hi:
+            if lo & 1:
+                left_nodes.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right_nodes.append(hi)
+            lo //= 2
+            hi //= 2
+        for node in right_nodes + left_nodes[::-1]:
+            c, o = self.tree[node]
+            if o < need:
+                need += c - o
+                continue
+            while node < self.size:
+                c, o = self.tree[2 * node + 1]
+                if o >= need:
+                    node = 2 * node + 1
+                else:
+                    need += c - o
+                    node = 2 * node
+            k = node - self.size
+            for j in range(len(self.chunks[k]) - 1, -1, -1):
+                entry = self.chunks[k][j]
+                if entry[3] >= need:
+                    return self.starts[k] + j, need
+                need += entry[2] - entry[3]
+        return None, need
+
+    def _scan_forward(self, brackets, need):
+        for col, ch in brackets:
+            need += 1 if ch in '([{' else -1
+            if need == 0:
+                return (col, ch), 0
+        return None, need
+
+    def _scan_backward(self, brackets, need):
+        for col, ch in reversed(brackets):
+            need += -1 if ch in '([{' else 1
+            if need == 0:
+                return (col, ch), 0
+        return None, need
+
+    def match(self, line, col):
+        """(line, col, char) of the bracket matching the one at line.col, or None"""
+        self.flush()
+        entry = self._entry(line - 1)
+        bracket = next((ch for c, ch in entry[0] if c == col), None)
+        if bracket is None:
+            return None
+        if bracket in '([{':
+            found, need = self._scan_forward([b for b in entry[0] if b[0] > col], 1)
+            row = line - 1
+            while found is None:
+                row, need = self._find_forward(row, need)
+                if row is None:
+                    return None
+                found, need = self._scan_forward(self._entry(row)[0], need)
+        else:
+            found, need = self._scan_backward([b for b in entry[0] if b[0] < col], 1)
+            row = line - 1
+            while found is None:
+                row, need = self._find_backward(row, need)
+                if row is None:
+                    return None
+                found, need = self._scan_backward(self._entry(row)[0], need)
+        return row + 1, found[0], found[1]
+
+    def enclosing(self, line, col):
+        """(open_line, open_col, close_line, close_col) of the innermost pair around line.col"""
+        self.flush()
+        entry = self._entry(line - 1)
+        found, need = self._scan_backward([b for b in entry[0] if b[0] < col], 1)
+        row = line - 1
+        while found is None:
+            row, need = self._find_backward(row, need)
+            if row is None:
+                return None
+            found, need = self._scan_backward(self._entry(row)[0], need)
+        close = self.match(row + 1, found[0])
+        if close is None:
+            return None
+        return row + 1, found[0], close[0], close[1]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# FOLDING
+# ══════════════════════════════════════════════════════════════════════════════
+
+class FoldIndex:
+    """Foldable regions of a tab: indented blocks, or multi-line bracket pairs for C-like modes.
+
+    Lines are cached as their indent width (-1 for blank and comment lines);
+    edits splice placeholders in and only those lines are measured again.
+    The tab's BracketIndex says which lines continue a bracket or string, so
+    a wrapped call does not end the block it sits in, and it supplies the
+    regions outright for brackets-delimited languages. A region is
+    (header, end): the lines header+1..end are what folding hides.
+    """
+
+    def __init__(self, text, brackets):
+        self.text = text
+        self.brackets = brackets
+        self.indents = []     # per line indent, -1 if blank/comment, None until measured
+        self.dirty = None
+        self.full = True
+        self._cache = None    # (key, levels, regions) for the buffer as of key
+        text.add_edit_listener(self.on_edit)
+
+    def invalidate(self):
+        self.indents = []
+        self.dirty = None
+        self.full = True
+        self._cache = None
+
+    @property
+    def by_indent(self):
+        return self.brackets.mode != 'c'
+
+    def on_edit(self, start, removed, added):
+        if self.full:
+            return
+        self.indents[start - 1:start + removed] = [None] * (added + 1)
+        lo, hi = start, start + added
+        if self.dirty:
+            lo = min(lo, remap_line(self.dirty[0], start, removed, added))
+            hi = max(hi, remap_line(self.dirty[1], start, removed, added))
+        self.dirty = (lo, hi)
+
+    @staticmethod
+    def _indent(line):
+        stripped = line.lstrip(' \t')
+        if not stripped or stripped[0] == '#':
+            return -1
+        return len(line[:len(line) - len(stripped)].expandtabs(8))
+
+    def flush(self):
+        if self.full:
+            self.indents = [self._indent(line) for line in self.text.get('1.0', 'end-1c').split('\n')]
+            self.full, self.dirty = False, None
+        elif self.dirty:
+            lo, hi = self.dirty
+            self.dirty = None
+            hi = min(hi, len(self.indents))
+            lines = self.text.get(f'{lo}.0', f'{hi}.0 lineend').split('\n')
+            self.indents[lo - 1:hi] = [self._indent(line) for line in lines]
+
+    def _level(self, line):
+        """What line starts inside: True for a multi-line string, else the innermost
+        open bracket as (line, col), or None; an opener that never closes is no bracket"""
+        if line > 1 and self.brackets._entry(line - 2)[1]:
+            return True
+        block = self.brackets.enclosing(line, 0)
+        return block and block[:2]
+
+    def _levels(self):
+        """_level() of every line in one pass over the bracket index"""
+        tops = []
+        stack = []
+        state = None
+        for chunk in self.brackets.chunks:
+            for n, (brackets, end_state, _, _) in enumerate(chunk, len(tops) + 1):
+                tops.append(True if state else (stack[-1] if stack else None))
+                for col, ch in brackets:
+                    if ch in '([{':
+                        stack.append((n, col))
+                    elif stack:
+                        stack.pop()
+                state = end_state
+        # an unclosed opener has only unclosed ones beneath it on the stack
+        unclosed = set(stack)
+        return [None if top in unclosed else top for top in tops]
+
+    def _indent_region(self, line, level):
+        """Header line plus its continuation lines and the block indented under it"""
+        indents = self.indents
+        base = indents[line - 1]
+        outer = level(line)
+        if base < 0 or outer is True:
+            return None
+        end = None
+        for n in range(line + 1, len(indents) + 1):
+            indent = indents[n - 1]
+            if indent < 0:
+                continue
+            inner = level(n)
+            if inner is True or (inner is not None and inner >= (line, 0)):
+                end = n           # inside a string or bracket opened since the header
+                continue
+            if inner != outer or indent <= base:
+                break
+            end = n
+        return (line, end) if end else None
+
+    def region_at(self, line):
+        """(header, end) of the region headed by line, or None"""
+        self.flush()
+        self.brackets.flush()
+        if not 1 <= line <= len(self.indents):
+            return None
+        if self.by_indent:
+            cached = self._cached()
+            if cached:
+                return self._indent_region(line, lambda n: cached[0][n - 1])
+            return self._indent_region(line, self._level)
+        found = []
+        for col, ch in self.brackets.line(line):
+            if ch in '([{':
+                found.append(col)
+            elif found:
+                found.pop()
+        close = found and self.brackets.match(line, found[0])
+        return (line, close[0] - 1) if close and close[0] - 1 > line else None
+
+    def _cached(self):
+        """(levels, regions) if nothing changed since regions() last ran"""
+        key = (self.text.edit_generation, self.brackets.mode)
+        if self._cache and self._cache[0] == key:
+            return self._cache[1:]
+        return None
+
+    def regions(self):
+        """Every region as (header, end, depth), ordered by header"""
+        self.flush()
+        self.brackets.flush()
+        cached = self._cached()
+        if cached:
+            return list(cached[1])
+        levels = None
+        found = []
+        if self.by_indent:
+            levels = self._levels()
+            for line in range(1, len(self.indents) + 1):
+                region = self._indent_region(line, lambda n: levels[n - 1])
+                if region:
+                    found.append(region)
+        else:
+            ends = {}
+            stack = []
+            for k, chunk in enumerate(self.brackets.chunks):
+                for n, entry in enumerate(chunk, self.brackets.starts[k] + 1):
+                    for col, ch in entry[0]:
+                        if ch in '([{':
+                            stack.append(n)
+                        elif stack:
+                            opened = stack.pop()
+                            if n - 1 > opened:
+                                ends[opened] = max(ends.get(opened, 0), n - 1)
+            found = sorted(ends.items())
+        regions, open_ends = [], []
+        for header, end in found:
+            while open_ends and open_ends[-1] < header:
+                open_ends.pop()
+            regions.append((header, end, len(open_ends)))
+            open_ends.append(end)
+        self._cache = ((self.text.edit_generation, self.brackets.mode), levels, regions)
+        return list(regions)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# UNDO HISTORY
+# ══════════════════════════════════════════════════════════════════════════════
+
+class UndoHistory:
+    """Coalescing, memory-bounded undo/redo that replaces Tk's built-in stack.
+
+    Edits are recorded as ('i' | 'd', index, text) ops. Typed characters and
+    backspaces on one line merge into word-sized steps, and a newline ends
+    the step. Steps older than RAW_STEPS are zlib-compressed when large, and
+    the oldest are dropped once the tab exceeds its byte budget. Each undo
+    or redo touches only one step, whatever the history length.
+    """
+
+    COMMANDS = ('undo', 'redo', 'separator', 'reset', 'canundo', 'canredo')
+    BUDGET = 8 * 1024 * 1024
+    RAW_STEPS = 64
+    COMPRESS_MIN = 4096
+    OP_OVERHEAD = 48
+
+    def __init__(self, text, budget=BUDGET):
+        self.text = text
+        self.budget = budget
+        self.undo_stack = collections.deque()   # [step, size]; step is a list of ops or zlib bytes
+        self.redo_stack = collections.deque()
+        self.undo_bytes = 0
+        self.redo_bytes = 0
+        self.open = None
+        self.group_depth = 0
+        self.applying = False
+        self.dropped = 0
+
+    def handle(self, command):
+        if command == 'undo':
+            self.undo()
+        elif command == 'redo':
+            self.redo()
+        elif command == 'separator':
+            if not self.group_depth:
+                self.close()
+        elif command == 'reset':
+            self.clear()
+        elif command == 'canundo':
+            return bool(self.undo_stack or self.open)
+        elif command == 'canredo':
+            return bool(self.redo_stack)
+        return None
+
+    def _raw(self, *args):
+        return self.text.tk.call((self.text._orig,) + args)
+
+    def describe(self, args):
+        """Ops for an insert/delete/replace widget command, taken before it runs"""
+        ops = []
+        if args[0] in ('delete', 'replace'):
+            start = self._raw('index', args[1])
+            if args[0] == 'replace' or len(args) > 2:
+                end = self._raw('index', args[2])
+            else:
+                end = self._raw('index', f'{start}+1c')
+            if self._raw('compare', end, '==', 'end'):
+                end = self._raw('index', 'end-1c')
+            if self._raw('compare', start, '<', end):
+                ops.append(('d', start, self._raw('get', start, end)))
+            if args[0] == 'replace':
+                chars = ''.join(args[3::2])
+                if chars:
+                    ops.append(('i', start, chars))
+        else:
+            index = self._raw('index', args[1])
+            if self._raw('compare', index, '==', 'end'):
+                index = self._raw('index', 'end-1c')
+            chars = ''.join(args[2::2])
+            if chars:
+                ops.append(('i', index, chars))
+        return ops
+
+    def record(self, ops):
+        self.redo_stack.clear()
+        self.redo_bytes = 0
+        if self.open is None:
+            self.open = list(ops)
+        elif self.group_depth:
+            self.open.extend(ops)
+        elif not (len(ops) == 1 and self._merge(ops[0])):
+            self.close()
+            self.open = list(ops)
+
+    def _merge(self, op):
+        """Fold a single typed character or backspace into the open step"""
+        if len(self.open) != 1:
+            return False
+        kind, index, chars = op
+        last_kind, last_index, last_chars = self.open[0]
+        if kind != last_kind or '\n' in last_chars or tk_length(chars) > 2 or len(chars) != 1:
+            return False
+        line, col = index.split('.')
+        last_line, last_col = last_index.split('.')
+        if line != last_line:
+            return False
+        col, last_col = int(col), int(last_col)
+        if kind == 'i':
+            if col != last_col + tk_length(last_chars) or (not chars.isspace() and last_chars[-1].isspace()):
+                return False
+            self.open[0] = ('i', last_index, last_chars + chars)
+        elif col == last_col:
+            if not chars.isspace() and last_chars[-1].isspace():
+                return False
+            self.open[0] = ('d', last_index, last_chars + chars)
+        elif col + tk_length(chars) == last_col:
+            if not chars.isspace() and last_chars[0].isspace():
+                return False
+            self.open[0] = ('d', index, chars + last_chars)
+        else:
+            return False
+        return True
+
+    def close(self):
+        if self.open:
+            self._push(self.open)
+        self.open = None
+
+    def begin_group(self):
+        if not self.group_depth:
+            self.close()
+        self.group_depth += 1
+
+    def end_group(self):
+        self.group_depth -= 1
+        if not self.group_depth:
+            self.close()
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.undo_bytes = self.redo_bytes = 0
+        self.open = None
+
+    @classmethod
+    def _size(cls, step):
+        if isinstance(step, bytes):
+            return len(step)
+        return sum(len(chars) + cls.OP_OVERHEAD for _, _, chars in step)
+
+    @staticmethod
+    def _ops(step):
+        if isinstance(step, bytes):
+            return [tuple(op) for op in json.loads(zlib.decompress(step))]
+        return step
+
+    def _push(self, step, size=None):
+        size = self._size(step) if size is None else size
+        self.undo_stack.append([step, size])
+        self.undo_bytes += size
+        if len(self.undo_stack) > self.RAW_STEPS:
+            entry = self.undo_stack[-self.RAW_STEPS - 1]
+            if not isinstance(entry[0], bytes) and entry[1] >= self.COMPRESS_MIN:
+                entry[0] = zlib.compress(json.dumps(entry[0]).encode('utf-8', 'surrogatepass'))
+                self.undo_bytes += len(entry[0]) - entry[1]
+                entry[1] = len(entry[0])
+        self.trim(self.budget, keep=1)
+
+    def trim(self, budget, keep=0):
+        """Drop the oldest undo steps until the history fits in budget bytes"""
+        while self.undo_bytes + self.redo_bytes > budget and len(self.undo_stack) > keep:
+            _, dropped = self.undo_stack.popleft()
+            self.undo_bytes -= dropped
+            self.dropped += 1
+
+    def undo(self):
+        self.close()
+        if not self.undo_stack:
+            return
+        step, size = self.undo_stack.pop()
+        self.undo_bytes -= size
+        self._apply(self._ops(step), undo=True)
+        self.redo_stack.append([step, size])
+        self.redo_bytes += size
+
+    def redo(self):
+        self.close()
+        if not self.redo_stack:
+            return
+        step, size = self.redo_stack.pop()
+        self.redo_bytes -= size
+        self._apply(self._ops(step), undo=False)
+        self._push(step, size)
+
+    def _apply(self, ops, undo):
+        cursor = None
+        self.applying = True
+        try:
+            with self.text.batch():
+                for kind, index, chars in (reversed(ops) if undo else ops):
+                    if (kind == 'i') == undo:
+                        self.text.delete(index, f'{index}+{tk_length(chars)}c')
+                        cursor = index
+                    else:
+                        self.text.insert(index, chars)
+                        cursor = f'{index}+{tk_length(chars)}c'
+        finally:
+            self.applying = False
+        if cursor:
+            self.text.mark_set('insert', cursor)
+            self.text.see('insert')
+
+    def memory(self):
+        return self.undo_bytes + self.redo_bytes + (self._size(self.open) if self.open else 0)
+
+    def export(self, content, limit=1024 * 1024):
+        """Newest steps up to limit bytes, tagged with the content they apply to"""
+        self.close()
+        steps, total = [], 0
+        for step, size in reversed(self.undo_stack):
+            if total + size > limit:
+                break
+            steps.append(self._ops(step))
+            total += size
+        steps.reverse()
+        payload = zlib.compress(json.dumps(steps).encode('utf-8', 'surrogatepass'))
+        return {'content': content_fingerprint(content), 'steps': base64.b64encode(payload).decode('ascii')}
+
+    def restore(self, data, content):
+        """Reload exported steps if they were taken against this exact content"""
+        if not data or data.get('content') != content_fingerprint(content):
+            return
+        try:
+            steps = json.loads(zlib.decompress(base64.b64decode(data['steps'])))
+        except (ValueError, zlib.error, KeyError):
+            return
+        self.clear()
+        for step in steps:
+            self._push([tuple(op) for op in step])
+
+
+def content_fingerprint(content):
+    return f"{zlib.crc32(content.encode('utf-8', 'surrogatepass')):08x}:{len(content)}"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# EDITOR TAB
+# ══════════════════════════════════════════════════════════════════════════════
+
+class EditorTab(tk.Frame):
+    LONG_LINE_LIMIT = 10000     # lines longer than this open collapsed
+    LONG_LINE_KEEP = 1000       # chars of a collapsed line that stay laid out
+
+    def __init__(self, master, theme, *args, **kwargs):
+        super().__init__(master, *args, **kwargs)
+        self.filename = None
+        self.theme = theme
+        self.language = 'Text'
+        self.modified = False
+        self.loaded = True
+        self.pending_state = None
+        self.watched = False
+        self.conflict_prompt = False
+        self.hibernated = False
+        self.last_active = time.monotonic()
+        self._memory = None
+        
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+
+        # Scrollbars
+        self.v_scroll = ttk.Scrollbar(self, orient="vertical")
+        self.v_scroll.grid(row=0, column=2, sticky="ns")
+        self.h_scroll = ttk.Scrollbar(self, orient="horizontal")
+        self.h_scroll.grid(row=1, column=0, columnspan=2, sticky="ew")
+
+        # Line numbers
+        self.line_nums = tk.Text(self, width=5, padx=4, takefocus=0, border=0,
+                                 bg=theme['line_bg'], fg=theme['line_fg'],
+                                 state='disabled', wrap='none', font=("Consolas", 11))
+        self.line_nums.grid(row=0, column=0, sticky="ns")
+        self.line_nums.tag_config('diag_error', background='#5a1d1d', foreground='#f48771')
+        self.line_nums.tag_config('diag_warning', foreground='#cca700')
+        self.line_nums.tag_config('diag_info', foreground='#3794ff')
+        self.line_nums.tag_config('diff_add', background='#2f6f3f')
+        self.line_nums.tag_config('diff_mod', background='#2b5797')
+        self.line_nums.tag_config('diff_del', background='#8b2b2b')
+        self.line_nums.tag_config('long_line', foreground='#ffcc66', underline=True)
+        self.line_nums.tag_bind('long_line', '<Button-1>', self._on_gutter_expand)
+        self.line_nums.tag_config('folded', elide=True)
+        self.line_nums.tag_config('fold_header', background='#3a3d5c')
+        self.line_nums.tag_bind('fold_header', '<Button-1>', self._on_gutter_unfold)
+        self._gutter_count = 0
+        self.gutter_marks = {}
+
+        # Text area
+        self.text = CustomText(self, wrap="none", undo=False,
+                               bg=theme['text_bg'], fg=theme['text_fg'],
+                               insertbackground=theme['cursor'],
+                               selectbackground=theme['select_bg'],
+                               font=("Consolas", 11), tabs=("4c",))
+        self.text.grid(row=0, column=1, sticky="nsew")
+        self.text.tag_config('diag_underline', underline=True)
+        self.text.tag_config('long_tail', elide=True)
+        self.text.tag_config('long_more', background='#665500')
+        self.text.tag_bind('long_more', '<Button-1>', lambda e: self.expand_long_line('current'))
+        self.text.tag_config('bracket_scope', background='#262b33')
+        self.text.tag_config('bracket_match', background='#4b5563')
+        self.text.tag_config('bracket_bad', background='#5a1d1d', foreground='#f48771')
+        self.text.tag_lower('bracket_scope')
+        self.text.tag_config('folded', elide=True)
+        self.text.history = UndoHistory(self.text)
+
+        # Configure scrolling
+        self.text.config(yscrollcommand=self._on_yscroll, xscrollcommand=self.h_scroll.set)
+        self.v_scroll.config(command=self._scroll_both)
+        self.h_scroll.config(command=self.text.xview)
+
+        # Events
+        self.text.bind("<<Change>>", self._on_change)
+        self.text.bind("<Configure>", self._on_change)
+        self.text.bind("<Key>", self._on_key)
+        
+        # Symbol outline
+        self.symbols = SymbolIndex(self.text)
+        self._symbols_job = None
+        
+        # Background diagnostics
+        self.diagnostics = LiveDiagnostics(self)
+        
+        # Bracket pairs, matched around the cursor once the tab goes idle
+        self.brackets = BracketIndex(self.text)
+        self._brackets_job = None
+        
+        # Folded regions, each held by a pair of marks so it follows edits
+        self.folding = FoldIndex(self.text, self.brackets)
+        self.folds = set()
+        self._fold_seq = 0
+        self._fold_gen = None
+        
+        # Change markers against the saved text (see enable_diff)
+        self.diff = None
+        
+        # Completion list, created on first use and kept (see completion_popup)
+        self.completion = None
+        
+        self._on_change()
+
+    def _on_yscroll(self, first, last):
+        self.v_scroll.set(first, last)
+        self.line_nums.yview_moveto(first)
+        if self.diagnostics.marks:
+            self.diagnostics.schedule_viewport()
+        self.schedule_brackets()
+
+    def _scroll_both(self, *args):
+        self.text.yview(*args)
+        self.line_nums.yview(*args)
+
+    def _on_change(self, event=None):
+        self._update_line_nums()
+        if self.folds and self._fold_gen != self.text.edit_generation:
+            self._apply_folds()
+        self.event_generate("<<CursorChange>>")
+        if self.symbols.dirty or self.symbols.full:
+            if self._symbols_job:
+                self.after_cancel(self._symbols_job)
+            self._symbols_job = self.after(250, self.refresh_symbols)
+        self.diagnostics.schedule()
+        if self.gutter_marks.get('long'):
+            self._refresh_long_marks()
+        self.schedule_brackets()
+
+    def refresh_symbols(self):
+        self._symbols_job = None
+        if self.symbols.refresh():
+            self.event_generate("<<SymbolsChanged>>")
+
+    def schedule_brackets(self):
+        if not self._brackets_job:
+            self._brackets_job = self.after_idle(self.highlight_brackets)
+
+    def bracket_at(self, index='insert'):
+        """(line, col) of the bracket at index, else just before it, else None"""
+        for spot in (index, f'{index} -1c'):
+            if self.text.get(spot) in BRACKET_PAIRS:
+                line, col = map(int, self.text.index(spot).split('.'))
+                if any(c == col for c, _ in self.brackets.line(line)):
+                    return line, col
+        return None
+
+    def highlight_brackets(self):
+        """Mark the bracket pair at the cursor and shade its enclosing block within the viewport"""
+        self._brackets_job = None
+        for tag in ('bracket_match', 'bracket_bad', 'bracket_scope'):
+            self.text.tag_remove(tag, '1.0', 'end')
+        if not self.loaded or self.hibernated:
+            return
+        at = self.bracket_at()
+        if at:
+            line, col = at
+            other = self.brackets.match(line, col)
+            tag = 'bracket_match' if other and BRACKET_PAIRS[other[2]] == self.text.get(f'{line}.{col}') \
+                else 'bracket_bad'
+            self.text.tag_add(tag, f'{line}.{col}')
+            if other:
+                self.text.tag_add(tag, f'{other[0]}.{other[1]}')
+        line, col = map(int, self.text.index('insert').split('.'))
+        block = self.brackets.enclosing(line, col)
+        if block:
+            top = self.text.index('@0,0 linestart')
+            bottom = self.text.index(f'@0,{self.text.winfo_height()} lineend')
+            start, end = f'{block[0]}.{block[1] + 1}', f'{block[2]}.{block[3]}'
+            if self.text.compare(start, '<', top):
+                start = top
+            if self.text.compare(end, '>', bottom):
+                end = bottom
+            if self.text.compare(start, '<', end):
+                runs = self.visible_ranges(int(start.split('.')[0]), int(end.split('.')[0]))
+                for lo, hi in runs:
+                    self.text.tag_add('bracket_scope', max(start, f'{lo}.0', key=self._index_key),
+                                      min(end, self.text.index(f'{hi}.0 lineend'), key=self._index_key))
+
+    def jump_to_bracket(self):
+        """Move the cursor to the bracket matching the one at it, or to the enclosing opener"""
+        at = self.bracket_at()
+        if at:
+            target = self.brackets.match(*at)
+        else:
+            target = self.brackets.enclosing(*map(int, self.text.index('insert').split('.')))
+        if not target:
+            return False
+        index = f'{target[0]}.{target[1]}'
+        self.ensure_visible(index)
+        self.text.mark_set('insert', index)
+        self.text.see(index)
+        return True
+
+    @staticmethod
+    def _index_key(index):
+        line, col = index.split('.')
+        return int(line), int(col)
+
+    # ── folding ───────────────────────────────────────────────────────────
+    def _add_fold(self, header, end):
+        self._fold_seq += 1
+        n = self._fold_seq
+        self.text.mark_set(f'fold{n}s', f'{header + 1}.0')
+        self.text.mark_set(f'fold{n}e', f'{end + 1}.0')
+        self.text.mark_gravity(f'fold{n}e', 'left')
+        self.folds.add(n)
+
+    def _drop_fold(self, n):
+        self.folds.discard(n)
+        self.text.mark_unset(f'fold{n}s', f'fold{n}e')
+
+    def _fold_span(self, n):
+        """(first hidden line, first line shown again) of fold n, or None once edits broke it"""
+        start = self._index_key(self.text.index(f'fold{n}s'))
+        stop = self._index_key(self.text.index(f'fold{n}e'))
+        if start[1] or stop[1] or stop[0] <= start[0]:
+            return None
+        return start[0], stop[0]
+
+    def _apply_folds(self):
+        """Elide the folded lines in text and gutter alike and mark the visible fold headers"""
+        self._fold_gen = self.text.edit_generation
+        self.text.tag_remove('folded', '1.0', 'end')
+        self.line_nums.tag_remove('folded', '1.0', 'end')
+        spans = {}
+        for n in sorted(self.folds):
+            span = self._fold_span(n)
+            if span is None or span[0] in spans:
+                self._drop_fold(n)
+            else:
+                spans[span[0]] = span[1]
+        headers = {}
+        reach = 0
+        for start in sorted(spans):
+            if start < reach:
+                continue           # nested in a fold that is already hidden
+            reach = spans[start]
+            self.text.tag_add('folded', f'{start}.0', f'{reach}.0')
+            self.line_nums.tag_add('folded', f'{start}.0', f'{reach}.0')
+            headers[start - 1] = 'fold_header'
+        self.set_gutter_marks('fold', headers)
+        if 'folded' in self.text.tag_names('insert'):
+            self.text.mark_set('insert', f"{self.text.tag_prevrange('folded', 'insert +1c')[0]} -1c")
+
+    def fold(self, index='insert'):
+        """Fold the region headed by index's line, else the innermost one around it"""
+        line = int(self.text.index(index).split('.')[0])
+        region = self.folding.region_at(line)
+        if region is None:
+            around = [r for r in self.folding.regions() if r[0] < line <= r[1]]
+            if not around:
+                return False
+            region = around[-1][:2]
+        self._add_fold(*region)
+        self._apply_folds()
+        return True
+
+    def unfold(self, index='insert'):
+        """Unfold every fold headed by or hiding index's line"""
+        line = int(self.text.index(index).split('.')[0])
+        hit = []
+        for n in self.folds:
+            span = self._fold_span(n)
+            if span and span[0] - 1 <= line < span[1]:
+                hit.append(n)
+        for n in hit:
+            self._drop_fold(n)
+        if hit:
+            self._apply_folds()
+        return bool(hit)
+
+    def fold_all(self, level=None):
+        """Fold every region, or with level only the regions nested level-1 deep"""
+        for n in list(self.folds):
+            self._drop_fold(n)
+        for header, end, depth in self.folding.regions():
+            if level is None or depth == level - 1:
+                self._add_fold(header, end)
+        self._apply_folds()
+
+    def unfold_all(self):
+        if self.folds:
+            for n in list(self.folds):
+                self._drop_fold(n)
+            self._apply_folds()
+
+    def visible_ranges(self, first, last):
+        """Runs of lines (lo, hi) within first..last that no fold hides"""
+        if not self.folds:
+            return [(first, last)]
+        runs = []
+        line = first
+        while line <= last:
+            found = self.text.tag_nextrange('folded', f'{line}.0', f'{last}.0 lineend')
+            if not found:
+                runs.append((line, last))
+                break
+            lo, hi = (int(str(index).split('.')[0]) for index in found)
+            if lo > line:
+                runs.append((line, lo - 1))
+            line = max(hi, line + 1)
+        return runs
+
+    def _on_gutter_unfold(self, event):
+        line = self.line_nums.index(f'@{event.x},{event.y}').split('.')[0]
+        self.unfold(f'{line}.0')
+
+    def _on_key(self, event=None):
+        if event and event.keysym not in ('Shift_L', 'Shift_R', 'Control_L', 'Control_R', 'Alt_L', 'Alt_R'):
+            self.modified = True
+
+    def _update_line_nums(self):
+        line_count = int(self.text.index('end-1c').split('.')[0])
+        if line_count != self._gutter_count:
+            self.line_nums.config(state='normal')
+            if line_count > self._gutter_count:
+                txt = ''.join(f"{i}\n" for i in range(self._gutter_count + 1, line_count + 1))
+                self.line_nums.insert('end-1c', txt)
+            else:
+                self.line_nums.delete(f'{line_count + 1}.0', 'end-1c')
+            self.line_nums.config(state='disabled')
+            self._gutter_count = line_count
+        self.line_nums.yview_moveto(self.text.yview()[0])
+
+    def set_gutter_marks(self, kind, marks):
+        """Replace the gutter tags owned by kind with marks ({line: tag})"""
+        for tag in set(self.gutter_marks.get(kind, {}).values()):
+            self.line_nums.tag_remove(tag, '1.0', 'end')
+        self.gutter_marks[kind] = marks
+        for line, tag in marks.items():
+            self.line_nums.tag_add(tag, f'{line}.0', f'{line}.0 lineend')
+
+    def collapse_long_lines(self, content):
+        """Elide the tails of very long lines so Tk only lays out their head"""
+        self.text.tag_remove('long_tail', '1.0', 'end')
+        self.text.tag_remove('long_more', '1.0', 'end')
+        if len(content) > self.LONG_LINE_LIMIT:
+            for n, chars in enumerate(content.split('\n'), 1):
+                if len(chars) > self.LONG_LINE_LIMIT:
+                    keep = tk_length(chars[:self.LONG_LINE_KEEP])
+                    self.text.tag_add('long_more', f'{n}.{keep - 1}', f'{n}.{keep}')
+                    self.text.tag_add('long_tail', f'{n}.{keep}', f'{n}.0 lineend')
+        self._refresh_long_marks()
+
+    def collapsed_at(self, index):
+        """Start of the elided tail on index's line, or None if the line is shown in full"""
+        line = self.text.index(index).split('.')[0]
+        found = self.text.tag_nextrange('long_tail', f'{line}.0', f'{line}.0 lineend')
+        return found[0] if found else None
+
+    def expand_long_line(self, index='insert'):
+        line = self.text.index(index).split('.')[0]
+        if self.collapsed_at(f'{line}.0') is None:
+            return False
+        self.text.tag_remove('long_tail', f'{line}.0', f'{line}.0 lineend')
+        self.text.tag_remove('long_more', f'{line}.0', f'{line}.0 lineend')
+        self._refresh_long_marks()
+        return True
+
+    def ensure_visible(self, index):
+        """Unfold around index and expand its line if index falls in its elided tail"""
+        if self.folds and 'folded' in self.text.tag_names(index):
+            self.unfold(index)
+        start = self.collapsed_at(index)
+        if start is not None and self.text.compare(index, '>=', start):
+            self.expand_long_line(index)
+
+    def _refresh_long_marks(self):
+        ranges = self.text.tag_ranges('long_tail')
+        marks = {int(str(ranges[i]).split('.')[0]): 'long_line' for i in range(0, len(ranges), 2)}
+        if marks or self.gutter_marks.get('long'):
+            self.set_gutter_marks('long', marks)
+
+    def _on_gutter_expand(self, event):
+        line = self.line_nums.index(f'@{event.x},{event.y}').split('.')[0]
+        self.expand_long_line(f'{line}.0')
+
+    def apply_theme(self, theme):
+        self.theme = theme
+        self.line_nums.config(bg=theme['line_bg'], fg=theme['line_fg'])
+        self.text.config(bg=theme['text_bg'], fg=theme['text_fg'],
+                         insertbackground=theme['cursor'], selectbackground=theme['select_bg'])
+
+    def detect_language(self):
+        if self.filename:
+            _, ext = os.path.splitext(self.filename)
+            self.language = LANG_MODES.get(ext.lower(), 'Text')
+        self.symbols.enabled = self.language == 'Python' or not self.filename
+        self.symbols.invalidate()
+        self.diagnostics.reset()
+        self.brackets.mode = BRACKET_MODES.get(self.language, 'plain' if self.filename else 'python')
+        self.brackets.invalidate()
+        self.folding.invalidate()
+
+    def memory(self):
+        """Rough bytes held by this tab, by part; buffer and tags are re-measured only after edits"""
+        key = (self.text.edit_generation, self.loaded, id(self.diff.base_lines) if self.diff else None)
+        if self._memory is None or self._memory[0] != key:
+            count = self.text.count('1.0', 'end-1c', 'chars')
+            chars = (count[0] if isinstance(count, tuple) else count) or 0
+            lines = int(self.text.index('end-1c').split('.')[0])
+            ranges = sum(len(self.text.tag_ranges(tag)) for tag in self.text.tag_names()) // 2
+            diff = 0
+            if self.diff:
+                diff = (len(self.diff.cur_ids) + len(self.diff.base_ids)) * 36 + \
+                    sum(len(line) + 49 for line in self.diff.base_lines)
+            # Tk keeps ~80 bytes of segment/line bookkeeping per line and ~48 per tag range
+            self._memory = (key, chars + lines * 80, ranges * 48, diff)
+        _, buffer, tags, diff = self._memory
+        analysis = diff + sum(len(block[2]) * 150 + 100 for block in self.symbols.blocks) + \
+            len(self.diagnostics.diags) * 200
+        return {'buffer': buffer, 'undo': self.text.history.memory(), 'tags': tags, 'analysis': analysis}
+
+    def completion_popup(self, provider):
+        if self.completion is None:
+            self.completion = CompletionPopup(self, provider)
+        return self.completion
+
+    def hibernate(self):
+        """Drop the buffer of a clean, file-backed tab; it is re-read when selected again"""
+        if not self.loaded or self.modified or not self.filename:
+            return False
+        state = self.snapshot(undo=True)
+        self.unfold_all()
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.history.clear()
+        self.symbols.invalidate()
+        self.diagnostics.reset()
+        self.brackets.invalidate()
+        self.folding.invalidate()
+        if self.diff:
+            self.diff.set_base('')
+        self.set_placeholder(state)
+        self.hibernated = True
+        return True
+
+    def set_placeholder(self, state):
+        """Show an empty read-only tab until its content arrives in the background"""
+        self.loaded = False
+        self.pending_state = state
+        self.text.config(state='disabled')
+
+    def load_content(self, content, cursor=None, yview=None, modified=False, undo=None):
+        """Fill the buffer and restore cursor and scroll position"""
+        self.unfold_all()
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', content)
+        self.collapse_long_lines(content)
+        self.text.edit_reset()
+        if undo:
+            self.text.history.restore(undo, content)
+        self.modified = modified
+        self.loaded = True
+        self.pending_state = None
+        if self.diff:
+            if modified and self.filename:
+                self.diff.load_base_from_disk()
+            else:
+                self.diff.set_base('' if modified else content)
+        if cursor:
+            self.text.mark_set('insert', cursor)
+        if yview is not None:
+            self.after_idle(lambda: self.text.yview_moveto(yview))
+        else:
+            self.text.see('insert')
+
+    def mark_saved(self):
+        self.modified = False
+        if self.diff:
+            self.diff.set_base_from_buffer()
+
+    def enable_diff(self):
+        if self.diff is None:
+            self.diff = TabDiff(self)
+            if self.filename and self.loaded and self.modified:
+                self.diff.load_base_from_disk()
+            elif self.filename and self.loaded:
+                self.diff.set_base_from_buffer()
+
+    def disable_diff(self):
+        if self.diff is not None:
+            self.diff.detach()
+            self.diff = None
+
+    def snapshot(self, undo=False):
+        """Session entry for this tab; unsaved buffers carry their content"""
+        if not self.loaded:
+            state = dict(self.pending_state)
+            if not undo:
+                state.pop('undo', None)
+            return state
+        state = {
+            'path': self.filename,
+            'cursor': self.text.index('insert'),
+            'yview': round(self.text.yview()[0], 6),
+        }
+        content = self.text.get('1.0', 'end-1c')
+        if self.modified or not self.filename:
+            if not content and not self.filename:
+                return None
+            state['content'] = content
+        if undo and (self.text.history.undo_stack or self.text.history.open):
+            state['undo'] = self.text.history.export(content)
+        return state
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# AI SIDEBAR
+# ══════════════════════════════════════════════════════════════════════════════
+
+class AISidebar(tk.Frame):
+    SEARCH_PREFIXES = ('where ', 'find ', 'search ', 'locate ', 'which ')
+
+    def __init__(self, master, theme, get_selected_code, search_code=None, open_location=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.theme = theme
+        self.get_selected_code = get_selected_code
+        self.search_code = search_code        # search_code(query, done) -> done(results or None)
+        self.open_location = open_location    # open_location(path, line)
+        self._links = 0
+        
+        self.config(bg=theme['sidebar_bg'])
+        
+        # Title
+        title = tk.Label(self, text="🤖 AI Assistant", font=("Segoe UI", 12, "bold"),
+                         bg=theme['sidebar_bg'], fg=theme['sidebar_fg'])
+        title.pack(pady=10, padx=10, anchor='w')
+        
+        # AI Tools buttons
+        tools_frame = tk.Frame(self, bg=theme['sidebar_bg'])
+        tools_frame.pack(fill='x', padx=10)
+        
+        self.btn_explain = tk.Button(tools_frame, text="📚 Explain", command=self._explain,
+                                     relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
+        self.btn_explain.pack(fill='x', pady=2)
+        
+        self.btn_debug = tk.Button(tools_frame, text="🐛 Debug", command=self._debug,
+                                   relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
+        self.btn_debug.pack(fill='x', pady=2)
+        
+        self.btn_refactor = tk.Button(tools_frame, text="🔄 Refactor", command=self._refactor,
+                                      relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
+        self.btn_refactor.pack(fill='x', pady=2)
+        
+        self.btn_docstring = tk.Button(tools_frame, text="📝 Docstring", command=self._docstring,
+                                       relief='flat', bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
+        self.btn_docstring.pack(fill='x', pady=2)
+        
+        # Separator
+        ttk.Separator(self, orient='horizontal').pack(fill='x', pady=10, padx=10)
+        
+        # Chat area
+        chat_label = tk.Label(self, text="💬 Chat", font=("Segoe UI", 10, "bold"),
+                              bg=theme['sidebar_bg'], fg=theme['sidebar_fg'])
+        chat_label.pack(anchor='w', padx=10)
+        
+        # Chat display
+        self.chat_display = scrolledtext.ScrolledText(self, height=15, wrap='word',
+                                                       bg=theme['chat_bg'], fg=theme['sidebar_fg'],
+                                                       font=("Consolas", 9))
+        self.chat_display.pack(fill='both', expand=True, padx=10, pady=5)
+        self.chat_display.config(state='disabled')
+        
+        # Chat input
+        input_frame = tk.Frame(self, bg=theme['sidebar_bg'])
+        input_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.chat_input = tk.Entry(input_frame, bg=theme['text_bg'], fg=theme['text_fg'],
+                                   insertbackground=theme['cursor'])
+        self.chat_input.pack(side='left', fill='x', expand=True)
+        self.chat_input.bind('<Return>', self._send_chat)
+        
+        self.btn_send = tk.Button(input_frame, text="→", command=self._send_chat,
+                                  bg=theme['toolbar_bg'], fg=theme['sidebar_fg'])
+        self.btn_send.pack(side='right', padx=2)
+        
+        # Welcome message
+        self._add_ai_message("🐱 Hi! I'm your local AI assistant.\nNo API needed - I work offline!\n\nSelect code and use the tools above,\nor ask me coding questions!")
+
+    def _add_user_message(self, msg):
+        self.chat_display.config(state='normal')
+        self.chat_display.insert('end', f"\n👤 You:\n{msg}\n", 'user')
+        self.chat_display.config(state='disabled')
+        self.chat_display.see('end')
+
+    def _add_ai_message(self, msg):
+        self.chat_display.config(state='normal')
+        self.chat_display.insert('end', f"\n🤖 AI:\n{msg}\n", 'ai')
+        self.chat_display.config(state='disabled')
+        self.chat_display.see('end')
+
+    def memory(self):
+        count = self.chat_display.count('1.0', 'end-1c', 'chars')
+        chars = (count[0] if isinstance(count, tuple) else count) or 0
+        return chars + int(self.chat_display.index('end-1c').split('.')[0]) * 80
+
+    def trim_transcript(self, keep):
+        """Drop the oldest chat lines so roughly keep chars remain"""
+        cut = self.chat_display.index(f'end-{keep}c linestart')
+        if self.chat_display.compare(cut, '<=', '2.0'):
+            return
+        self.chat_display.config(state='normal')
+        self.chat_display.delete('1.0', cut)
+        self.chat_display.insert('1.0', "… older messages trimmed\n", 'ai')
+        self.chat_display.config(state='disabled')
+
+    def _send_chat(self, event=None):
+        msg = self.chat_input.get().strip()
+        if msg:
+            self._add_user_message(msg)
+            if self.search_code and msg.lower().startswith(self.SEARCH_PREFIXES):
+                self.search_code(msg, lambda results: self._show_search_results(msg, results))
+            else:
+                response = AIAgent.chat_response(msg)
+                self._add_ai_message(response)
+            self.chat_input.delete(0, 'end')
+
+    def _show_search_results(self, query, results):
+        if results is None:
+            self._add_ai_message("⏳ Still indexing the workspace - try again in a moment.")
+            return
+        if not results:
+            self._add_ai_message(f"🔎 Nothing in the workspace matches \"{query}\".")
+            return
+        self._add_ai_message("🔎 Best matches (click to open):")
+        self.chat_display.config(state='normal')
+        for score, path, line, name in results:
+            self._links += 1
+            tag = f"link{self._links}"
+            self.chat_display.insert('end', f"  {os.path.basename(path)}:{line}  {name}", ('link', tag))
+            self.chat_display.insert('end', f"  ({score:.2f})\n", 'ai')
+            self.chat_display.tag_bind(tag, '<Button-1>', lambda e, p=path, l=line: self.open_location(p, l))
+        self.chat_display.tag_config('link', foreground='#3794ff', underline=True)
+        self.chat_display.tag_bind('link', '<Enter>', lambda e: self.chat_display.config(cursor='hand2'))
+        self.chat_display.tag_bind('link', '<Leave>', lambda e: self.chat_display.config(cursor=''))
+        self.chat_display.config(state='disabled')
+        self.chat_display.see('end')
+
+    def _explain(self):
+        code = self.get_selected_code()
         if code:
             self._add_user_message(f"Explain this code:\n{code[:100]}...")
             result = AIAgent.explain_code(code)
@@ -676,43 +2929,1652 @@ class AISidebar(tk.Frame):
         self.chat_input.config(bg=theme['text_bg'], fg=theme['text_fg'])
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# OUTLINE PANEL
+# ══════════════════════════════════════════════════════════════════════════════
+
+class OutlinePanel(tk.Frame):
+    """Tree of the current tab's classes, functions and methods"""
+
+    ICONS = {'class': '🔷', 'def': '🔹'}
+
+    def __init__(self, master, theme, goto_line, **kwargs):
+        super().__init__(master, **kwargs)
+        self.goto_line = goto_line
+        self.config(bg=theme['sidebar_bg'])
+        
+        self.title = tk.Label(self, text="🧭 Outline", font=("Segoe UI", 10, "bold"),
+                              bg=theme['sidebar_bg'], fg=theme['sidebar_fg'])
+        self.title.pack(pady=5, padx=10, anchor='w')
+        
+        self.tree = ttk.Treeview(self, show='tree', selectmode='browse')
+        self.tree.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self._lines = {}
+
+    def show(self, symbols):
+        self.tree.delete(*self.tree.get_children())
+        self._lines = {}
+        parents = {}
+        for name, kind, start, end, depth in symbols:
+            parent_name, _, short = name.rpartition('.')
+            parent = parents.get(parent_name, '')
+            item = self.tree.insert(parent, 'end', text=f"{self.ICONS.get(kind, '')} {short}", open=depth == 0)
+            parents[name] = item
+            self._lines[item] = start
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self._lines:
+            self.goto_line(self._lines[selection[0]])
+
+    def apply_theme(self, theme):
+        self.config(bg=theme['sidebar_bg'])
+        self.title.config(bg=theme['sidebar_bg'], fg=theme['sidebar_fg'])
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# WORKSPACE INDEX & QUICK OPEN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def fuzzy_score(query, candidate, floor=None):
+    """Score a lowercase subsequence match of query in candidate.
+
+    Returns -1 when query is not a subsequence, -2 when the match was cut
+    off early because it cannot beat floor, otherwise a score (higher wins).
+    """
+    base = candidate.rfind('/') + 1
+    remaining = len(query)
+    pos = prev = -2
+    score = 0
+    for ch in query:
+        pos = candidate.find(ch, pos + 1 if pos >= 0 else 0)
+        if pos < 0:
+            return -1
+        if pos == prev + 1:
+            score += 6
+        elif pos == 0 or candidate[pos - 1] in '/_-. ':
+            score += 4
+        if pos >= base:
+            score += 2
+        prev = pos
+        remaining -= 1
+        if floor is not None and score + remaining * 8 + 20 <= floor:
+            if candidate.find(query[-1], pos) < 0:
+                return -1
+            return -2
+    if query in candidate[base:]:
+        score += 20
+    return score - len(candidate) // 32
+
+
+class WorkspaceIndex:
+    """In-memory list of workspace file paths kept fresh by directory mtime polling"""
+
+    SKIP_DIRS = {'.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', 'venv',
+                 '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache'}
+    MAX_DIRS = 4000     # walks stop here, so launching from $HOME stays cheap to scan and poll
+
+    def __init__(self, root=None):
+        self.root = root or os.getcwd()
+        self.dirs = {}         # rel_dir -> (mtime, [file names], [subdir names])
+        self.files = []        # rel paths with '/' separators
+        self.files_lower = []
+        self.generation = 0
+        self.truncated = False
+        self._memory = (None, 0)
+
+    def memory(self):
+        if self._memory[0] != self.generation:
+            size = sum(len(f) for f in self.files) * 2 + len(self.files) * 130 + len(self.dirs) * 300
+            self._memory = (self.generation, size)
+        return self._memory[1]
+
+    def _scan_dir(self, rel):
+        full = os.path.join(self.root, rel) if rel else self.root
+        files, subdirs = [], []
+        try:
+            mtime = os.stat(full).st_mtime
+            with os.scandir(full) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.SKIP_DIRS:
+                                subdirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        pass
+        except OSError:
+            return None
+        return mtime, files, subdirs
+
+    def _scan_tree(self, rel, dirs):
+        stack = [rel]
+        while stack:
+            if len(dirs) >= self.MAX_DIRS:
+                self.truncated = True
+                return
+            rel = stack.pop()
+            info = self._scan_dir(rel)
+            if info is None:
+                continue
+            dirs[rel] = info
+            stack.extend(f"{rel}/{name}" if rel else name for name in info[2])
+
+    @staticmethod
+    def _drop_tree(rel, dirs):
+        prefix = rel + '/'
+        for key in [k for k in dirs if k == rel or k.startswith(prefix)]:
+            del dirs[key]
+
+    def scan(self):
+        """Full walk of the workspace; safe to run on a worker thread"""
+        dirs = {}
+        self._scan_tree('', dirs)
+        return dirs
+
+    def poll(self, dirs):
+        """Re-list only directories whose mtime changed; None if nothing did"""
+        new = None
+        for rel, (mtime, _, subdirs) in dirs.items():
+            if new is not None and rel not in new:
+                continue
+            full = os.path.join(self.root, rel) if rel else self.root
+            try:
+                if os.stat(full).st_mtime == mtime:
+                    continue
+            except OSError:
+                pass
+            if new is None:
+                new = dict(dirs)
+            info = self._scan_dir(rel)
+            if info is None:
+                self._drop_tree(rel, new)
+                continue
+            new[rel] = info
+            for name in set(subdirs) - set(info[2]):
+                self._drop_tree(f"{rel}/{name}" if rel else name, new)
+            for name in set(info[2]) - set(subdirs):
+                self._scan_tree(f"{rel}/{name}" if rel else name, new)
+        return new
+
+    def apply(self, dirs):
+        """Install a scan/poll result (Tk thread)"""
+        self.dirs = dirs
+        self.files = [f"{rel}/{name}" if rel else name
+                      for rel, (_, names, _) in dirs.items() for name in names]
+        self.files_lower = [path.lower() for path in self.files]
+        self.generation += 1
+
+    def full_path(self, rel):
+        return os.path.join(self.root, *rel.split('/'))
+
+
+class QuickOpenDialog(tk.Toplevel):
+    """Ctrl+P palette: fuzzy file matching, or '@name' for symbols in open tabs"""
+
+    TOP_K = 50
+    FRAME_BUDGET = 0.012
+    BATCH = 512
+
+    def __init__(self, master, index, get_symbols, open_path, open_symbol):
+        super().__init__(master)
+        self.index = index
+        self.get_symbols = get_symbols
+        self.open_path = open_path
+        self.open_symbol = open_symbol
+        
+        self.title("Quick Open")
+        self.geometry("520x360")
+        self.transient(master)
+        
+        self.entry = tk.Entry(self, font=("Consolas", 11))
+        self.entry.pack(fill='x', padx=5, pady=5)
+        self.listbox = tk.Listbox(self, font=("Consolas", 10), activestyle='none')
+        self.listbox.pack(fill='both', expand=True, padx=5)
+        self.status = tk.Label(self, anchor='w')
+        self.status.pack(fill='x', padx=5)
+        
+        self.results = []
+        self._job = None
+        self._query = None
+        self._last = None  # (query, generation, all matching indices) of the last finished scan
+        
+        self.entry.bind('<KeyRelease>', self._on_key)
+        self.entry.bind('<Return>', self._accept)
+        self.entry.bind('<Down>', lambda e: self._move(1))
+        self.entry.bind('<Up>', lambda e: self._move(-1))
+        self.entry.bind('<Escape>', lambda e: self.destroy())
+        self.listbox.bind('<Double-Button-1>', self._accept)
+        self.entry.focus_set()
+        self._search('')
+
+    def _on_key(self, event):
+        if event.keysym not in ('Up', 'Down', 'Return', 'Escape'):
+            self._search(self.entry.get())
+
+    def _search(self, query):
+        if self._job:
+            self.after_cancel(self._job)
+            self._job = None
+        query = query.strip().lower()
+        self._query = query
+        if query.startswith('@'):
+            name = query[1:]
+            self.results = [(label, item) for label, item in self.get_symbols()
+                            if not name or fuzzy_score(name, label.lower()) >= 0][:self.TOP_K]
+            self._render(f"{len(self.results)} symbols")
+            return
+        if not query:
+            self.results = [(path, path) for path in self.index.files[:self.TOP_K]]
+            self._render(f"{len(self.index.files)} files indexed")
+            return
+        last = self._last
+        if last and query.startswith(last[0]) and last[1] == self.index.generation:
+            pool = last[2]
+        else:
+            pool = range(len(self.index.files))
+        self._heap = []
+        self._matches = []
+        self._pool = pool
+        self._pos = 0
+        self._step()
+
+    def _step(self):
+        """Score candidates until the frame budget runs out, then yield to Tk"""
+        self._job = None
+        query, pool, heap, matches = self._query, self._pool, self._heap, self._matches
+        lower = self.index.files_lower
+        deadline = time.perf_counter() + self.FRAME_BUDGET
+        pos = self._pos
+        while pos < len(pool):
+            for idx in pool[pos:pos + self.BATCH]:
+                floor = heap[0][0] if len(heap) >= self.TOP_K else None
+                score = fuzzy_score(query, lower[idx], floor)
+                if score == -1:
+                    continue
+                matches.append(idx)
+                if score == -2:
+                    continue
+                if floor is None:
+                    heapq.heappush(heap, (score, -idx))
+                elif score > floor:
+                    heapq.heapreplace(heap, (score, -idx))
+            pos += self.BATCH
+            if time.perf_counter() > deadline:
+                break
+        self._pos = pos
+        files = self.index.files
+        self.results = [(files[-idx], files[-idx]) for _, idx in sorted(heap, reverse=True)]
+        if pos < len(pool):
+            self._render(f"searching… {pos}/{len(pool)}")
+            self._job = self.after(1, self._step)
+        else:
+            self._last = (query, self.index.generation, matches)
+            self._render(f"{len(matches)} matches")
+
+    def _render(self, status):
+        self.listbox.delete(0, 'end')
+        for label, _ in self.results:
+            self.listbox.insert('end', label)
+        if self.results:
+            self.listbox.select_set(0)
+        self.status.config(text=status)
+
+    def _move(self, step):
+        if self.results:
+            selection = self.listbox.curselection()
+            idx = max(0, min(len(self.results) - 1, (selection[0] if selection else 0) + step))
+            self.listbox.select_clear(0, 'end')
+            self.listbox.select_set(idx)
+            self.listbox.see(idx)
+        return 'break'
+
+    def _accept(self, event=None):
+        if not self.results:
+            return
+        selection = self.listbox.curselection()
+        _, item = self.results[selection[0] if selection else 0]
+        is_symbol = self._query.startswith('@')
+        self.destroy()
+        if is_symbol:
+            self.open_symbol(*item)
+        else:
+            self.open_path(self.index.full_path(item))
+
+    def destroy(self):
+        if self._job:
+            self.after_cancel(self._job)
+            self._job = None
+        super().destroy()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CODE SEARCH
+# ══════════════════════════════════════════════════════════════════════════════
+
+_IDENT_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_SUBWORD_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+SEARCH_STOPWORDS = {'self', 'cls', 'the', 'and', 'for', 'in', 'is', 'if', 'to', 'of', 'a', 'an', 'or',
+                    'not', 'none', 'true', 'false', 'return', 'def', 'class', 'import', 'from', 'as',
+                    'where', 'do', 'we', 'how', 'what', 'which', 'find', 'does', 'it', 'this', 'with'}
+
+
+def search_terms(text):
+    """Lowercase subwords of every identifier (camelCase and snake_case split) plus compound names"""
+    terms = []
+    for ident in _IDENT_RE.findall(text):
+        parts = [p.lower() for p in _SUBWORD_RE.findall(ident)]
+        terms.extend(p for p in parts if len(p) > 1 and p not in SEARCH_STOPWORDS)
+        if len(parts) > 1:
+            terms.append(ident.lower())
+    return terms
+
+
+def code_chunks(path, content, window=40):
+    """Split a file into (start_line, end_line, name, text) chunks.
+
+    Python files give one chunk per def/class plus a '<module>' chunk of
+    the lines outside every top-level definition; other files (and Python
+    that does not parse) are cut into fixed windows of lines.
+    """
+    lines = content.split('\n')
+    if path.endswith(('.py', '.pyw')):
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            tree = None
+        if tree is not None:
+            chunks = []
+            outside = [True] * len(lines)
+            pending = [(node, '') for node in reversed(tree.body)]
+            while pending:
+                node, scope = pending.pop()
+                if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    continue
+                name = f"{scope}{node.name}"
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                if isinstance(node, ast.ClassDef):
+                    methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+                    end = methods[0].lineno - 1 if methods else node.end_lineno
+                    pending.extend((n, f"{name}.") for n in reversed(node.body))
+                else:
+                    end = node.end_lineno
+                end = max(start, end)
+                chunks.append((start, end, name, '\n'.join(lines[start - 1:end])))
+                if not scope:
+                    outside[start - 1:node.end_lineno] = [False] * (node.end_lineno - start + 1)
+            rest = [n for n, line in enumerate(lines, 1) if outside[n - 1] and line.strip()]
+            if len(rest) > 5:
+                chunks.append((rest[0], rest[-1], '<module>', '\n'.join(lines[n - 1] for n in rest)))
+            return chunks
+    return [(i + 1, min(i + window, len(lines)), f"lines {i + 1}-{min(i + window, len(lines))}",
+             '\n'.join(lines[i:i + window])) for i in range(0, len(lines), window)]
+
+
+class CodeSearchIndex:
+    """Sparse TF-IDF index over function-level chunks of the workspace.
+
+    Each term has a posting list of parallel arrays (chunk ids, log-tf
+    weights). A query is scored term-at-a-time into one accumulator, so only
+    chunks sharing a term with it are touched, then divided by the chunk
+    norms and cut with heapq.nlargest. Re-indexing a file tombstones its old
+    chunks; postings are compacted once a third of them are dead. Norms use
+    the idf values of the last full recompute, redone when the chunk count
+    drifts by more than 10%.
+    """
+
+    EXTENSIONS = tuple(LANG_MODES)
+    MAX_FILE = 512 * 1024
+    NAME_BOOST = 3
+
+    def __init__(self, root=None):
+        self.root = root
+        self.lock = threading.Lock()
+        self.terms = {}          # term -> id
+        self.doc_ids = []        # term id -> array('I') chunk ids
+        self.doc_tfs = []        # term id -> array('f') 1 + log(tf)
+        self.df = array.array('I')
+        self.chunks = []         # chunk id -> (path, start, end, name) or None once dead
+        self.chunk_terms = []    # chunk id -> array('I') distinct term ids
+        self.norms = array.array('f')
+        self.files = {}          # path -> [chunk ids]
+        self.live = 0
+        self.dead = 0
+        self._norm_live = 0
+
+    def _term(self, term):
+        tid = self.terms.get(term)
+        if tid is None:
+            tid = self.terms[term] = len(self.doc_ids)
+            self.doc_ids.append(array.array('I'))
+            self.doc_tfs.append(array.array('f'))
+            self.df.append(0)
+        return tid
+
+    def _idf(self, tid):
+        return math.log((self.live + 1) / (self.df[tid] + 1)) + 1
+
+    def _add_file(self, path, content):
+        ids = []
+        for start, end, name, text in code_chunks(path, content):
+            counts = collections.Counter(search_terms(text))
+            for term in search_terms(name.replace('.', ' ')):
+                counts[term] += self.NAME_BOOST
+            cid = len(self.chunks)
+            self.chunks.append((path, start, end, name))
+            tids = array.array('I')
+            norm = 0.0
+            for term, count in counts.items():
+                tid = self._term(term)
+                weight = 1 + math.log(count)
+                self.doc_ids[tid].append(cid)
+                self.doc_tfs[tid].append(weight)
+                self.df[tid] += 1
+                tids.append(tid)
+                norm += (weight * self._idf(tid)) ** 2
+            self.chunk_terms.append(tids)
+            self.norms.append(math.sqrt(norm) or 1.0)
+            ids.append(cid)
+        self.files[path] = ids
+        self.live += len(ids)
+
+    def _drop_file(self, path):
+        for cid in self.files.pop(path, []):
+            self.chunks[cid] = None
+            for tid in self.chunk_terms[cid]:
+                self.df[tid] -= 1
+            self.chunk_terms[cid] = array.array('I')
+            self.live -= 1
+            self.dead += 1
+
+    def build(self, paths):
+        """Index every readable file in paths (used in a worker process)"""
+        for path in paths:
+            try:
+                if path.endswith(self.EXTENSIONS) and os.path.getsize(path) <= self.MAX_FILE:
+                    self._add_file(path, read_text_file(path))
+            except OSError:
+                continue
+        self._recompute_norms()
+        return self
+
+    def update_file(self, path, content):
+        with self.lock:
+            self._drop_file(path)
+            if path.endswith(self.EXTENSIONS) and len(content) <= self.MAX_FILE:
+                self._add_file(path, content)
+            self._maintain()
+
+    def remove_file(self, path):
+        with self.lock:
+            if path in self.files:
+                self._drop_file(path)
+                self._maintain()
+
+    def refresh_files(self, changes):
+        """Apply {path: content}; None means re-read from disk, dropping files that are gone"""
+        for path, content in changes.items():
+            if content is None:
+                try:
+                    if os.path.getsize(path) > self.MAX_FILE:
+                        raise OSError("too large")
+                    content = read_text_file(path)
+                except OSError:
+                    self.remove_file(path)
+                    continue
+            self.update_file(path, content)
+
+    def _maintain(self):
+        if self.dead * 3 > len(self.chunks):
+            self._compact()
+        elif abs(self.live - self._norm_live) * 10 > self._norm_live:
+            self._recompute_norms()
+
+    def _recompute_norms(self):
+        norms = [0.0] * len(self.chunks)
+        for tid, (ids, tfs) in enumerate(zip(self.doc_ids, self.doc_tfs)):
+            if not self.df[tid]:
+                continue
+            idf = self._idf(tid)
+            for cid, weight in zip(ids, tfs):
+                norms[cid] += (weight * idf) ** 2
+        self.norms = array.array('f', (math.sqrt(n) or 1.0 for n in norms))
+        self._norm_live = self.live
+
+    def _compact(self):
+        """Renumber live chunks and drop tombstoned postings"""
+        remap = {}
+        chunks, chunk_terms = [], []
+        for cid, chunk in enumerate(self.chunks):
+            if chunk is not None:
+                remap[cid] = len(chunks)
+                chunks.append(chunk)
+                chunk_terms.append(self.chunk_terms[cid])
+        for tid in range(len(self.doc_ids)):
+            ids, tfs = array.array('I'), array.array('f')
+            for cid, weight in zip(self.doc_ids[tid], self.doc_tfs[tid]):
+                if cid in remap:
+                    ids.append(remap[cid])
+                    tfs.append(weight)
+            self.doc_ids[tid], self.doc_tfs[tid] = ids, tfs
+        self.chunks, self.chunk_terms = chunks, chunk_terms
+        self.files = {path: [remap[c] for c in ids] for path, ids in self.files.items()}
+        self.dead = 0
+        self._recompute_norms()
+
+    def search(self, query, k=8):
+        """Top k (score, path, line, name) by cosine similarity to query"""
+        counts = collections.Counter(search_terms(query))
+        with self.lock:
+            scores = collections.defaultdict(float)
+            query_norm = 0.0
+            for term, count in counts.items():
+                tid = self.terms.get(term)
+                if tid is None or not self.df[tid]:
+                    continue
+                idf = self._idf(tid)
+                q = (1 + math.log(count)) * idf
+                query_norm += q * q
+                q *= idf
+                for cid, weight in zip(self.doc_ids[tid], self.doc_tfs[tid]):
+                    scores[cid] += q * weight
+            chunks, norms = self.chunks, self.norms
+            query_norm = math.sqrt(query_norm) or 1.0
+            best = heapq.nlargest(k, ((s / (norms[cid] * query_norm), cid) for cid, s in scores.items()
+                                      if chunks[cid] is not None))
+            return [(round(score, 3), chunks[cid][0], chunks[cid][1], chunks[cid][3]) for score, cid in best]
+
+    def memory(self):
+        postings = sum(len(ids) for ids in self.doc_ids)
+        return postings * 8 + len(self.chunks) * 120 + sum(len(t) + 60 for t in self.terms)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+def build_search_index(root, paths):
+    """Worker-process entry point: build and return a CodeSearchIndex"""
+    return CodeSearchIndex(root).build(paths)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REPLACE ALL
+# ══════════════════════════════════════════════════════════════════════════════
+
+_NON_BMP = re.compile('[\U00010000-\U0010ffff]')
+
+
+def tk_length(s):
+    """Length of s in Tk text indices (Tk 8.6 counts astral chars as two)"""
+    return len(s) + len(_NON_BMP.findall(s)) if _NON_BMP.search(s) else len(s)
+
+
+def compile_find(pattern, regex=False, ignore_case=False):
+    """The pattern Find and Replace All both use; raises re.error for bad patterns"""
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(pattern if regex else re.escape(pattern), flags)
+
+
+def offset_indexer(source):
+    """Map offsets into source to Tk 'line.col' indices"""
+    newlines = [m.start() for m in re.finditer('\n', source)]
+
+    def index(offset):
+        line = bisect.bisect_left(newlines, offset)
+        line_start = newlines[line - 1] + 1 if line else 0
+        return f"{line + 1}.{tk_length(source[line_start:offset])}"
+    return index
+
+
+def plan_replace_all(source, pattern, replacement, regex=False, ignore_case=False, max_edits=200):
+    """Compute the edits for a replace-all over a snapshot of the buffer.
+
+    Returns (count, edits) with edits as (start_index, end_index, text) in
+    bottom-up order. Past max_edits, matches on consecutive lines merge into
+    one edit per run of lines, so text between runs (and its tags) is left
+    alone. Raises re.error for bad patterns.
+    """
+    compiled = compile_find(pattern, regex, ignore_case)
+    matches = list(compiled.finditer(source))
+    if not matches:
+        return 0, []
+    if regex:
+        pieces = [match.expand(replacement) for match in matches]
+    else:
+        pieces = [replacement] * len(matches)
+    index = offset_indexer(source)
+    
+    if len(matches) > max_edits:
+        runs = []           # [first_match_start, last_match_end, [segments], last_line]
+        line, pos = 0, 0
+        for match, piece in zip(matches, pieces):
+            first = line + source.count('\n', pos, match.start())
+            line = first + source.count('\n', match.start(), match.end())
+            pos = match.end()
+            if runs and first <= runs[-1][3] + 1:
+                run = runs[-1]
+                run[2].append(source[run[1]:match.start()])
+                run[1] = match.end()
+                run[3] = line
+            else:
+                run = [match.start(), match.end(), [], line]
+                runs.append(run)
+            run[2].append(piece)
+        edits = [(index(lo), index(hi), ''.join(segments)) for lo, hi, segments, _ in runs]
+    else:
+        edits = [(index(match.start()), index(match.end()), piece) for match, piece in zip(matches, pieces)]
+    edits.reverse()
+    return len(matches), edits
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DIFF
+# ══════════════════════════════════════════════════════════════════════════════
+
+def hash_lines(text):
+    """Hash each line to an int so the diff compares integers, not strings"""
+    return [hash(line) for line in text.split('\n')]
+
+
+def diff_sequences(a, b, timeout=1.0):
+    """Linear-space Myers diff of two int sequences.
+
+    Returns difflib-style opcodes (tag, i1, i2, j1, j2). Common prefixes and
+    suffixes are trimmed at every level, so a localized edit costs little
+    more than the changed region itself. Regions still unresolved after
+    timeout seconds are reported as plain replacements.
+    """
+    deadline = time.perf_counter() + timeout
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            matches.append((a0, b0))
+            a0 += 1
+            b0 += 1
+        while a0 < a1 and b0 < b1 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+            matches.append((a1, b1))
+        if a0 == a1 or b0 == b1:
+            continue
+        split = _middle_snake(a, b, a0, a1, b0, b1, deadline)
+        if split is None:
+            continue
+        x, y = split
+        stack.append((a0, x, b0, y))
+        stack.append((x, a1, y, b1))
+    matches.sort()
+    
+    opcodes = []
+    i = j = 0
+    for x, y in matches + [(len(a), len(b))]:
+        if i < x and j < y:
+            opcodes.append(('replace', i, x, j, y))
+        elif i < x:
+            opcodes.append(('delete', i, x, j, j))
+        elif j < y:
+            opcodes.append(('insert', i, i, j, y))
+        if x < len(a):
+            if opcodes and opcodes[-1][0] == 'equal':
+                tag, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(('equal', i1, x + 1, j1, y + 1))
+            else:
+                opcodes.append(('equal', x, x + 1, y, y + 1))
+        i, j = x + 1, y + 1
+    return opcodes
+
+
+def _middle_snake(a, b, a0, a1, b0, b1, deadline):
+    """Split point where the forward and backward Myers paths overlap"""
+    n, m = a1 - a0, b1 - b0
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    v1 = [-1] * size
+    v2 = [-1] * size
+    v1[offset + 1] = 0
+    v2[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        if d & 15 == 15 and time.perf_counter() > deadline:
+            return None
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and v2[k2_offset] != -1 and x1 >= n - v2[k2_offset]:
+                    return a0 + x1, b0 + y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - 1 - x2] == b[b1 - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return a0 + x1, b0 + y1
+    return None
+
+
+class TabDiff:
+    """Changes of one tab's buffer against its on-disk or last saved text.
+
+    The buffer is mirrored as a list of line hashes that edits splice in
+    place; only the dirty lines are re-read and re-hashed before each diff,
+    which runs on a worker thread. Edits since the last diff are tracked
+    as one window, and only that window is diffed again; the opcodes
+    around it are kept. Changing the base forces a full diff.
+    """
+
+    DELAY = 300
+
+    def __init__(self, tab):
+        self.tab = tab
+        self.text = tab.text
+        self.base_lines = ['']
+        self.base_ids = hash_lines('')
+        self.base_generation = 0
+        self.cur_ids = hash_lines(self.text.get('1.0', 'end-1c'))
+        self.dirty = None
+        self.window = None     # (lo, old_hi, new_hi): cur lines [lo, old_hi) became [lo, new_hi)
+        self.full = True
+        self.opcodes = []
+        self.listeners = []
+        self.running = False
+        self._job = None
+        self.text.add_edit_listener(self.on_edit)
+
+    def detach(self):
+        self.text.remove_edit_listener(self.on_edit)
+        if self._job:
+            self.tab.after_cancel(self._job)
+            self._job = None
+        self.tab.set_gutter_marks('diff', {})
+
+    @staticmethod
+    def _compose(first, then):
+        """One window for two consecutive ones"""
+        if first is None:
+            return then
+        a, b_old, b_mid = first
+        c, d_mid, d_new = then
+        hi_mid = max(b_mid, d_mid)
+        return min(a, c), b_old + hi_mid - b_mid, d_new + hi_mid - d_mid
+
+    def on_edit(self, start, removed, added):
+        self.cur_ids[start - 1:start + removed] = [0] * (added + 1)
+        lo, hi = start, start + added
+        if self.dirty:
+            lo = min(lo, remap_line(self.dirty[0], start, removed, added))
+            hi = max(hi, remap_line(self.dirty[1], start, removed, added))
+        self.dirty = (lo, hi)
+        self.window = self._compose(self.window, (start - 1, start + removed, start + added))
+        self.schedule()
+
+    def _base_changed(self):
+        self.base_generation += 1
+        self.full = True
+        self.opcodes = []
+        self.schedule()
+
+    def set_base(self, content):
+        self.base_lines = content.split('\n')
+        self.base_ids = [hash(line) for line in self.base_lines]
+        self._base_changed()
+
+    def set_base_from_buffer(self):
+        self._flush_dirty()
+        self.base_lines = self.text.get('1.0', 'end-1c').split('\n')
+        self.base_ids = list(self.cur_ids)
+        self._base_changed()
+
+    def load_base_from_disk(self):
+        path = self.tab.filename
+        generation = self.base_generation
+
+        def work():
+            lines = read_text_file(path).split('\n')
+            return lines, [hash(line) for line in lines]
+
+        def done(result):
+            if generation == self.base_generation:
+                self.base_lines, self.base_ids = result
+                self._base_changed()
+
+        self.tab.winfo_toplevel()._run_background(work, done)
+
+    def _flush_dirty(self):
+        if self.dirty:
+            lo, hi = self.dirty
+            self.dirty = None
+            lines = self.text.get(f'{lo}.0', f'{hi}.0 lineend').split('\n')
+            self.cur_ids[lo - 1:hi] = [hash(line) for line in lines]
+
+    def schedule(self):
+        if self._job:
+            self.tab.after_cancel(self._job)
+        self._job = self.tab.after(self.DELAY, self.run)
+
+    @staticmethod
+    def _split(opcodes, lo, hi, base_len, cur_len):
+        """Opcodes before and after cur lines [lo, hi), and the (i, j) ranges left between them"""
+        before, after = [], []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if j2 <= lo:
+                before.append((tag, i1, i2, j1, j2))
+            elif j1 >= hi:
+                after.append((tag, i1, i2, j1, j2))
+            elif tag == 'equal':
+                if j1 < lo:
+                    before.append((tag, i1, i1 + lo - j1, j1, lo))
+                if j2 > hi:
+                    after.append((tag, i1 + hi - j1, i2, hi, j2))
+        i_lo, j_lo = (before[-1][2], before[-1][4]) if before else (0, 0)
+        i_hi, j_hi = (after[0][1], after[0][3]) if after else (base_len, cur_len)
+        return before, after, (i_lo, i_hi), (j_lo, j_hi)
+
+    @staticmethod
+    def _join(before, middle, after, i_lo, j_lo, delta):
+        """Stitch re-diffed middle opcodes between the kept ones, merging equal runs"""
+        joined = []
+        ops = before + [(tag, i1 + i_lo, i2 + i_lo, j1 + j_lo, j2 + j_lo) for tag, i1, i2, j1, j2 in middle] + \
+            [(tag, i1, i2, j1 + delta, j2 + delta) for tag, i1, i2, j1, j2 in after]
+        for op in ops:
+            if op[1] == op[2] and op[3] == op[4]:
+                continue
+            if joined and op[0] == joined[-1][0] == 'equal':
+                joined[-1] = ('equal', joined[-1][1], op[2], joined[-1][3], op[4])
+            else:
+                joined.append(op)
+        return joined
+
+    def run(self):
+        self._job = None
+        if self.running:
+            self.schedule()
+            return
+        self._flush_dirty()
+        window, self.window = self.window, None
+        full, self.full = self.full, False
+        base = self.base_ids
+        generation = self.text.edit_generation
+        base_generation = self.base_generation
+        if full or not self.opcodes:
+            current = list(self.cur_ids)
+            work = lambda: diff_sequences(base, current)
+        elif window:
+            lo, old_hi, new_hi = window
+            delta = new_hi - old_hi
+            before, after, (i_lo, i_hi), (j_lo, j_hi) = self._split(
+                self.opcodes, lo, old_hi, len(base), len(self.cur_ids) - delta)
+            base_part, current = base[i_lo:i_hi], self.cur_ids[j_lo:j_hi + delta]
+            work = lambda: self._join(before, diff_sequences(base_part, current), after, i_lo, j_lo, delta)
+        else:
+            return
+        self.running = True
+
+        def done(opcodes):
+            self.running = False
+            if base_generation != self.base_generation:
+                self.full = True
+                self.schedule()
+                return
+            if generation != self.text.edit_generation:
+                if full:
+                    self.full = True
+                else:
+                    self.window = self._compose(window, self.window)
+                self.schedule()
+                return
+            self.opcodes = opcodes
+            self.render()
+            for listener in list(self.listeners):
+                listener(self)
+
+        def failed(e):
+            self.running = False
+            self.full = True
+
+        self.tab.winfo_toplevel()._run_background(work, done, failed)
+
+    def render(self):
+        marks = {}
+        last = len(self.cur_ids)
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag == 'insert':
+                for line in range(j1 + 1, j2 + 1):
+                    marks[line] = 'diff_add'
+            elif tag == 'replace':
+                for line in range(j1 + 1, j2 + 1):
+                    marks[line] = 'diff_mod'
+            elif tag == 'delete':
+                marks.setdefault(max(1, min(j1 + 1, last)), 'diff_del')
+        self.tab.set_gutter_marks('diff', marks)
+
+    def hunks(self, context=3):
+        """Group non-equal opcodes with up to context lines around them"""
+        groups = []
+        group = []
+        codes = self.opcodes
+        for n, (tag, i1, i2, j1, j2) in enumerate(codes):
+            if tag == 'equal':
+                if n == 0:
+                    i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+                elif n == len(codes) - 1:
+                    i2, j2 = min(i2, i1 + context), min(j2, j1 + context)
+                elif i2 - i1 > 2 * context:
+                    group.append((tag, i1, i1 + context, j1, j1 + context))
+                    groups.append(group)
+                    group = []
+                    i1, j1 = i2 - context, j2 - context
+            group.append((tag, i1, i2, j1, j2))
+        if group and any(op[0] != 'equal' for op in group):
+            groups.append(group)
+        return [g for g in groups if any(op[0] != 'equal' for op in g)]
+
+
+class DiffPane(tk.Toplevel):
+    """Side-by-side hunks of saved text (left) versus the buffer (right)"""
+
+    def __init__(self, master, tab, goto_line):
+        super().__init__(master)
+        self.tab = tab
+        self.goto_line = goto_line
+        self.title(f"Changes - {tab.filename or 'untitled'}")
+        self.geometry("1000x500")
+        
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+        tk.Label(self, text="Saved", anchor='w').grid(row=0, column=0, sticky='ew')
+        tk.Label(self, text="Buffer", anchor='w').grid(row=0, column=1, sticky='ew')
+        
+        self.scroll = ttk.Scrollbar(self, orient='vertical', command=self._scroll_both)
+        self.scroll.grid(row=1, column=2, sticky='ns')
+        self.left = tk.Text(self, wrap='none', font=("Consolas", 10), yscrollcommand=self._on_scroll)
+        self.right = tk.Text(self, wrap='none', font=("Consolas", 10), yscrollcommand=self._on_scroll)
+        self.left.grid(row=1, column=0, sticky='nsew')
+        self.right.grid(row=1, column=1, sticky='nsew')
+        for widget in (self.left, self.right):
+            widget.tag_config('del', background='#5c2323')
+            widget.tag_config('add', background='#23422a')
+            widget.tag_config('mod', background='#1f3a5c')
+            widget.tag_config('filler', background='#2d2d2d')
+            widget.tag_config('sep', foreground='#888888')
+        self.right.bind('<Double-Button-1>', self._jump)
+        self._lines = {}
+        
+        tab.diff.listeners.append(self.render)
+        self.bind('<Destroy>', self._on_destroy)
+        self.render(tab.diff)
+
+    def _on_destroy(self, event):
+        if event.widget is self and self.tab.diff and self.render in self.tab.diff.listeners:
+            self.tab.diff.listeners.remove(self.render)
+
+    def _scroll_both(self, *args):
+        self.left.yview(*args)
+        self.right.yview(*args)
+
+    def _on_scroll(self, first, last):
+        self.scroll.set(first, last)
+        self.left.yview_moveto(first)
+        self.right.yview_moveto(first)
+
+    def render(self, diff):
+        left, right = [], []
+        self._lines = {}
+        buffer_text = self.tab.text
+        for hunk in diff.hunks():
+            _, i1, _, j1, _ = hunk[0]
+            header = f"@@ -{i1 + 1} +{j1 + 1} @@"
+            left.append((header, 'sep'))
+            right.append((header, 'sep'))
+            for tag, i1, i2, j1, j2 in hunk:
+                old = [(f"{n + 1:5d}  {diff.base_lines[n]}", n) for n in range(i1, i2)]
+                new = []
+                if j2 > j1:
+                    chunk = buffer_text.get(f'{j1 + 1}.0', f'{j2}.0 lineend').split('\n')
+                    new = [(f"{j1 + k + 1:5d}  {line}", j1 + k) for k, line in enumerate(chunk)]
+                style = {'equal': (None, None), 'delete': ('del', None),
+                         'insert': (None, 'add'), 'replace': ('mod', 'mod')}[tag]
+                for k in range(max(len(old), len(new))):
+                    if k < len(old):
+                        left.append((old[k][0], style[0]))
+                    else:
+                        left.append(('', 'filler'))
+                    if k < len(new):
+                        self._lines[len(right) + 1] = new[k][1] + 1
+                        right.append((new[k][0], style[1]))
+                    else:
+                        right.append(('', 'filler'))
+        if not left:
+            left.append(("No changes", 'sep'))
+            right.append(("No changes", 'sep'))
+        for widget, rows in ((self.left, left), (self.right, right)):
+            yview = widget.yview()[0]
+            widget.config(state='normal')
+            widget.delete('1.0', 'end')
+            widget.insert('1.0', '\n'.join(row for row, _ in rows))
+            for n, (_, tag) in enumerate(rows, 1):
+                if tag:
+                    widget.tag_add(tag, f'{n}.0', f'{n + 1}.0')
+            widget.config(state='disabled')
+            widget.yview_moveto(yview)
+
+    def _jump(self, event):
+        line = int(self.right.index(f'@{event.x},{event.y}').split('.')[0])
+        if line in self._lines:
+            self.goto_line(self.tab, self._lines[line])
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# RESOURCES
+# ══════════════════════════════════════════════════════════════════════════════
+
+# Soft limits in MB (0 = off). Checked every LIMIT_INTERVAL ms against the cheap
+# estimates; crossing one trims or hibernates and logs what it did.
+SOFT_LIMITS = {'buffers': 1024, 'undo': 256, 'chat': 16, 'completion': 256}
+LIMIT_INTERVAL = 10000
+
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.2f} GB"
+
+
+class ResourcePanel(tk.Toplevel):
+    """Estimated memory per tab, chat and cache, soft limits, and tracemalloc on demand"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("Resources")
+        self.geometry("560x520")
+        self.transient(app)
+        self.previous = None
+        
+        self.tree = ttk.Treeview(self, columns=('size', 'detail'), height=12)
+        self.tree.heading('#0', text="Item")
+        self.tree.heading('size', text="Estimate")
+        self.tree.heading('detail', text="Breakdown")
+        self.tree.column('#0', width=180)
+        self.tree.column('size', width=90, anchor='e')
+        self.tree.pack(fill='both', expand=True, padx=8, pady=(8, 4))
+        
+        limits = tk.LabelFrame(self, text="Soft limits (MB, 0 = off)")
+        limits.pack(fill='x', padx=8, pady=4)
+        self.limit_vars = {}
+        for i, (name, value) in enumerate(app.soft_limits.items()):
+            var = tk.StringVar(self, value=str(value))
+            var.trace_add('write', lambda *_, n=name, v=var: self._set_limit(n, v))
+            tk.Label(limits, text=name.title()).grid(row=0, column=2 * i, padx=(6, 2))
+            tk.Spinbox(limits, from_=0, to=65536, increment=64, width=6,
+                       textvariable=var).grid(row=0, column=2 * i + 1)
+            self.limit_vars[name] = var
+        
+        buttons = tk.Frame(self)
+        buttons.pack(fill='x', padx=8)
+        tk.Button(buttons, text="Refresh", command=self.refresh).pack(side='left')
+        tk.Button(buttons, text="Enforce Limits Now", command=lambda: (app._check_limits(reschedule=False),
+                                                                        self.refresh())).pack(side='left', padx=4)
+        self.trace_button = tk.Button(buttons, command=self._snapshot)
+        self.trace_button.pack(side='right')
+        
+        self.output = scrolledtext.ScrolledText(self, height=8, font=("Consolas", 9))
+        self.output.pack(fill='both', padx=8, pady=(4, 8))
+        self._update_trace_button()
+        self.refresh()
+
+    def _set_limit(self, name, var):
+        try:
+            self.app.soft_limits[name] = max(0, int(var.get()))
+        except ValueError:
+            pass
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        total = 0
+        for group, rows in self.app._memory_report():
+            subtotal = sum(sum(parts.values()) for _, parts in rows)
+            total += subtotal
+            node = self.tree.insert('', 'end', text=group, values=(format_bytes(subtotal), ''), open=True)
+            for name, parts in rows:
+                detail = ', '.join(f"{k} {format_bytes(v)}" for k, v in parts.items() if len(parts) > 1)
+                self.tree.insert(node, 'end', text=name, values=(format_bytes(sum(parts.values())), detail))
+        self.tree.insert('', 'end', text="Total (estimated)", values=(format_bytes(total), ''))
+
+    def _update_trace_button(self):
+        self.trace_button.config(text="Snapshot" if tracemalloc.is_tracing() else "Start tracemalloc")
+
+    def _snapshot(self):
+        """First press starts tracing; later presses show top allocations and growth since the last one"""
+        self.output.delete('1.0', 'end')
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.output.insert('end', "tracemalloc started; Python allocations from now on are tracked.\n"
+                                      "Press Snapshot to see where memory goes.\n")
+            self._update_trace_button()
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced {format_bytes(current)}, peak {format_bytes(peak)}", ""]
+        if self.previous is not None:
+            lines.append("Growth since last snapshot:")
+            for stat in snapshot.compare_to(self.previous, 'lineno')[:10]:
+                lines.append(f"  {stat}")
+            lines.append("")
+        lines.append("Top allocations:")
+        for stat in snapshot.statistics('lineno')[:10]:
+            lines.append(f"  {stat}")
+        self.previous = snapshot
+        self.output.insert('end', '\n'.join(lines))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# COMPLETION MODEL
+# ══════════════════════════════════════════════════════════════════════════════
+
+NGRAM_FILE = os.path.join(os.path.expanduser('~'), '.cats_cursor', 'ngram.bin')
+
+_NGRAM_TOKEN = re.compile(r"""
+    (?P<comment>\#.*)
+  | (?P<str>[rRbBuUfF]{0,2}(?:"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?))
+  | (?P<num>\d[\w.]*)
+  | (?P<name>[^\W\d]\w*)
+  | (?P<op>\*\*=?|//=?|->|<<=?|>>=?|\.\.\.|[-+*/%&|^<>!=:@]=|\S)
+""", re.VERBOSE)
+
+
+def ngram_tokens(line):
+    """Python-ish tokens of one line; literals collapse to <str>/<num>, comments drop"""
+    tokens = []
+    for match in _NGRAM_TOKEN.finditer(line):
+        kind = match.lastgroup
+        if kind == 'comment':
+            break
+        tokens.append(f'<{kind}>' if kind in ('str', 'num') else match.group())
+    return tokens
+
+
+class CountTable:
+    """Open-addressing int64 -> count map over two flat arrays.
+
+    keys holds key + 1 (0 marks an empty slot). Both arrays may be
+    read-only memoryviews over an mmap'd model file; they are copied into
+    real arrays on the first write.
+    """
+
+    MASK = (1 << 64) - 1
+
+    def __init__(self, capacity=1024, keys=None, counts=None, size=0):
+        if keys is None:
+            keys = array.array('Q', bytes(8 * capacity))
+            counts = array.array('I', bytes(4 * capacity))
+        self.keys = keys
+        self.counts = counts
+        self.size = size
+
+    def _slot(self, key):
+        mask = len(self.keys) - 1
+        slot = ((key * 0x9E3779B97F4A7C15) & self.MASK) >> 40 & mask
+        keys = self.keys
+        stored = key + 1
+        while True:
+            k = keys[slot]
+            if k == stored or k == 0:
+                return slot
+            slot = (slot + 1) & mask
+
+    def get(self, key):
+        slot = self._slot(key)
+        return self.counts[slot] if self.keys[slot] else 0
+
+    def _writable(self):
+        if not isinstance(self.keys, array.array):
+            self.keys = array.array('Q', bytes(self.keys))
+            self.counts = array.array('I', bytes(self.counts))
+
+    def add(self, key, n=1):
+        self._writable()
+        slot = self._slot(key)
+        if not self.keys[slot]:
+            if (self.size + 1) * 10 > len(self.keys) * 7:
+                self._rebuild(len(self.keys) * 2)
+                slot = self._slot(key)
+            self.keys[slot] = key + 1
+            self.size += 1
+        self.counts[slot] = min(self.counts[slot] + n, 0xFFFFFFFF)
+
+    def _rebuild(self, capacity=None, shift=0):
+        old = [(k, c >> shift) for k, c in zip(self.keys, self.counts) if k and c >> shift]
+        if capacity is None:
+            capacity = 1024
+            while len(old) * 10 > capacity * 7 // 2:
+                capacity *= 2
+        self.keys = array.array('Q', bytes(8 * capacity))
+        self.counts = array.array('I', bytes(4 * capacity))
+        self.size = len(old)
+        for stored, count in old:
+            slot = self._slot(stored - 1)
+            self.keys[slot] = stored
+            self.counts[slot] = count
+
+    def decay(self):
+        """Halve every count, drop the ones that reach zero and shrink to fit"""
+        self._writable()
+        self._rebuild(shift=1)
+
+    def nbytes(self):
+        return len(self.keys) * 12
+
+
+class NgramModel:
+    """Trigram next-token model with stupid backoff, trained on local code.
+
+    Tokens are interned to ints (0 = line start, 1 = unknown) and bigram/
+    trigram keys pack 21-bit ids into one int. Prefix candidates come from
+    a sorted id order and bisect; predict() scores them until its latency
+    budget runs out. Buffers are learned line by line, so a re-save only
+    counts the lines that changed; the line checksums are saved with the
+    model so that still holds after a restart. Untitled buffers (keys in
+    <>) are learned but never saved. Tables decay once they grow past
+    MAX_ENTRIES. The model persists to one flat file that load() mmaps.
+    """
+
+    MAGIC = b'CCNG'
+    VERSION = 2
+    HEADER = struct.Struct('<4sIIIQ3I3I')
+    ID_BITS = 21
+    MAX_WORDS = (1 << 21) - 1
+    MAX_ENTRIES = 1 << 21
+    BACKOFF = 0.4
+
+    def __init__(self, path=None):
+        self.path = path or NGRAM_FILE
+        self.lock = threading.Lock()
+        self.words = ['<s>', '<unk>']
+        self.ids = {w: i for i, w in enumerate(self.words)}
+        self.order = array.array('I', [0, 1])
+        self.total = 0
+        self.tables = [CountTable(), CountTable(), CountTable()]
+        self.trained = {}       # path -> content fingerprint of the last version learned
+        self.seen = {}          # path -> sorted crc32s of the lines learned, array('I')
+        self.dirty = False
+        self._map = None
+
+    # ── vocabulary ────────────────────────────────────────────────────────
+    def _intern(self, word):
+        wid = self.ids.get(word)
+        if wid is None:
+            if len(self.words) >= self.MAX_WORDS:
+                return 1
+            wid = len(self.words)
+            self.words.append(word)
+            self.ids[word] = wid
+            if not isinstance(self.order, array.array):
+                self.order = array.array('I', bytes(self.order))
+            self.order.insert(bisect.bisect_left(self.order, word, key=self.words.__getitem__), wid)
+        return wid
+
+    # ── training ──────────────────────────────────────────────────────────
+    def _learn_line(self, tokens):
+        uni, bi, tri = self.tables
+        bits = self.ID_BITS
+        a = b = 0
+        uni.add(0)
+        for token in tokens:
+            c = self._intern(token)
+            uni.add(c)
+            bi.add(b << bits | c)
+            tri.add((a << bits | b) << bits | c)
+            a, b = b, c
+        self.total += len(tokens)
+
+    def train_text(self, key, text):
+        """Learn the lines of text not already learned for key; returns lines learned"""
+        fingerprint = content_fingerprint(text)
+        if self.trained.get(key) == fingerprint:
+            return 0
+        seen = set(self.seen.get(key, ()))
+        fresh = set()
+        pending = []
+        for line in text.split('\n'):
+            digest = zlib.crc32(line.encode('utf-8', 'surrogatepass'))
+            fresh.add(digest)
+            if digest not in seen and line.strip():
+                pending.append(line)
+        for i in range(0, len(pending), 1000):
+            with self.lock:
+                for line in pending[i:i + 1000]:
+                    self._learn_line(ngram_tokens(line))
+                if any(t.size > self.MAX_ENTRIES for t in self.tables):
+                    for table in self.tables:
+                        table.decay()
+                    self.total //= 2
+        with self.lock:
+            self.seen[key] = array.array('I', sorted(fresh))
+            self.trained[key] = fingerprint
+            self.dirty = self.dirty or bool(pending)
+        return len(pending)
+
+    def forget(self, key):
+        """Drop what is remembered about key's text (its counts stay learned)"""
+        with self.lock:
+            self.trained.pop(key, None)
+            self.seen.pop(key, None)
+
+    # ── prediction ────────────────────────────────────────────────────────
+    def _score(self, a, b, c):
+        uni, bi, tri = self.tables
+        bits = self.ID_BITS
+        context = bi.get(a << bits | b)
+        if context:
+            count = tri.get((a << bits | b) << bits | c)
+            if count:
+                return count / context
+        weight = self.BACKOFF
+        context = uni.get(b)
+        if context:
+            count = bi.get(b << bits | c)
+            if count:
+                return weight * count / context
+        return weight * self.BACKOFF * uni.get(c) / max(self.total, 1)
+
+    def predict(self, context, prefix, limit=10, budget=0.015):
+        """Best completions of prefix after context tokens, within budget seconds"""
+        deadline = time.perf_counter() + budget
+        if not self.lock.acquire(timeout=budget):
+            return []
+        try:
+            words, ids = self.words, self.ids
+            history = [0, 0] + [ids.get(t, 1) for t in context[-2:]]
+            a, b = history[-2], history[-1]
+            order = self.order
+            lo = bisect.bisect_left(order, prefix, key=words.__getitem__)
+            hi = bisect.bisect_left(order, prefix + '\U0010ffff', lo, key=words.__getitem__)
+            scored = []
+            for n, i in enumerate(range(lo, hi)):
+                if n & 255 == 255 and time.perf_counter() > deadline:
+                    break
+                c = order[i]
+                if words[c] != prefix:
+                    score = self._score(a, b, c)
+                    if score:
+                        scored.append((score, words[c]))
+            return [word for _, word in heapq.nlargest(limit, scored)]
+        finally:
+            self.lock.release()
+
+    def shrink(self):
+        """Halve all counts, dropping the rarest n-grams"""
+        with self.lock:
+            for table in self.tables:
+                table.decay()
+            self.total //= 2
+            self.dirty = True
+
+    # ── persistence ───────────────────────────────────────────────────────
+    def nbytes(self):
+        """Bytes of the count tables, the part shrink() can reclaim"""
+        return sum(t.nbytes() for t in self.tables)
+
+    def vocab_nbytes(self):
+        return len(self.order) * 4 + sum(len(w) + 60 for w in self.words) + \
+            sum(len(lines) * 4 + 100 for lines in self.seen.values())
+
+    def save(self):
+        with self.lock:
+            vocab = '\n'.join(self.words).encode('utf-8', 'surrogatepass')
+            keys = [key for key in self.trained if not key.startswith('<')]
+            seen = [self.seen.get(key, array.array('I')) for key in keys]
+            trained = json.dumps({key: [self.trained[key], len(lines)]
+                                  for key, lines in zip(keys, seen)}).encode('utf-8')
+            header = self.HEADER.pack(self.MAGIC, self.VERSION, len(self.words), len(vocab), self.total,
+                                      *(len(t.keys) for t in self.tables), *(t.size for t in self.tables))
+            tmp = self.path + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp, 'wb') as f:
+                    f.write(header)
+                    f.write(struct.pack('<I', len(trained)))
+                    f.write(trained)
+                    f.write(vocab)
+                    f.write(b'\0' * (-f.tell() % 8))
+                    f.write(self.order)
+                    for lines in seen:
+                        f.write(lines)
+                    f.write(b'\0' * (-f.tell() % 8))
+                    for table in self.tables:
+                        f.write(table.keys)
+                        f.write(table.counts)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                log.warning("could not save completion model: %s", e)
+                return
+            self.dirty = False
+
+    def load(self):
+        """Map a saved model; the count tables stay on the mmap until first written"""
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        try:
+            magic, version, nwords, vocab_len, total, *shape = self.HEADER.unpack_from(mapped)
+            caps, sizes = shape[:3], shape[3:]
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("not a model file")
+            view = memoryview(mapped)
+            pos = self.HEADER.size
+            (trained_len,) = struct.unpack_from('<I', mapped, pos)
+            pos += 4
+            trained = json.loads(bytes(view[pos:pos + trained_len]))
+            pos += trained_len
+            words = bytes(view[pos:pos + vocab_len]).decode('utf-8', 'surrogatepass').split('\n')
+            pos += vocab_len
+            pos += -pos % 8
+            order = view[pos:pos + 4 * nwords].cast('I')
+            pos += 4 * nwords
+            seen = {}
+            for key, (fingerprint, count) in trained.items():
+                seen[key] = array.array('I', bytes(view[pos:pos + 4 * count]))
+                trained[key] = fingerprint
+                pos += 4 * count
+            pos += -pos % 8
+            tables = []
+            for cap, size in zip(caps, sizes):
+                keys = view[pos:pos + 8 * cap].cast('Q')
+                pos += 8 * cap
+                counts = view[pos:pos + 4 * cap].cast('I')
+                pos += 4 * cap
+                tables.append(CountTable(keys=keys, counts=counts, size=size))
+            if len(words) != nwords or pos > len(mapped):
+                raise ValueError("truncated model file")
+        except (ValueError, struct.error, TypeError) as e:
+            log.warning("ignoring completion model %s: %s", self.path, e)
+            return False
+        with self.lock:
+            self.words = words
+            self.ids = {w: i for i, w in enumerate(words)}
+            self.order = order
+            self.total = total
+            self.tables = tables
+            self.trained = trained
+            self.seen = seen
+            self._map = mapped
+        return True
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # COMPLETION POPUP
 # ══════════════════════════════════════════════════════════════════════════════
 
 class CompletionPopup(tk.Toplevel):
-    def __init__(self, master, x, y, completions, callback):
-        super().__init__(master)
-        self.callback = callback
-        self.completions = completions
+    """Per-tab completion list that is kept between uses and re-filters as the user types.
+
+    Focus stays in the editor: a bindtag placed ahead of the Text's own tags
+    routes Up/Down/Return/Tab/Escape to the list while it is shown. Candidates
+    are narrowed locally as the prefix grows, unless the provider's list was
+    cut at AIAgent.COMPLETION_LIMIT, in which case they are fetched again so
+    matches past the cut (and a fresh ranking) come in. The Listbox is
+    patched with the opcodes of diff_sequences instead of being refilled.
+    """
+
+    HEIGHT = 10
+
+    def __init__(self, tab, provider):
+        super().__init__(tab)
+        self.tab = tab
+        self.text = tab.text
+        self.provider = provider       # provider(text, prefix) -> [(name, template)]
+        self.candidates = []
+        self.base = None               # prefix the candidates were fetched for
+        self.truncated = False         # provider may have more candidates for base
+        self.items = []                # names currently in the listbox
+        self.visible = False
         
         self.wm_overrideredirect(True)
-        self.geometry(f"+{x}+{y}")
-        
-        self.listbox = tk.Listbox(self, height=min(10, len(completions)), width=40,
-                                   font=("Consolas", 10), selectmode='single')
+        self.withdraw()
+        self.listbox = tk.Listbox(self, height=self.HEIGHT, width=40, font=("Consolas", 10),
+                                  selectmode='single', exportselection=False, takefocus=0)
         self.listbox.pack()
+        self.listbox.bind('<Double-Button-1>', lambda e: self.accept())
         
-        for name, _ in completions:
-            self.listbox.insert('end', name)
-        
-        if completions:
-            self.listbox.select_set(0)
-        
-        self.listbox.bind('<Return>', self._select)
-        self.listbox.bind('<Double-Button-1>', self._select)
-        self.listbox.bind('<Escape>', lambda e: self.destroy())
-        self.listbox.bind('<FocusOut>', lambda e: self.destroy())
-        
-        self.listbox.focus_set()
+        tag = f"Completion{id(self)}"
+        self.text.bindtags((tag,) + self.text.bindtags())
+        for sequence, handler in (('<Up>', lambda e: self.move(-1)), ('<Down>', lambda e: self.move(1)),
+                                  ('<Prior>', lambda e: self.move(-self.HEIGHT)),
+                                  ('<Next>', lambda e: self.move(self.HEIGHT)),
+                                  ('<Return>', lambda e: self.accept()), ('<Tab>', lambda e: self.accept()),
+                                  ('<Escape>', lambda e: self.hide())):
+            self.text.bind_class(tag, sequence, lambda e, h=handler: (h(e), 'break')[1] if self.visible else None)
+        self.text.bind_class(tag, '<KeyRelease>', self._on_type)
+        self.text.bind_class(tag, '<Button-1>', lambda e: self.hide())
+        self.text.bind_class(tag, '<FocusOut>', lambda e: self.after(150, self._check_focus))
 
-    def _select(self, event=None):
-        selection = self.listbox.curselection()
-        if selection:
-            idx = selection[0]
-            _, template = self.completions[idx]
-            self.callback(template)
-        self.destroy()
+    def show(self, candidates, prefix):
+        self.text.mark_set('completion_start', f"insert-{tk_length(prefix)}c")
+        self.text.mark_gravity('completion_start', 'left')
+        self.candidates = candidates
+        self.base = prefix
+        self.truncated = len(candidates) >= AIAgent.COMPLETION_LIMIT
+        if not self._filter(prefix):
+            return
+        x, y, _, h = self.text.bbox('insert') or (0, 0, 0, 0)
+        self.geometry(f"+{x + self.text.winfo_rootx()}+{y + self.text.winfo_rooty() + h}")
+        if not self.visible:
+            self.deiconify()
+            self.lift()
+            self.visible = True
+
+    def hide(self):
+        if self.visible:
+            self.withdraw()
+            self.visible = False
+
+    def _check_focus(self):
+        if self.visible and self.focus_get() not in (self.text, self.listbox):
+            self.hide()
+
+    def _on_type(self, event):
+        if not self.visible or event.keysym in ('Up', 'Down', 'Prior', 'Next', 'Return', 'Tab', 'Escape'):
+            return
+        if self.text.compare('insert', '<', 'completion_start') or \
+                self.text.compare('insert', '>', 'completion_start lineend'):
+            self.hide()
+            return
+        prefix = self.text.get('completion_start', 'insert')
+        if not prefix or not re.fullmatch(r'\w+', prefix):
+            self.hide()
+            return
+        if self.truncated or not prefix.lower().startswith(self.base.lower()):
+            self.candidates = self.provider(self.text, prefix)
+            self.base = prefix
+            self.truncated = len(self.candidates) >= AIAgent.COMPLETION_LIMIT
+        self._filter(prefix)
+
+    def _filter(self, prefix):
+        """Narrow the list to prefix; hides and returns False when nothing is left"""
+        lowered = prefix.lower()
+        names = list(dict.fromkeys(name for name, _ in self.candidates if name.lower().startswith(lowered)))
+        if not names:
+            self.hide()
+            return False
+        selected = self.listbox.curselection()
+        current = self.items[selected[0]] if selected else None
+        for tag, i1, i2, j1, j2 in reversed(diff_sequences(self.items, names, timeout=0.005)):
+            if tag in ('delete', 'replace'):
+                self.listbox.delete(i1, i2 - 1)
+            if tag in ('insert', 'replace'):
+                self.listbox.insert(i1, *names[j1:j2])
+        self.items = names
+        self.listbox.config(height=min(self.HEIGHT, len(names)))
+        index = names.index(current) if current in names else 0
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return True
+
+    def move(self, delta):
+        selected = self.listbox.curselection()
+        index = max(0, min(len(self.items) - 1, (selected[0] if selected else 0) + delta))
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+
+    def accept(self):
+        selected = self.listbox.curselection()
+        if selected:
+            name = self.items[selected[0]]
+            template = next(t for n, t in self.candidates if n == name)
+            self.text.delete('completion_start', 'insert')
+            self.text.insert('insert', template)
+        self.hide()
+        self.text.focus_set()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -720,7 +4582,10 @@ class CompletionPopup(tk.Toplevel):
 # ══════════════════════════════════════════════════════════════════════════════
 
 class CursorNotepad(tk.Tk):
-    def __init__(self):
+    AUTO_COMPLETE_CHARS = 3         # word length before completions pop up on their own
+    AUTO_COMPLETE_BUDGET = 0.02     # seconds; slower lookups are dropped rather than shown late
+
+    def __init__(self, paths=()):
         super().__init__()
         
         self.title("🐱 Cat's Cursor 2.0 - AI Code Editor")
@@ -729,6 +4594,25 @@ class CursorNotepad(tk.Tk):
         self.current_theme = THEMES['dark']
         self.tab_counter = 1
         self.sidebar_visible = True
+        self.outline_visible = False
+        self.live_diagnostics = tk.BooleanVar(self, value=True)
+        self.change_markers = tk.BooleanVar(self, value=True)
+        self.persist_undo = tk.BooleanVar(self, value=False)
+        self.auto_complete = tk.BooleanVar(self, value=False)
+        self.ngram = NgramModel()
+        self._ngram_ready = False
+        self._open_pool = None
+        self.soft_limits = dict(SOFT_LIMITS)
+        self.code_search = None
+        self._search_pool = None
+        self._search_building = None     # root of the index build in flight
+        self._search_failed = None       # root whose build failed; not retried until reopened
+        self._search_queue = {}          # changes seen while building, {path: content or None}
+        self.session = SessionStore()
+        self.workspace = WorkspaceIndex()
+        self.watcher = FileWatcher()
+        self._watch_sweeping = False
+        self._bg_results = queue.Queue()
         
         # Main container
         self.main_pane = tk.PanedWindow(self, orient='horizontal', sashwidth=4)
@@ -750,15 +4634,20 @@ class CursorNotepad(tk.Tk):
         self._create_statusbar()
         
         # AI Sidebar (right)
-        self.sidebar = AISidebar(self.main_pane, self.current_theme, self._get_selected_code)
+        self.sidebar = AISidebar(self.main_pane, self.current_theme, self._get_selected_code,
+                                 self._search_code, self._open_location)
         self.main_pane.add(self.sidebar, width=300)
         
+        # Outline (left, hidden until toggled)
+        self.outline = OutlinePanel(self.main_pane, self.current_theme, self._goto_line_number)
+        
         # Menus
         self._create_menus()
         
         # Shortcuts
         self.bind("<Control-n>", lambda e: self.new_file())
         self.bind("<Control-o>", lambda e: self.open_file())
+        self.bind("<Control-p>", lambda e: self._quick_open())
         self.bind("<Control-s>", lambda e: self.save_file())
         self.bind("<Control-Shift-S>", lambda e: self.save_as())
         self.bind("<Control-w>", lambda e: self.close_tab())
@@ -767,14 +4656,40 @@ class CursorNotepad(tk.Tk):
         self.bind("<Control-b>", lambda e: self._toggle_sidebar())
         self.bind("<Control-g>", lambda e: self._goto_line())
         self.bind("<Control-f>", lambda e: self._show_find())
+        self.bind("<Control-Shift-O>", lambda e: self._goto_symbol())
+        self.bind("<Control-Shift-L>", lambda e: self._toggle_outline())
+        self.bind("<Control-Shift-D>", lambda e: self._show_diff())
+        self.bind("<Control-Shift-E>", lambda e: self._get_tab() and self._get_tab().expand_long_line())
+        self.bind("<Control-bracketright>", lambda e: self._get_tab() and self._get_tab().jump_to_bracket())
+        self.bind("<Control-braceleft>", lambda e: self._get_tab() and self._get_tab().fold())
+        self.bind("<Control-braceright>", lambda e: self._get_tab() and self._get_tab().unfold())
         
         # Events
         self.bind_all("<<CursorChange>>", self._update_status)
         self.bind_all("<KeyRelease>", self._update_status)
         self.bind_all("<ButtonRelease-1>", self._update_status)
+        self.bind_all("<<SymbolsChanged>>", self._refresh_outline)
+        
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(30, self._poll_background)
         
         # Initial tab
-        self.new_file()
+        if not self._restore_session() and not paths:
+            self.new_file()
+        if paths:
+            self.open_paths(paths)
+        
+        # Workspace index for quick open
+        self._index_workspace()
+        
+        # External change detection for open files
+        self.after(500, self._poll_file_changes)
+        
+        # Soft memory limits
+        self.after(LIMIT_INTERVAL, self._check_limits)
+        
+        # Completion model: map the saved one, then learn what is open
+        self._run_background(self.ngram.load, self._on_ngram_loaded, self._on_ngram_loaded)
 
     def _create_toolbar(self):
         toolbar = tk.Frame(self.editor_frame, bg=self.current_theme['toolbar_bg'])
@@ -843,12 +4758,14 @@ class CursorNotepad(tk.Tk):
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="New", accelerator="Ctrl+N", command=self.new_file)
         file_menu.add_command(label="Open", accelerator="Ctrl+O", command=self.open_file)
+        file_menu.add_command(label="Quick Open", accelerator="Ctrl+P", command=self._quick_open)
+        file_menu.add_command(label="Open Folder...", command=self._open_folder)
         file_menu.add_command(label="Save", accelerator="Ctrl+S", command=self.save_file)
         file_menu.add_command(label="Save As", accelerator="Ctrl+Shift+S", command=self.save_as)
         file_menu.add_separator()
         file_menu.add_command(label="Close Tab", accelerator="Ctrl+W", command=self.close_tab)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.quit)
+        file_menu.add_command(label="Exit", command=self._on_close)
         menubar.add_cascade(label="File", menu=file_menu)
         
         # Edit
@@ -857,19 +4774,29 @@ class CursorNotepad(tk.Tk):
                               command=lambda: self._get_text().edit_undo() if self._get_text() else None)
         edit_menu.add_command(label="Redo", accelerator="Ctrl+Y",
                               command=lambda: self._get_text().edit_redo() if self._get_text() else None)
+        edit_menu.add_checkbutton(label="Persist Undo History", variable=self.persist_undo)
         edit_menu.add_separator()
         edit_menu.add_command(label="Find", accelerator="Ctrl+F", command=self._show_find)
         edit_menu.add_command(label="Go to Line", accelerator="Ctrl+G", command=self._goto_line)
+        edit_menu.add_command(label="Go to Symbol", accelerator="Ctrl+Shift+O", command=self._goto_symbol)
+        edit_menu.add_command(label="Jump to Matching Bracket", accelerator="Ctrl+]",
+                              command=lambda: self._get_tab() and self._get_tab().jump_to_bracket())
         menubar.add_cascade(label="Edit", menu=edit_menu)
         
         # AI
         ai_menu = tk.Menu(menubar, tearoff=0)
         ai_menu.add_command(label="AI Complete", accelerator="Ctrl+.", command=self._show_completion)
+        ai_menu.add_checkbutton(label="Complete While Typing", variable=self.auto_complete)
         ai_menu.add_command(label="Generate Docstring", accelerator="Ctrl+/", command=self._insert_docstring)
+        ai_menu.add_command(label="Document Whole File", command=self._document_file)
+        ai_menu.add_command(label="Learn Completions From Workspace", command=self._learn_workspace)
         ai_menu.add_separator()
         ai_menu.add_command(label="Explain Code", command=lambda: self.sidebar._explain())
         ai_menu.add_command(label="Debug Code", command=lambda: self.sidebar._debug())
         ai_menu.add_command(label="Refactor Code", command=lambda: self.sidebar._refactor())
+        ai_menu.add_checkbutton(label="Live Diagnostics", variable=self.live_diagnostics,
+                                command=self._toggle_diagnostics)
+        ai_menu.add_command(label="Rule Statistics...", command=self._show_rule_stats)
         ai_menu.add_separator()
         ai_menu.add_command(label="Toggle Sidebar", accelerator="Ctrl+B", command=self._toggle_sidebar)
         menubar.add_cascade(label="AI", menu=ai_menu)
@@ -879,10 +4806,59 @@ class CursorNotepad(tk.Tk):
         for theme_key, theme in THEMES.items():
             view_menu.add_command(label=f"{theme['name']} Theme",
                                   command=lambda t=theme: self._apply_theme(t))
+        view_menu.add_separator()
+        view_menu.add_command(label="Toggle Outline", accelerator="Ctrl+Shift+L", command=self._toggle_outline)
+        view_menu.add_checkbutton(label="Change Markers", variable=self.change_markers,
+                                  command=self._toggle_change_markers)
+        view_menu.add_command(label="Compare with Saved", accelerator="Ctrl+Shift+D", command=self._show_diff)
+        view_menu.add_command(label="Expand Long Line", accelerator="Ctrl+Shift+E",
+                              command=lambda: self._get_tab() and self._get_tab().expand_long_line())
+        view_menu.add_separator()
+        view_menu.add_command(label="Fold", accelerator="Ctrl+Shift+[",
+                              command=lambda: self._get_tab() and self._get_tab().fold())
+        view_menu.add_command(label="Unfold", accelerator="Ctrl+Shift+]",
+                              command=lambda: self._get_tab() and self._get_tab().unfold())
+        view_menu.add_command(label="Fold All", command=lambda: self._get_tab() and self._get_tab().fold_all())
+        level_menu = tk.Menu(view_menu, tearoff=0)
+        for level in range(1, 6):
+            level_menu.add_command(label=f"Level {level}",
+                                   command=lambda n=level: self._get_tab() and self._get_tab().fold_all(n))
+        view_menu.add_cascade(label="Fold to Level", menu=level_menu)
+        view_menu.add_command(label="Unfold All", command=lambda: self._get_tab() and self._get_tab().unfold_all())
+        view_menu.add_separator()
+        view_menu.add_command(label="Resources…", command=self._show_resources)
         menubar.add_cascade(label="View", menu=view_menu)
         
         self.config(menu=menubar)
 
+    def _run_background(self, work, done, error=None):
+        """Run work() on a worker thread and hand its result to done() on the Tk thread"""
+        def runner():
+            try:
+                self._bg_results.put((done, work()))
+            except Exception as e:
+                if error:
+                    self._bg_results.put((error, e))
+        threading.Thread(target=runner, daemon=True).start()
+
+    def _poll_background(self):
+        try:
+            while True:
+                callback, value = self._bg_results.get_nowait()
+                try:
+                    callback(value)
+                except tk.TclError:
+                    pass
+                except Exception:
+                    log.exception("background callback %r failed", callback)
+        except queue.Empty:
+            pass
+        finally:
+            self.after(30, self._poll_background)
+
+    def _tabs(self):
+        return [self.nametowidget(tab_id) for tab_id in self.notebook.tabs()]
+
     def _get_tab(self):
         tab_name = self.notebook.select()
         return self.nametowidget(tab_name) if tab_name else None
@@ -900,58 +4876,373 @@ class CursorNotepad(tk.Tk):
         except tk.TclError:
             return text.get("1.0", "end")
 
-    def new_file(self):
+    def _toggle_diagnostics(self):
+        enabled = self.live_diagnostics.get()
+        for tab in self._tabs():
+            tab.diagnostics.enabled = enabled
+            tab.diagnostics.render()
+            if enabled:
+                tab.diagnostics.full = True
+                tab.diagnostics.schedule()
+
+    def _show_rule_stats(self):
+        dialog = tk.Toplevel(self)
+        dialog.title("Rule Statistics")
+        dialog.geometry("640x360")
+        dialog.transient(self)
+        
+        columns = ('pack', 'phase', 'hits', 'runs', 'time', 'enabled')
+        tree = ttk.Treeview(dialog, columns=columns)
+        tree.heading('#0', text='Rule')
+        tree.column('#0', width=200)
+        for col, width in zip(columns, (90, 60, 60, 60, 90, 60)):
+            tree.heading(col, text=col.title())
+            tree.column(col, width=width, anchor='e' if col in ('hits', 'runs', 'time') else 'w')
+        tree.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        def fill():
+            tree.delete(*tree.get_children())
+            for rule in RULES.stats():
+                tree.insert('', 'end', iid=rule.name, text=rule.name,
+                            values=(rule.pack, rule.phase, rule.hits, rule.runs,
+                                    f"{rule.total_time * 1000:.1f} ms", '✔' if rule.enabled else '✘'))
+        
+        def toggle(event=None):
+            for name in tree.selection():
+                rule = next(r for r in RULES.all_rules() if r.name == name)
+                RULES.set_enabled(name, not rule.enabled)
+            fill()
+        
+        def reload():
+            RULES.reload()
+            fill()
+            errors = [f"{pack}: {err}" for pack, err in RULES.packs.items() if err]
+            if errors:
+                messagebox.showwarning("Rule Packs", '\n'.join(errors), parent=dialog)
+        
+        buttons = tk.Frame(dialog)
+        buttons.pack(fill='x', padx=5, pady=5)
+        tk.Button(buttons, text="Enable/Disable", command=toggle).pack(side='left')
+        tk.Button(buttons, text="Reload Packs", command=reload).pack(side='left', padx=5)
+        tk.Button(buttons, text="Refresh", command=fill).pack(side='left')
+        tk.Label(buttons, text=RULES.directory).pack(side='right')
+        tree.bind('<Double-Button-1>', toggle)
+        fill()
+
+    def _new_tab(self):
         tab = EditorTab(self.notebook, self.current_theme)
+        tab.text.bind('<KeyRelease>', self._auto_complete, add='+')
+        tab.diagnostics.enabled = self.live_diagnostics.get()
+        if self.change_markers.get():
+            tab.enable_diff()
+        return tab
+
+    def _toggle_change_markers(self):
+        for tab in self._tabs():
+            if self.change_markers.get():
+                tab.enable_diff()
+            else:
+                tab.disable_diff()
+
+    def _show_diff(self):
+        tab = self._get_tab()
+        if not tab or not tab.loaded:
+            return
+        tab.enable_diff()
+        DiffPane(self, tab, self._open_symbol)
+
+    def new_file(self):
+        tab = self._new_tab()
         self.notebook.add(tab, text=f"new {self.tab_counter}")
         self.tab_counter += 1
         self.notebook.select(tab)
         tab.text.focus_set()
 
     def open_file(self):
-        path = filedialog.askopenfilename(filetypes=FILE_TYPES)
+        paths = filedialog.askopenfilenames(filetypes=FILE_TYPES)
+        if paths:
+            self.open_paths(paths)
+
+    def _find_tab(self, path):
+        for tab in self._tabs():
+            if tab.filename and os.path.abspath(tab.filename) == os.path.abspath(path):
+                return tab
+        return None
+
+    def open_path(self, path):
+        """Open path in a new tab, or switch to the tab that already has it"""
+        tab = self._find_tab(path)
+        if tab is None:
+            tab = self._add_file_tab(path, read_text_file(path))
+        self.notebook.select(tab)
+        return tab
+
+    def _add_file_tab(self, path, content, before=None):
+        tab = self._new_tab()
+        tab.filename = path
+        tab.load_content(content)
+        tab.detect_language()
+        self._watch_tab(tab)
+        self._learn_tab(tab)
+        
+        if before is not None:
+            self.notebook.insert(before, tab, text=os.path.basename(path))
+        else:
+            self.notebook.add(tab, text=os.path.basename(path))
+        return tab
+
+    def open_paths(self, paths):
+        """Open several files at once; reads run on a pool and tabs appear as they finish.
+
+        Reads start in request order, so the first file is queued ahead of the
+        rest and selected as soon as it arrives. Tabs keep the request order
+        whatever order the reads complete in.
+        """
+        batch = list(dict.fromkeys(os.path.abspath(p) for p in paths))
+        if not batch:
+            return
+        if self._find_tab(batch[0]):
+            self.notebook.select(self._find_tab(batch[0]))
+        pending = [path for path in batch if not self._find_tab(path)]
+        if not pending:
+            return
+        if self._open_pool is None:
+            self._open_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='open')
+        state = {'tabs': {}, 'failed': [], 'left': len(pending)}
+        for path in pending:
+            future = self._open_pool.submit(read_text_file, path)
+            future.add_done_callback(lambda f, p=path: self._bg_results.put(
+                (lambda f: self._on_file_read(p, f, batch, state), f)))
+
+    def _on_file_read(self, path, future, batch, state):
+        state['left'] -= 1
+        try:
+            content = future.result()
+        except (OSError, concurrent.futures.CancelledError) as e:
+            log.warning("could not open %s: %s", path, e)
+            state['failed'].append(f"{os.path.basename(path)}: {e}")
+        else:
+            tab = self._find_tab(path)
+            if tab is None:
+                later = batch[batch.index(path) + 1:]
+                before = next((state['tabs'][p] for p in later
+                               if p in state['tabs'] and state['tabs'][p].winfo_exists()), None)
+                tab = self._add_file_tab(path, content, before)
+            state['tabs'][path] = tab
+            if path == batch[0]:
+                self.notebook.select(tab)
+                tab.text.focus_set()
+        if state['left'] == 0:
+            if state['failed']:
+                messagebox.showerror("Open", "Could not open:\n" + '\n'.join(state['failed']))
+            if not self.notebook.tabs():
+                self.new_file()
+
+    def _on_ngram_loaded(self, result):
+        self._ngram_ready = True
+        for tab in self._tabs():
+            self._learn_tab(tab)
+
+    def _learn_tab(self, tab):
+        """Feed a Python buffer to the completion model in the background"""
+        if not self._ngram_ready or not tab.loaded or not tab.symbols.enabled:
+            return
+        key = os.path.abspath(tab.filename) if tab.filename else f"<tab {id(tab)}>"
+        content = tab.text.get('1.0', 'end-1c')
+        model = self.ngram
+        self._run_background(lambda: model.train_text(key, content), lambda n: None)
+
+    def _learn_workspace(self):
+        """Train the completion model on every Python file in the workspace"""
+        root = self.workspace.root
+        paths = [os.path.join(root, rel) for rel in self.workspace.files if rel.endswith('.py')]
+        model = self.ngram
+        self.status_ai.config(text=f"🧠 Learning from {len(paths)} files…", fg='#90EE90')
+        
+        def work():
+            lines = 0
+            for path in paths:
+                try:
+                    if os.path.getsize(path) <= 1024 * 1024:
+                        lines += model.train_text(path, read_text_file(path))
+                except OSError:
+                    continue
+            model.save()
+            return lines
+        
+        self._run_background(work, lambda lines: self.status_ai.config(
+            text=f"🧠 Learned {lines} lines from {len(paths)} files", fg='#90EE90'))
+
+    def _open_folder(self):
+        path = filedialog.askdirectory(initialdir=self.workspace.root)
         if path:
+            self.workspace = WorkspaceIndex(path)
+            self._search_failed = None
+            self._index_workspace()
+
+    def _index_workspace(self):
+        workspace = self.workspace
+        self._run_background(workspace.scan, lambda dirs: self._apply_workspace(workspace, dirs),
+                             lambda e: self._apply_workspace(workspace, None))
+
+    def _apply_workspace(self, workspace, dirs):
+        if workspace is not self.workspace:
+            return
+        if dirs is not None:
+            old = set(workspace.files)
+            workspace.apply(dirs)
+            if old:
+                changed = old.symmetric_difference(workspace.files)
+                self._queue_search({workspace.full_path(rel): None for rel in changed
+                                    if rel.endswith(CodeSearchIndex.EXTENSIONS)})
+            if workspace.truncated and workspace.generation == 1:
+                log.warning("workspace %s: stopped after %d directories; open a project folder to index it all",
+                            workspace.root, workspace.MAX_DIRS)
+            if self.code_search is None or self.code_search.root != workspace.root:
+                self._build_code_search(workspace)
+        self.after(5000, lambda: self._poll_workspace(workspace))
+
+    def _build_code_search(self, workspace):
+        """Index the workspace for chat search in a worker process"""
+        if self._search_building == workspace.root or self._search_failed == workspace.root:
+            return
+        paths = [os.path.join(workspace.root, rel) for rel in workspace.files
+                 if rel.endswith(CodeSearchIndex.EXTENSIONS)]
+        if self._search_pool is None:
+            # fork would copy a process that already runs the watcher and worker threads
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._search_pool = concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context)
+        self._search_building = workspace.root
+        self._search_queue = {}
+        future = self._search_pool.submit(build_search_index, workspace.root, paths)
+
+        def done(future):
+            if self._search_building == workspace.root:
+                self._search_building = None
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except:
-                with open(path, 'r', encoding='latin-1') as f:
-                    content = f.read()
-            
-            tab = EditorTab(self.notebook, self.current_theme)
-            tab.text.insert('1.0', content)
-            tab.filename = path
-            tab.modified = False
-            tab.detect_language()
-            
-            self.notebook.add(tab, text=os.path.basename(path))
+                index = future.result()
+            except Exception as e:
+                log.warning("code search index build failed: %s", e)
+                self._search_failed = workspace.root
+                return
+            if index.root != self.workspace.root:
+                if self.workspace.files:
+                    self._build_code_search(self.workspace)
+                return
+            self.code_search = index
+            log.info("code search: %d chunks from %d files", index.live, len(index.files))
+            queued, self._search_queue = self._search_queue, {}
+            self._queue_search(queued)
+        future.add_done_callback(lambda f: self._bg_results.put((done, f)))
+
+    def _queue_search(self, changes):
+        """Re-index changed files now, or once the build in flight has landed"""
+        if not changes:
+            return
+        index = self.code_search
+        if self._search_building == self.workspace.root:
+            self._search_queue.update(changes)
+        elif index is not None and index.root == self.workspace.root:
+            self._run_background(lambda: index.refresh_files(changes), lambda _: None)
+
+    def _search_code(self, query, done):
+        index = self.code_search
+        if index is None:
+            done(None)
+            return
+        self._run_background(lambda: index.search(query), done, lambda e: done([]))
+
+    def _open_location(self, path, line):
+        try:
+            self.open_path(path)
+        except OSError as e:
+            messagebox.showerror("Open", str(e))
+            return
+        self._goto_line_number(line)
+
+    def _index_saved(self, tab):
+        """Re-index a saved file that lives in the searched workspace"""
+        if not tab.filename:
+            return
+        path = os.path.abspath(tab.filename)
+        if path.startswith(os.path.abspath(self.workspace.root) + os.sep):
+            self._queue_search({path: tab.text.get('1.0', 'end-1c')})
+
+    def _poll_workspace(self, workspace):
+        if workspace is self.workspace:
+            dirs = workspace.dirs
+            self._run_background(lambda: workspace.poll(dirs),
+                                 lambda new: self._apply_workspace(workspace, new),
+                                 lambda e: self._apply_workspace(workspace, None))
+
+    def _quick_open(self):
+        def open_path(path):
+            try:
+                self.open_path(path)
+            except OSError as e:
+                messagebox.showerror("Quick Open", str(e))
+        QuickOpenDialog(self, self.workspace, self._symbol_entries, open_path, self._open_symbol)
+
+    def _symbol_entries(self):
+        entries = []
+        for tab in self._tabs():
+            if not tab.loaded:
+                continue
+            tab.symbols.refresh()
+            title = self.notebook.tab(tab, 'text')
+            for name, kind, start, _, _ in tab.symbols.symbols():
+                entries.append((f"{name}  — {title}:{start}", (tab, start)))
+        return entries
+
+    def _open_symbol(self, tab, line):
+        if tab.winfo_exists():
             self.notebook.select(tab)
-            tab.text.edit_reset()
+            self._goto_line_number(line)
+
+    def _still_loading(self, tab):
+        """True (and say so) while the tab's buffer is a placeholder that must not be written out"""
+        if tab.loaded:
+            return False
+        self.status_ai.config(text="⏳ Still loading - save again in a moment", fg='#ffcc66')
+        return True
 
     def save_file(self):
         tab = self._get_tab()
-        if not tab:
+        if not tab or self._still_loading(tab):
             return
         if tab.filename:
+            if self.watcher.changed_since_recorded(tab.filename):
+                if not messagebox.askyesno("Save", f"{os.path.basename(tab.filename)} changed on disk "
+                                                   "since it was loaded. Overwrite it?"):
+                    return
             content = tab.text.get('1.0', 'end-1c')
             with open(tab.filename, 'w', encoding='utf-8') as f:
                 f.write(content)
-            tab.modified = False
+            self.watcher.record(tab.filename)
+            tab.mark_saved()
+            self._learn_tab(tab)
+            self._index_saved(tab)
         else:
             self.save_as()
 
     def save_as(self):
         tab = self._get_tab()
-        if not tab:
+        if not tab or self._still_loading(tab):
             return
         path = filedialog.asksaveasfilename(defaultextension='.py', filetypes=FILE_TYPES)
         if path:
             content = tab.text.get('1.0', 'end-1c')
             with open(path, 'w', encoding='utf-8') as f:
                 f.write(content)
+            self._unwatch_tab(tab)
             tab.filename = path
-            tab.modified = False
+            self._watch_tab(tab)
+            tab.mark_saved()
             tab.detect_language()
             self.notebook.tab(tab, text=os.path.basename(path))
+            self._learn_tab(tab)
+            self._index_saved(tab)
 
     def close_tab(self):
         tab = self._get_tab()
@@ -960,14 +5251,274 @@ class CursorNotepad(tk.Tk):
                 if not messagebox.askyesno("Close", "Unsaved changes. Close anyway?"):
                     return
             self.notebook.forget(tab)
+            self._unwatch_tab(tab)
+            if not tab.filename:
+                self.ngram.forget(f"<tab {id(tab)}>")
+            tab.destroy()
+            if not self.notebook.tabs():
+                self.new_file()
+
+    def _watch_tab(self, tab):
+        if tab.filename and not tab.watched:
+            self.watcher.watch(tab.filename)
+            tab.watched = True
+
+    def _unwatch_tab(self, tab):
+        if tab.watched:
+            self.watcher.unwatch(tab.filename)
+            tab.watched = False
+
+    def _poll_file_changes(self):
+        candidates = self.watcher.candidates()
+        if candidates is None:
+            if not self._watch_sweeping:
+                self._watch_sweeping = True
+                signatures = dict(self.watcher.signatures)
+                self._run_background(lambda: FileWatcher.sweep(signatures), self._on_sweep,
+                                     lambda e: self._on_sweep([]))
+        elif candidates:
+            self._on_files_changed(FileWatcher.sweep(self.watcher.signatures, candidates))
+        self.after(500 if self.watcher.inotify else 2000, self._poll_file_changes)
+
+    def _on_sweep(self, changed):
+        self._watch_sweeping = False
+        self._on_files_changed(changed)
+
+    def _on_files_changed(self, changed):
+        for path, sig in changed:
+            if path not in self.watcher.signatures:
+                continue
+            self.watcher.signatures[path] = sig
+            for tab in self._tabs():
+                if not tab.filename or os.path.abspath(tab.filename) != path or not tab.loaded:
+                    continue
+                name = os.path.basename(path)
+                if sig is None:
+                    tab.modified = True
+                    self.status_ai.config(text=f"⚠️ {name} was deleted on disk", fg='#ffcc66')
+                elif not tab.modified:
+                    self._reload_tab(tab)
+                else:
+                    self._prompt_external_change(tab)
+
+    def _reload_tab(self, tab, force=False):
+        path = tab.filename
+
+        def done(content):
+            if not tab.winfo_exists() or tab.filename != path or (tab.modified and not force):
+                return
+            tab.load_content(content, tab.text.index('insert'), tab.text.yview()[0])
+            self.watcher.record(path)
+            self.status_ai.config(text=f"🔄 Reloaded {os.path.basename(path)}", fg='#90EE90')
+
+        self._run_background(lambda: read_text_file(path), done)
+
+    def _prompt_external_change(self, tab):
+        if tab.conflict_prompt:
+            return
+        tab.conflict_prompt = True
+        dialog = tk.Toplevel(self)
+        dialog.title("File Changed")
+        dialog.transient(self)
+        tk.Label(dialog, text=f"{os.path.basename(tab.filename)} changed on disk,\n"
+                              "but this tab has unsaved edits.", justify='left').pack(padx=15, pady=10)
+        buttons = tk.Frame(dialog)
+        buttons.pack(pady=(0, 10))
+        
+        def close(action=None):
+            tab.conflict_prompt = False
+            dialog.destroy()
+            if action:
+                action()
+        
+        def compare():
+            tab.enable_diff()
+            tab.diff.load_base_from_disk()
+            self.notebook.select(tab)
+            DiffPane(self, tab, self._open_symbol)
+        
+        tk.Button(buttons, text="Reload", command=lambda: close(lambda: self._reload_tab(tab, force=True))).pack(side='left', padx=5)
+        tk.Button(buttons, text="Keep Mine", command=close).pack(side='left', padx=5)
+        tk.Button(buttons, text="Compare", command=lambda: close(compare)).pack(side='left', padx=5)
+        dialog.protocol("WM_DELETE_WINDOW", close)
+
+    def _save_session(self):
+        tabs = []
+        active = 0
+        current = self._get_tab()
+        for tab in self._tabs():
+            state = tab.snapshot(undo=self.persist_undo.get())
+            if state is None:
+                continue
+            state['title'] = self.notebook.tab(tab, 'text')
+            if tab is current:
+                active = len(tabs)
+            tabs.append(state)
+        theme = next((k for k, t in THEMES.items() if t is self.current_theme), 'dark')
+        self.session.save({'theme': theme, 'active': active, 'tab_counter': self.tab_counter,
+                           'workspace': self.workspace.root, 'disabled_rules': sorted(RULES.disabled),
+                           'persist_undo': self.persist_undo.get(), 'auto_complete': self.auto_complete.get(),
+                           'soft_limits': self.soft_limits,
+                           'tabs': tabs})
+
+    def _restore_session(self):
+        """Reopen the last session; only the active tab is read up front"""
+        data = self.session.load()
+        if not data:
+            return False
+        for name in data.get('disabled_rules', []):
+            RULES.set_enabled(name, False)
+        self.persist_undo.set(bool(data.get('persist_undo')))
+        self.auto_complete.set(bool(data.get('auto_complete')))
+        for name, value in data.get('soft_limits', {}).items():
+            if name in self.soft_limits and isinstance(value, int):
+                self.soft_limits[name] = value
+        if not data.get('tabs'):
+            return False
+        if data.get('theme') in THEMES:
+            self._apply_theme(THEMES[data['theme']])
+        if data.get('workspace') and os.path.isdir(data['workspace']):
+            self.workspace = WorkspaceIndex(data['workspace'])
+        self.tab_counter = data.get('tab_counter', self.tab_counter)
+        active_index = data.get('active', 0)
+        active = None
+        for i, state in enumerate(data['tabs']):
+            path = state.get('path')
+            if 'content' not in state and not (path and os.path.isfile(path)):
+                continue
+            tab = self._new_tab()
+            tab.filename = path
+            tab.detect_language()
+            self._watch_tab(tab)
+            title = state.get('title') or (os.path.basename(path) if path else f"new {self.tab_counter}")
+            self.notebook.add(tab, text=title)
+            if 'content' in state:
+                tab.load_content(state['content'], state.get('cursor'), state.get('yview'), modified=True,
+                                 undo=state.get('undo'))
+            elif i == active_index:
+                try:
+                    tab.load_content(read_text_file(path), state.get('cursor'), state.get('yview'),
+                                     undo=state.get('undo'))
+                except OSError:
+                    self.notebook.forget(tab)
+                    self._unwatch_tab(tab)
+                    tab.destroy()
+                    continue
+            else:
+                tab.set_placeholder(state)
+                self._run_background(lambda p=path: read_text_file(p),
+                                     lambda content, t=tab: self._finish_lazy_load(t, content),
+                                     lambda e, t=tab: self._drop_tab(t))
+            if i == active_index or active is None:
+                active = tab
+        if active is None:
+            return False
+        self.notebook.select(active)
+        active.text.focus_set()
+        return True
+
+    def _finish_lazy_load(self, tab, content):
+        if not tab.winfo_exists() or tab.loaded:
+            return
+        state = tab.pending_state or {}
+        tab.load_content(content, state.get('cursor'), state.get('yview'), undo=state.get('undo'))
+        self._learn_tab(tab)
+
+    def _drop_tab(self, tab):
+        if tab.winfo_exists():
+            self.notebook.forget(tab)
+            self._unwatch_tab(tab)
+            tab.destroy()
             if not self.notebook.tabs():
                 self.new_file()
 
+    def _memory_report(self):
+        """[(group, [(name, {part: bytes})])] from the cheap per-component estimates"""
+        tabs = [(self.notebook.tab(tab, 'text') + (" (hibernated)" if tab.hibernated else ""), tab.memory())
+                for tab in self._tabs()]
+        caches = [("Workspace index", {'paths': self.workspace.memory()}),
+                  ("Completion model", {'tables': self.ngram.nbytes(), 'vocabulary': self.ngram.vocab_nbytes()})]
+        if self.code_search is not None:
+            caches.append(("Code search index", {'postings': self.code_search.memory()}))
+        return [("Tabs", tabs), ("AI chat", [("Transcript", {'text': self.sidebar.memory()})]),
+                ("Caches", caches)]
+
+    def _check_limits(self, reschedule=True):
+        """Enforce the soft limits: trim undo and chat, hibernate idle tabs, shrink the model"""
+        mb = 1024 * 1024
+        limits = self.soft_limits
+        tabs = self._tabs()
+        current = self._get_tab()
+        
+        undo = sum(tab.text.history.memory() for tab in tabs)
+        if limits['undo'] and undo > limits['undo'] * mb:
+            log.warning("soft limit 'undo' hit: %s > %d MB; trimming oldest steps", format_bytes(undo), limits['undo'])
+            share = limits['undo'] * mb // (2 * max(len(tabs), 1))
+            for tab in sorted(tabs, key=lambda t: -t.text.history.memory()):
+                tab.text.history.trim(share)
+        
+        buffers = {tab: tab.memory()['buffer'] for tab in tabs if tab.loaded}
+        total = sum(buffers.values())
+        if limits['buffers'] and total > limits['buffers'] * mb:
+            for tab in sorted(buffers, key=lambda t: t.last_active):
+                if total <= limits['buffers'] * mb:
+                    break
+                if tab is not current and tab.hibernate():
+                    total -= buffers[tab]
+                    log.warning("soft limit 'buffers' hit: hibernated %s (%s)",
+                                tab.filename, format_bytes(buffers[tab]))
+        
+        chat = self.sidebar.memory()
+        if limits['chat'] and chat > limits['chat'] * mb:
+            log.warning("soft limit 'chat' hit: %s > %d MB; trimming transcript", format_bytes(chat), limits['chat'])
+            self.sidebar.trim_transcript(limits['chat'] * mb // 2)
+        
+        model = self.ngram.nbytes()
+        if limits['completion'] and model > limits['completion'] * mb:
+            log.warning("soft limit 'completion' hit: %s > %d MB; decaying counts",
+                        format_bytes(model), limits['completion'])
+            self._run_background(self.ngram.shrink, lambda _: None)
+        
+        if reschedule:
+            self.after(LIMIT_INTERVAL, self._check_limits)
+
+    def _show_resources(self):
+        ResourcePanel(self)
+
+    def shutdown_workers(self):
+        """Cancel queued file reads and index builds so exit does not wait on them"""
+        if self._open_pool is not None:
+            self._open_pool.shutdown(wait=False, cancel_futures=True)
+        if self._search_pool is not None:
+            # a running build is only a cache; stop its process rather than join it at exit
+            processes = list((self._search_pool._processes or {}).values())
+            self._search_pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+
+    def _on_close(self):
+        self.shutdown_workers()
+        self._save_session()
+        if self.ngram.dirty:
+            self.ngram.save()
+        self.destroy()
+
     def _on_tab_change(self, event=None):
+        for other in self._tabs():
+            if other.completion:
+                other.completion.hide()
         tab = self._get_tab()
         if tab:
+            tab.last_active = time.monotonic()
+            if tab.hibernated and not tab.loaded:
+                tab.hibernated = False
+                path = tab.filename
+                self._run_background(lambda: read_text_file(path),
+                                     lambda content: self._finish_lazy_load(tab, content),
+                                     lambda e: self._drop_tab(tab))
             self.title(f"🐱 Cat's Cursor 2.0 - {tab.filename or 'new'}")
             self._update_status()
+            self._refresh_outline()
 
     def _update_status(self, event=None):
         tab = self._get_tab()
@@ -978,6 +5529,13 @@ class CursorNotepad(tk.Tk):
             line, col = pos.split('.')
             self.status_pos.config(text=f"Ln {line}, Col {int(col)+1}")
             self.status_lang.config(text=tab.language)
+            messages = tab.diagnostics.messages_at(int(line))
+            if messages:
+                self.status_ai.config(text=messages[0][1], fg='#ffcc66')
+            elif tab.collapsed_at(pos) is not None:
+                self.status_ai.config(text="↔ Long line collapsed - Ctrl+Shift+E expands", fg='#ffcc66')
+            else:
+                self.status_ai.config(text="🤖 AI Ready", fg='#90EE90')
         except:
             pass
 
@@ -988,34 +5546,114 @@ class CursorNotepad(tk.Tk):
             self.main_pane.add(self.sidebar, width=300)
         self.sidebar_visible = not self.sidebar_visible
 
-    def _show_completion(self):
+    def _toggle_outline(self):
+        if self.outline_visible:
+            self.main_pane.forget(self.outline)
+        else:
+            self.main_pane.add(self.outline, before=self.editor_frame, width=200)
+        self.outline_visible = not self.outline_visible
+        self._refresh_outline()
+
+    def _refresh_outline(self, event=None):
+        tab = self._get_tab()
+        if not self.outline_visible or not tab:
+            return
+        if event is not None and event.widget is not tab:
+            return
+        tab.symbols.refresh()
+        self.outline.show(tab.symbols.symbols())
+
+    def _goto_line_number(self, line, col=0):
+        tab = self._get_tab()
+        if tab:
+            index = f'{line}.{col}'
+            tab.ensure_visible(index)
+            tab.text.mark_set('insert', index)
+            tab.text.see(index)
+            tab.text.focus_set()
+
+    def _goto_symbol(self):
+        tab = self._get_tab()
+        if not tab:
+            return
+        tab.symbols.refresh()
+        symbols = tab.symbols.symbols()
+        
+        dialog = tk.Toplevel(self)
+        dialog.title("Go to Symbol")
+        dialog.geometry("360x300")
+        dialog.transient(self)
+        
+        entry = tk.Entry(dialog)
+        entry.pack(fill='x', padx=5, pady=5)
+        entry.focus_set()
+        listbox = tk.Listbox(dialog, font=("Consolas", 10))
+        listbox.pack(fill='both', expand=True, padx=5, pady=5)
+        shown = []
+        
+        def refilter(event=None):
+            query = entry.get().strip().lower()
+            shown[:] = [sym for sym in symbols if query in sym[0].lower()]
+            listbox.delete(0, 'end')
+            for name, kind, start, _, _ in shown:
+                listbox.insert('end', f"{name}  ({kind}, line {start})")
+            if shown:
+                listbox.select_set(0)
+        
+        def go(event=None):
+            selection = listbox.curselection()
+            if shown:
+                sym = shown[selection[0] if selection else 0]
+                dialog.destroy()
+                self._goto_line_number(sym[2])
+        
+        def move(step):
+            if not shown:
+                return 'break'
+            selection = listbox.curselection()
+            idx = max(0, min(len(shown) - 1, (selection[0] if selection else 0) + step))
+            listbox.select_clear(0, 'end')
+            listbox.select_set(idx)
+            listbox.see(idx)
+            return 'break'
+        
+        entry.bind('<KeyRelease>', lambda e: refilter() if e.keysym not in ('Up', 'Down', 'Return') else None)
+        entry.bind('<Return>', go)
+        entry.bind('<Down>', lambda e: move(1))
+        entry.bind('<Up>', lambda e: move(-1))
+        entry.bind('<Escape>', lambda e: dialog.destroy())
+        listbox.bind('<Double-Button-1>', go)
+        refilter()
+
+    def _show_completion(self, auto=False):
         text = self._get_text()
         if not text:
             return
         
-        # Get current word
-        pos = text.index('insert')
-        line_start = f"{pos.split('.')[0]}.0"
-        line_text = text.get(line_start, pos)
-        
         # Find prefix
-        match = re.search(r'(\w+)$', line_text)
+        match = re.search(r'(\w+)$', text.get('insert linestart', 'insert'))
         if match:
             prefix = match.group(1)
-            completions = AIAgent.get_completion(prefix)
-            
+            if auto and len(prefix) < self.AUTO_COMPLETE_CHARS:
+                return
+            started = time.perf_counter()
+            completions = self._completion_candidates(text, prefix)
+            if auto and time.perf_counter() - started > self.AUTO_COMPLETE_BUDGET:
+                return
             if completions:
-                # Get screen position
-                x, y, _, h = text.bbox('insert')
-                x += text.winfo_rootx()
-                y += text.winfo_rooty() + h
-                
-                def insert_completion(template):
-                    # Delete prefix
-                    text.delete(f"insert-{len(prefix)}c", 'insert')
-                    text.insert('insert', template)
-                
-                CompletionPopup(self, x, y, completions, insert_completion)
+                text.master.completion_popup(self._completion_candidates).show(completions, prefix)
+
+    def _completion_candidates(self, text, prefix):
+        line_text = text.get('insert linestart', 'insert')
+        context = ngram_tokens(line_text[:len(line_text) - len(prefix)])
+        return AIAgent.get_completion(prefix, context, self.ngram, budget=self.AUTO_COMPLETE_BUDGET / 2)
+
+    def _auto_complete(self, event):
+        if not self.auto_complete.get() or not (event.char.isalnum() or event.char == '_'):
+            return
+        tab = self._get_tab()
+        if tab and tab.text is event.widget and not (tab.completion and tab.completion.visible):
+            self._show_completion(auto=True)
 
     def _insert_docstring(self):
         text = self._get_text()
@@ -1034,24 +5672,46 @@ class CursorNotepad(tk.Tk):
         # Insert after current line
         text.insert('insert lineend', '\n    ' + docstring)
 
+    def _document_file(self):
+        """Add docstrings to every undocumented def/class in the current tab"""
+        text = self._get_text()
+        if not text:
+            return
+        generation = text.edit_generation
+        source = text.get('1.0', 'end-1c')
+        self.status_ai.config(text="📝 Documenting…", fg='#90EE90')
+        
+        def done(plan):
+            count, edits = plan
+            if not text.winfo_exists():
+                return
+            if text.edit_generation != generation:
+                self._document_file()
+                return
+            self._apply_edits(text, edits)
+            self.status_ai.config(text=f"📝 Added {count} docstring{'s' if count != 1 else ''}", fg='#90EE90')
+        
+        def failed(e):
+            line = getattr(e, 'lineno', None)
+            self.status_ai.config(text=f"⚠️ Cannot parse file{f' (line {line})' if line else ''}", fg='#ffcc66')
+        
+        self._run_background(lambda: AIAgent.document_file(source), done, failed)
+
     def _goto_line(self):
         dialog = tk.Toplevel(self)
         dialog.title("Go to Line")
         dialog.geometry("200x80")
         dialog.transient(self)
         
-        tk.Label(dialog, text="Line:").pack(pady=5)
+        tk.Label(dialog, text="Line[:Column]:").pack(pady=5)
         entry = tk.Entry(dialog)
         entry.pack(pady=5)
         entry.focus_set()
         
         def go():
             try:
-                line = int(entry.get())
-                text = self._get_text()
-                if text:
-                    text.mark_set('insert', f'{line}.0')
-                    text.see(f'{line}.0')
+                line, _, col = entry.get().partition(':')
+                self._goto_line_number(int(line), max(int(col or 1) - 1, 0))
                 dialog.destroy()
             except:
                 pass
@@ -1061,35 +5721,103 @@ class CursorNotepad(tk.Tk):
 
     def _show_find(self):
         dialog = tk.Toplevel(self)
-        dialog.title("Find")
-        dialog.geometry("300x80")
+        dialog.title("Find / Replace")
+        dialog.geometry("380x150")
         dialog.transient(self)
         
         frame = tk.Frame(dialog)
         frame.pack(pady=10, padx=10, fill='x')
         
-        tk.Label(frame, text="Find:").pack(side='left')
+        tk.Label(frame, text="Find:").grid(row=0, column=0, sticky='w')
         entry = tk.Entry(frame, width=25)
-        entry.pack(side='left', padx=5)
+        entry.grid(row=0, column=1, padx=5)
         entry.focus_set()
+        tk.Label(frame, text="Replace:").grid(row=1, column=0, sticky='w')
+        replace_entry = tk.Entry(frame, width=25)
+        replace_entry.grid(row=1, column=1, padx=5, pady=2)
+        
+        use_regex = tk.BooleanVar(dialog, value=False)
+        ignore_case = tk.BooleanVar(dialog, value=False)
+        options = tk.Frame(dialog)
+        options.pack(fill='x', padx=10)
+        tk.Checkbutton(options, text="Regex", variable=use_regex).pack(side='left')
+        tk.Checkbutton(options, text="Ignore case", variable=ignore_case).pack(side='left')
+        status = tk.Label(options, anchor='e')
+        status.pack(side='right', fill='x', expand=True)
         
         def find():
             pattern = entry.get()
             text = self._get_text()
             if text and pattern:
                 text.tag_remove('found', '1.0', 'end')
-                pos = text.search(pattern, 'insert+1c', stopindex='end')
-                if not pos:
-                    pos = text.search(pattern, '1.0', stopindex='insert')
-                if pos:
-                    end = f"{pos}+{len(pattern)}c"
+                try:
+                    compiled = compile_find(pattern, use_regex.get(), ignore_case.get())
+                except re.error as e:
+                    status.config(text=f"Bad pattern: {e}")
+                    return
+                # Same engine as Replace All, so both see the same matches
+                before = text.get('1.0', 'insert +1c')
+                source = before + text.get('insert +1c', 'end-1c')
+                match = compiled.search(source, len(before)) or compiled.search(source, 0, len(before))
+                if match:
+                    index = offset_indexer(source)
+                    pos, end = index(match.start()), index(match.end())
+                    text.master.ensure_visible(end)
                     text.tag_add('found', pos, end)
                     text.tag_config('found', background='yellow')
                     text.mark_set('insert', end)
                     text.see(pos)
         
+        def replace_all():
+            pattern = entry.get()
+            text = self._get_text()
+            if not text or not pattern:
+                return
+            replacement = replace_entry.get()
+            regex, nocase = use_regex.get(), ignore_case.get()
+            try:
+                compile_find(pattern, regex, nocase)
+            except re.error as e:
+                status.config(text=f"Bad pattern: {e}")
+                return
+            generation = text.edit_generation
+            source = text.get('1.0', 'end-1c')
+            status.config(text="Replacing…")
+            
+            def done(plan):
+                count, edits = plan
+                if not text.winfo_exists():
+                    return
+                if text.edit_generation != generation:
+                    replace_all()
+                    return
+                self._apply_edits(text, edits)
+                if dialog.winfo_exists():
+                    status.config(text=f"Replaced {count} occurrence{'s' if count != 1 else ''}")
+            
+            def failed(e):
+                if dialog.winfo_exists():
+                    status.config(text=f"Replace failed: {e}")
+            
+            self._run_background(lambda: plan_replace_all(source, pattern, replacement, regex, nocase),
+                                 done, failed)
+        
         entry.bind('<Return>', lambda e: find())
-        tk.Button(frame, text="Find", command=find).pack(side='left')
+        tk.Button(frame, text="Find", command=find).grid(row=0, column=2, sticky='ew')
+        tk.Button(frame, text="Replace All", command=replace_all).grid(row=1, column=2, sticky='ew')
+
+    def _apply_edits(self, text, edits):
+        """Apply bottom-up (start, end, text) edits as one undo step"""
+        if not edits:
+            return
+        insert = text.index('insert')
+        yview = text.yview()[0]
+        with text.batch():
+            for start, end, chars in edits:
+                text.replace(start, end, chars)
+        text.mark_set('insert', insert)
+        text.yview_moveto(yview)
+        text.master.modified = True
 
     def _apply_theme(self, theme):
         self.current_theme = theme
@@ -1097,6 +5825,334 @@ class CursorNotepad(tk.Tk):
             tab = self.nametowidget(tab_id)
             tab.apply_theme(theme)
         self.sidebar.apply_theme(theme)
+        self.outline.apply_theme(theme)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REPLAY HARNESS
+# ══════════════════════════════════════════════════════════════════════════════
+
+REPLAY_KEYSYMS = {
+    ' ': 'space', '\n': 'Return', '\t': 'Tab', '!': 'exclam', '"': 'quotedbl', '#': 'numbersign',
+    '$': 'dollar', '%': 'percent', '&': 'ampersand', "'": 'apostrophe', '(': 'parenleft',
+    ')': 'parenright', '*': 'asterisk', '+': 'plus', ',': 'comma', '-': 'minus', '.': 'period',
+    '/': 'slash', ':': 'colon', ';': 'semicolon', '<': 'less', '=': 'equal', '>': 'greater',
+    '?': 'question', '@': 'at', '[': 'bracketleft', '\\': 'backslash', ']': 'bracketright',
+    '^': 'asciicircum', '_': 'underscore', '`': 'grave', '{': 'braceleft', '|': 'bar',
+    '}': 'braceright', '~': 'asciitilde',
+}
+
+
+def synthetic_script(kind, seed=0):
+    """Generated replay steps: typing, paste, scroll, tabs, ai or mixed"""
+    rng = random.Random(seed)
+    with open(os.path.abspath(__file__), encoding='utf-8') as f:
+        source = f.read()
+    lines = source.split('\n')
+
+    def chunk(n):
+        start = rng.randrange(0, max(len(lines) - n, 1))
+        return '\n'.join(lines[start:start + n])
+
+    steps = []
+    if kind in ('typing', 'mixed'):
+        steps.append({'type': 'new'})
+        for _ in range(8):
+            steps.append({'type': 'text', 'text': chunk(12).replace('    ', '\t')})
+            steps.extend({'type': 'key', 'keysym': 'BackSpace'} for _ in range(rng.randint(5, 30)))
+    if kind in ('paste', 'mixed'):
+        steps.append({'type': 'new'})
+        steps.extend({'type': 'paste', 'text': chunk(rng.choice((20, 200, 2000))) + '\n'} for _ in range(20))
+    if kind in ('scroll', 'mixed'):
+        steps.append({'type': 'load', 'text': source})
+        steps.extend([{'type': 'scroll', 'units': 1}] * 300 + [{'type': 'scroll', 'units': -1}] * 300)
+    if kind in ('tabs', 'mixed'):
+        for _ in range(6):
+            steps.append({'type': 'new'})
+            steps.append({'type': 'load', 'text': chunk(rng.randint(100, 3000))})
+        steps.extend({'type': 'tab', 'index': rng.randrange(0, 6)} for _ in range(100))
+    if kind in ('ai', 'mixed'):
+        steps.append({'type': 'load', 'text': chunk(400)})
+        steps.append({'type': 'select', 'start': '1.0', 'end': 'end'})
+        for name in ('explain', 'debug', 'refactor', 'docstring') * 5:
+            steps.append({'type': 'button', 'name': name})
+    if not steps:
+        raise ValueError(f"unknown synthetic script {kind!r}")
+    return steps
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, -(-pct * len(sorted_values) // 100) - 1))
+    return sorted_values[rank]
+
+
+class ReplayHarness:
+    """Feeds scripted input to a CursorNotepad and times each event until Tk is idle again.
+
+    Every step expands into one or more actions. An action is performed
+    (mostly via event_generate, so the real bindings run) and then
+    update() drains the event queue and idle callbacks; that wall time is
+    the action's input-to-idle latency. Actions are spaced gap ms apart so
+    debounced timers and background results land between events the way
+    they do while a person types.
+    """
+
+    def __init__(self, app, steps, gap=15):
+        self.app = app
+        self.steps = steps
+        self.gap = gap
+        self.samples = collections.defaultdict(list)   # category -> [ms]
+        self.slowest = []                              # heap of (ms, category, step)
+        self.actions = None
+        self.finished = False
+        self.error = None
+        self.step = None
+
+    def run(self):
+        self.actions = self._actions()
+        self.app.after(500, self._next)
+        self.app.mainloop()
+        return self.report()
+
+    def _actions(self):
+        for i, step in enumerate(self.steps):
+            self.step = i
+            for category, action in self._expand(step):
+                yield i, category, action
+
+    def _text(self):
+        return self.app._get_text()
+
+    def _key(self, keysym, sequence=None):
+        def action():
+            text = self._text()
+            text.focus_force()
+            if sequence:
+                text.event_generate(sequence)
+            else:
+                text.event_generate('<KeyPress>', keysym=keysym)
+                text.event_generate('<KeyRelease>', keysym=keysym)
+        return action
+
+    def _expand(self, step):
+        kind = step.get('type')
+        app = self.app
+        if kind == 'text':
+            for ch in step['text']:
+                category = 'newline' if ch == '\n' else 'type'
+                if ch in REPLAY_KEYSYMS or (ch.isascii() and ch.isalnum()):
+                    yield category, self._key(REPLAY_KEYSYMS.get(ch, ch))
+                else:
+                    yield category, lambda ch=ch: self._text().insert('insert', ch)
+        elif kind == 'key':
+            yield step.get('category', step.get('keysym', 'key')).lower(), \
+                self._key(step.get('keysym'), step.get('sequence'))
+        elif kind == 'paste':
+            def paste(chars=step['text']):
+                app.clipboard_clear()
+                app.clipboard_append(chars)
+                self._text().focus_force()
+                self._text().event_generate('<<Paste>>')
+            yield 'paste', paste
+        elif kind == 'scroll':
+            units = step.get('units', 1)
+
+            def scroll():
+                text = self._text()
+                if text.tk.call('tk', 'windowingsystem') == 'x11':
+                    text.event_generate('<Button-5>' if units > 0 else '<Button-4>', x=10, y=10)
+                else:
+                    text.event_generate('<MouseWheel>', delta=-120 * units, x=10, y=10)
+            yield 'scroll', scroll
+        elif kind == 'tab':
+            def switch(index=step.get('index', 0)):
+                tabs = app.notebook.tabs()
+                if tabs:
+                    app.notebook.select(tabs[index % len(tabs)])
+            yield 'tab', switch
+        elif kind == 'button':
+            yield f"ai:{step['name']}", getattr(app.sidebar, f"btn_{step['name']}").invoke
+        elif kind == 'new':
+            yield 'new', app.new_file
+        elif kind == 'open':
+            yield 'open', lambda: app.open_path(step['path'])
+        elif kind == 'load':
+            yield 'load', lambda: app._get_tab().load_content(step['text'])
+        elif kind == 'select':
+            def select():
+                text = self._text()
+                text.tag_remove('sel', '1.0', 'end')
+                text.tag_add('sel', step.get('start', '1.0'), step.get('end', 'end'))
+            yield 'select', select
+        elif kind == 'goto':
+            yield 'goto', lambda: app._goto_line_number(step['line'], step.get('col', 0))
+        elif kind == 'wait':
+            yield None, step.get('ms', 100)
+        else:
+            raise ValueError(f"unknown replay step {kind!r}")
+
+    def _fail(self, e):
+        """Stop the run on a broken step; the report says where"""
+        log.exception("replay step %s failed", self.step)
+        self.error = f"step {self.step}: {type(e).__name__}: {e}"
+        self.app.quit()
+
+    def _next(self):
+        try:
+            index, category, action = next(self.actions)
+        except StopIteration:
+            self.finished = True
+            self.app.quit()
+            return
+        except Exception as e:
+            self._fail(e)
+            return
+        if category is None:
+            self.app.after(action, self._next)
+            return
+        started = time.perf_counter()
+        try:
+            action()
+            self.app.update()
+        except Exception as e:
+            self._fail(e)
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self.samples[category].append(elapsed)
+        entry = (elapsed, category, index)
+        if len(self.slowest) < 10:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+        self.app.after(self.gap, self._next)
+
+    def report(self):
+        categories = {}
+        for category, values in sorted(self.samples.items()):
+            values = sorted(values)
+            categories[category] = {
+                'count': len(values),
+                'mean': round(sum(values) / len(values), 3),
+                **{f'p{p}': round(percentile(values, p), 3) for p in (50, 90, 99)},
+                'max': round(values[-1], 3),
+            }
+        return {
+            'version': 1,
+            'finished': self.finished,
+            'error': self.error,
+            'python': sys.version.split()[0],
+            'tk': str(self.app.tk.call('info', 'patchlevel')),
+            'categories': categories,
+            'slowest': [{'ms': round(ms, 3), 'category': c, 'step': i}
+                        for ms, c, i in sorted(self.slowest, reverse=True)],
+        }
+
+
+def format_replay_report(report):
+    lines = [f"{'event':<16}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)"]
+    for category, s in report['categories'].items():
+        lines.append(f"{category:<16}{s['count']:>7}{s['p50']:>9.2f}{s['p90']:>9.2f}{s['p99']:>9.2f}{s['max']:>9.2f}")
+    return '\n'.join(lines)
+
+
+def compare_replay_reports(report, baseline, tolerance=1.25, floor=1.0):
+    """Categories whose p90 grew past tolerance x baseline (and by more than floor ms)"""
+    regressions = []
+    for category, stats in report['categories'].items():
+        before = baseline.get('categories', {}).get(category)
+        if before and stats['p90'] > before['p90'] * tolerance and stats['p90'] - before['p90'] > floor:
+            regressions.append(f"{category}: p90 {before['p90']:.2f} -> {stats['p90']:.2f} ms")
+    return regressions
+
+
+@contextlib.contextmanager
+def headless_display():
+    """Run a private Xvfb server for the duration of the block"""
+    xvfb = shutil.which('Xvfb')
+    if not xvfb:
+        raise RuntimeError("Xvfb not found; install it or run with an existing DISPLAY")
+    number = next(n for n in range(99, 300)
+                  if not os.path.exists(f'/tmp/.X11-unix/X{n}') and not os.path.exists(f'/tmp/.X{n}-lock'))
+    proc = subprocess.Popen([xvfb, f':{number}', '-screen', '0', '1280x800x24', '-nolisten', 'tcp'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(f'/tmp/.X11-unix/X{number}'):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"Xvfb :{number} did not start")
+            time.sleep(0.05)
+        previous = os.environ.get('DISPLAY')
+        os.environ['DISPLAY'] = f':{number}'
+        try:
+            yield f':{number}'
+        finally:
+            if previous is None:
+                os.environ.pop('DISPLAY', None)
+            else:
+                os.environ['DISPLAY'] = previous
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def replay_main(argv):
+    """catsrtxv0.py --replay SCRIPT [--report out.json] [--baseline old.json]
+
+    SCRIPT is a JSON list of steps or synthetic:KIND (typing, paste, scroll,
+    tabs, ai, mixed). Exits 1 when a category regresses against the baseline.
+    """
+    global SESSION_FILE, NGRAM_FILE
+    parser = argparse.ArgumentParser(prog='catsrtxv0.py --replay')
+    parser.add_argument('script')
+    parser.add_argument('--report', help="write the JSON report here")
+    parser.add_argument('--baseline', help="earlier report to compare p90 latencies against")
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--gap', type=int, default=15, help="ms between events")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--xvfb', action='store_true', help="use a private Xvfb even if DISPLAY is set")
+    args = parser.parse_args(argv)
+    
+    if args.script.startswith('synthetic:'):
+        steps = synthetic_script(args.script.split(':', 1)[1], args.seed)
+    else:
+        with open(args.script, encoding='utf-8') as f:
+            steps = json.load(f)
+    
+    # Keep the user's session and completion model out of the run
+    scratch = tempfile.mkdtemp(prefix='cats_replay_')
+    SESSION_FILE = os.path.join(scratch, 'session.json.gz')
+    NGRAM_FILE = os.path.join(scratch, 'ngram.bin')
+    
+    headless = args.xvfb or (sys.platform.startswith('linux') and not os.environ.get('DISPLAY'))
+    with headless_display() if headless else contextlib.nullcontext():
+        app = CursorNotepad()
+        try:
+            report = ReplayHarness(app, steps, args.gap).run()
+        finally:
+            app.shutdown_workers()
+            app.destroy()
+    shutil.rmtree(scratch, ignore_errors=True)
+    
+    print(format_replay_report(report))
+    if report['error']:
+        print(f"FAILED {report['error']}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_replay_reports(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0 if report['finished'] else 2
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1104,5 +6160,7 @@ class CursorNotepad(tk.Tk):
 # ══════════════════════════════════════════════════════════════════════════════
 
 if __name__ == "__main__":
-    app = CursorNotepad()
+    if sys.argv[1:2] == ['--replay']:
+        sys.exit(replay_main(sys.argv[2:]))
+    app = CursorNotepad(sys.argv[1:])
     app.mainloop()
@@ -0,0 +1,129 @@
+"""Display-free stand-ins for the Tk widgets the incremental indexes listen to"""
+
+import re
+
+import catsrtxv0
+
+MODIFIER = re.compile(r'\s*(?:([+-])\s*(\d+)\s*(c|chars|l|lines)?|(lineend|linestart))')
+
+
+class FakeText:
+    """A text buffer with Tk-style indices and CustomText's edit notifications.
+
+    Edits are described by the real CustomText._describe_edit before they are
+    applied, so listeners see exactly what they would see in the editor.
+    """
+
+    def __init__(self, content=''):
+        self.content = content
+        self.marks = {'insert': '1.0'}
+        self.edit_generation = 0
+        self._edit_listeners = []
+
+    add_edit_listener = catsrtxv0.CustomText.add_edit_listener
+    remove_edit_listener = catsrtxv0.CustomText.remove_edit_listener
+    _describe_edit = catsrtxv0.CustomText._describe_edit
+
+    @property
+    def lines(self):
+        return self.content.split('\n')
+
+    # Tk keeps a newline after the last line; 'end' sits just past it
+    def _offset(self, line, col):
+        lines = self.lines
+        if line > len(lines):
+            return len(self.content) + 1
+        line = max(line, 1)
+        return sum(len(text) + 1 for text in lines[:line - 1]) + min(col, len(lines[line - 1]))
+
+    def _position(self, offset):
+        offset = max(0, min(offset, len(self.content) + 1))
+        if offset > len(self.content):
+            return len(self.lines) + 1, 0
+        before = self.content[:offset]
+        return before.count('\n') + 1, offset - (before.rfind('\n') + 1)
+
+    def _resolve(self, index):
+        base = re.match(r'(\d+)\.(\d+|end)|end|insert|[\w]+', index)
+        word = base.group(0)
+        if word == 'end':
+            offset = len(self.content) + 1
+        elif base.group(1):
+            line = int(base.group(1))
+            col = len(self.lines[line - 1]) if base.group(2) == 'end' and line <= len(self.lines) \
+                else int(base.group(2)) if base.group(2) != 'end' else 0
+            offset = self._offset(line, col)
+        else:
+            offset = self._resolve(self.marks[word])
+        rest = index[base.end():]
+        while rest.strip():
+            mod = MODIFIER.match(rest)
+            sign, count, unit, anchor = mod.groups()
+            line, col = self._position(offset)
+            if anchor == 'lineend':
+                offset = self._offset(line, 10 ** 9)
+            elif anchor == 'linestart':
+                offset = self._offset(line, 0)
+            elif unit in ('l', 'lines'):
+                delta = int(count) if sign == '+' else -int(count)
+                offset = self._offset(max(1, min(line + delta, len(self.lines))), col)
+            else:
+                offset += int(count) if sign == '+' else -int(count)
+            offset = max(0, min(offset, len(self.content) + 1))
+            rest = rest[mod.end():]
+        return offset
+
+    def index(self, index):
+        line, col = self._position(self._resolve(index))
+        return f'{line}.{col}'
+
+    def _line_of(self, index):
+        return int(self.index(index).split('.')[0])
+
+    def mark_set(self, name, index):
+        self.marks[name] = self.index(index)
+
+    def get(self, start, end=None):
+        a = min(self._resolve(start), len(self.content))
+        if end is None:
+            return self.content[a:a + 1]
+        return self.content[a:min(self._resolve(end), len(self.content))]
+
+    # edits go through the same describe -> apply -> notify order as CustomText._proxy
+    def _edit(self, args, a, b, chars=''):
+        edit = self._describe_edit(args)
+        end = len(self.content)
+        a, b = min(a, end), max(min(b, end), min(a, end))
+        insert = self._resolve('insert')
+        if insert >= b:
+            insert -= b - a
+        elif insert > a:
+            insert = a
+        if insert >= a:
+            insert += len(chars)     # the insert mark has right gravity
+        self.content = self.content[:a] + chars + self.content[b:]
+        self.marks['insert'] = self.index(f'1.0+{insert}c')
+        self.edit_generation += 1
+        for callback in self._edit_listeners:
+            callback(*edit)
+
+    def insert(self, index, chars):
+        at = self._resolve(index)
+        self._edit(('insert', index, chars), at, at, chars)
+
+    def delete(self, start, end=None):
+        a = self._resolve(start)
+        b = a + 1 if end is None else self._resolve(end)
+        self._edit(('delete', start) if end is None else ('delete', start, end), a, b)
+
+    def replace(self, start, end, chars):
+        self._edit(('replace', start, end, chars), self._resolve(start), self._resolve(end), chars)
+
+    def backspace(self):
+        """What Tk's <BackSpace> binding sends with no selection"""
+        if self.index('insert') != '1.0':
+            self.delete('insert-1c')
+
+    def delete_forward(self):
+        """What Tk's <Delete> binding sends with no selection"""
+        self.delete('insert')
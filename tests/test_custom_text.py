@@ -0,0 +1,55 @@
+import pytest
+
+import catsrtxv0
+from fakes import FakeText
+
+SOURCE = "def f(a,\n      b):\n    return [a,\n            b]\n\nx = 1\ny = 2"
+
+
+def recorded(text):
+    edits = []
+    text.add_edit_listener(lambda *edit: edits.append(edit))
+    return edits
+
+
+@pytest.mark.parametrize('args, edit', [
+    (('insert', '2.0', 'x\ny\n'), (2, 0, 2)),
+    (('delete', '2.0', '4.0'), (2, 2, 0)),
+    (('delete', '2.3'), (2, 0, 0)),
+    (('delete', '2.end'), (2, 1, 0)),
+    (('delete', '3.0-1c'), (2, 1, 0)),
+    (('delete', 'end-1c'), (7, 0, 0)),
+    (('replace', '1.0', '3.0', 'z'), (1, 2, 0)),
+])
+def test_describe_edit(args, edit):
+    assert FakeText(SOURCE)._describe_edit(args) == edit
+
+
+def test_backspace_at_line_start_joins_lines():
+    text = FakeText(SOURCE)
+    edits = recorded(text)
+    brackets = catsrtxv0.BracketIndex(text)
+    folding = catsrtxv0.FoldIndex(text, brackets)
+    brackets.flush()
+    folding.flush()
+    text.mark_set('insert', '3.0')
+    text.backspace()
+    assert edits == [(2, 1, 0)]
+    assert len(text.lines) == 6
+    brackets.flush()
+    folding.flush()
+    assert len(folding.indents) == 6
+    assert brackets.match(2, 20) == (3, 13, ']')
+
+
+def test_delete_at_line_end_joins_lines():
+    text = FakeText(SOURCE)
+    edits = recorded(text)
+    brackets = catsrtxv0.BracketIndex(text)
+    brackets.flush()
+    text.mark_set('insert', '5.0')
+    text.delete_forward()
+    assert edits == [(5, 1, 0)]
+    assert text.lines[4] == 'x = 1'
+    assert brackets.match(1, 5) == (2, 7, ')')
+    assert brackets.match(3, 11) == (4, 13, ']')
@@ -0,0 +1,95 @@
+import random
+
+import catsrtxv0
+from fakes import FakeText
+
+PYTHON = '''class A:
+    """doc
+text at col 0
+"""
+    def f(self, a,
+b):
+        x = [
+            1,
+        ]
+        return x
+
+    # comment
+    def g(self):
+        pass
+d = {
+    'a': [
+        1,
+    ],
+}
+'''
+
+C = 'int main() {\n  if (x) {\n    y();\n  } else {\n    z(1,\n      2);\n  }\n}\n'
+
+
+def fold_index(source, mode='python'):
+    text = FakeText(source)
+    brackets = catsrtxv0.BracketIndex(text)
+    brackets.mode = mode
+    return text, catsrtxv0.FoldIndex(text, brackets)
+
+
+def assert_consistent(text, folding):
+    regions = folding.regions()
+    _, fresh = fold_index(text.content, folding.brackets.mode)
+    assert regions == fresh.regions()
+    headers = {header: (header, end) for header, end, _ in regions}
+    folding._cache = None
+    for line in range(1, len(text.lines) + 1):
+        assert folding.region_at(line) == headers.get(line), line
+
+
+def test_indent_regions():
+    text, folding = fold_index(PYTHON)
+    assert folding.regions() == [(1, 14, 0), (2, 4, 1), (5, 10, 1), (7, 9, 2), (13, 14, 1),
+                                 (15, 19, 0), (16, 18, 1)]
+    assert_consistent(text, folding)
+
+
+def test_bracket_regions():
+    text, folding = fold_index(C, 'c')
+    assert folding.regions() == [(1, 7, 0), (2, 3, 1), (4, 6, 1)]
+    assert [folding.region_at(n) for n in range(1, 5)] == [(1, 7), (2, 3), None, (4, 6)]
+
+
+def test_unclosed_bracket_does_not_swallow_the_file():
+    text, folding = fold_index("def a():\n    x = foo(\n    return 1\n\ndef b():\n    if y:\n        z()\n    w = 2\n")
+    assert folding.regions() == [(1, 3, 0), (5, 8, 0), (6, 7, 1)]
+    assert_consistent(text, folding)
+
+
+def test_levels_match_enclosing():
+    text, folding = fold_index("f(a,\n  g(b,\n  c\n)\nh(\n  [1,\n   2]\n")
+    folding.flush()
+    folding.brackets.flush()
+    assert folding._levels() == [folding._level(n) for n in range(1, len(text.lines) + 1)]
+
+
+def test_regions_are_cached_until_the_next_edit():
+    text, folding = fold_index(PYTHON)
+    first = folding.regions()
+    assert folding._cached()[1] == first
+    text.insert('14.0', '        more()\n')
+    assert folding._cached() is None
+    assert folding.regions()[4] == (13, 15, 1)
+
+
+def test_random_edits_match_a_rebuild():
+    rng = random.Random(3)
+    pieces = ['x = (', ')', '"""', 'if y:', 'def f():', '', '# c', ']', 'd = [']
+    text, folding = fold_index(PYTHON * 3)
+    for _ in range(60):
+        line = rng.randint(1, len(text.lines))
+        if rng.random() < 0.3 and len(text.lines) > 2:
+            text.mark_set('insert', f'{line}.0')
+            text.backspace()
+        else:
+            text.insert(f'{line}.0', '    ' * rng.randint(0, 3) + rng.choice(pieces) + '\n')
+        if rng.random() < 0.3:
+            assert_consistent(text, folding)
+    assert_consistent(text, folding)
@@ -0,0 +1,167 @@
+"""Incremental indexes after random edits must agree with ones built from scratch"""
+
+import random
+
+import pytest
+
+import catsrtxv0
+from fakes import FakeText
+
+SOURCE = '''import os
+
+
+class A:
+    def f(self, a,
+          b):
+        return [a,
+                b]
+
+    async def g(self):
+        def inner():
+            pass
+        return inner
+
+
+def top():
+    """doc (
+    """
+    return {'k': (1, 2)}
+'''
+
+PIECES = ['def h():', '    x = (', ')', ']', 'class B:', '        return 1', '"""', '# c', '', 'y = [1,', '    pass']
+
+
+def random_edit(rng, text):
+    line = rng.randint(1, len(text.lines))
+    roll = rng.random()
+    if roll < 0.25 and len(text.lines) > 3:
+        text.mark_set('insert', f'{line}.0')
+        text.backspace()
+    elif roll < 0.4:
+        text.mark_set('insert', f'{line}.end')
+        text.delete_forward()
+    elif roll < 0.55 and line < len(text.lines):
+        text.delete(f'{line}.0', f'{line + 1}.0 lineend')
+    elif roll < 0.7:
+        text.replace(f'{line}.0', f'{line}.end', rng.choice(PIECES))
+    else:
+        text.insert(f'{line}.0', '\n'.join(rng.choice(PIECES) for _ in range(rng.randint(1, 3))) + '\n')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_symbol_index_matches_rebuild(seed):
+    rng = random.Random(seed)
+    text = FakeText(SOURCE * 2)
+    symbols = catsrtxv0.SymbolIndex(text)
+    symbols.refresh()
+    for step in range(80):
+        random_edit(rng, text)
+        if rng.random() < 0.3:
+            symbols.refresh()
+            fresh = catsrtxv0.SymbolIndex(FakeText(text.content))
+            fresh.refresh()
+            assert symbols.symbols() == fresh.symbols(), step
+            for line in range(1, len(text.lines) + 1, 3):
+                assert symbols.symbol_at(line) == fresh.symbol_at(line)
+
+
+def test_symbol_index_nesting():
+    symbols = catsrtxv0.SymbolIndex(FakeText(SOURCE))
+    symbols.refresh()
+    assert [(name, kind, start, end, depth) for name, kind, start, end, depth in symbols.symbols()] == [
+        ('A', 'class', 4, 13, 0), ('A.f', 'def', 5, 8, 1), ('A.g', 'def', 10, 13, 1),
+        ('A.g.inner', 'def', 11, 12, 2), ('top', 'def', 16, 19, 0)]
+    assert symbols.symbol_at(12)[0] == 'A.g.inner'
+    assert symbols.symbol_at(2) is None
+
+
+def all_brackets(index, lines):
+    return [(n, col) for n in range(1, lines + 1) for col, _ in index.line(n)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_bracket_index_matches_rebuild(seed, monkeypatch):
+    monkeypatch.setattr(catsrtxv0.BracketIndex, 'CHUNK', 4)
+    rng = random.Random(seed)
+    text = FakeText(SOURCE * 2)
+    brackets = catsrtxv0.BracketIndex(text)
+    brackets.flush()
+    for step in range(80):
+        random_edit(rng, text)
+        if rng.random() < 0.3:
+            fresh = catsrtxv0.BracketIndex(FakeText(text.content))
+            positions = all_brackets(fresh, len(text.lines))
+            assert all_brackets(brackets, len(text.lines)) == positions, step
+            for line, col in positions:
+                assert brackets.match(line, col) == fresh.match(line, col)
+                assert brackets.enclosing(line, col) == fresh.enclosing(line, col)
+
+
+class FakeTab:
+    """Just enough of EditorTab and the app for TabDiff: timers are dropped, work runs inline"""
+
+    def __init__(self, text):
+        self.text = text
+        self.filename = None
+        self.marks = {}
+
+    def after(self, ms, callback):
+        return 'job'
+
+    def after_cancel(self, job):
+        pass
+
+    def winfo_toplevel(self):
+        return self
+
+    def _run_background(self, work, done, error=None):
+        done(work())
+
+    def set_gutter_marks(self, kind, marks):
+        self.marks[kind] = marks
+
+
+def apply_opcodes(opcodes, a, b):
+    """Rebuild b from a and the opcodes, checking the equal runs really are equal"""
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_tab_diff_window_keeps_opcodes_valid(seed):
+    rng = random.Random(seed)
+    text = FakeText(SOURCE * 3)
+    tab = FakeTab(text)
+    diff = catsrtxv0.TabDiff(tab)
+    diff.set_base_from_buffer()
+    diff.run()
+    base = text.lines
+    for step in range(40):
+        for _ in range(rng.randint(1, 3)):
+            random_edit(rng, text)
+        diff.run()
+        assert diff.cur_ids == catsrtxv0.hash_lines(text.content), step
+        current = text.lines
+        assert apply_opcodes(diff.opcodes, base, current) == current
+        for op, following in zip(diff.opcodes, diff.opcodes[1:]):
+            assert (op[2], op[4]) == (following[1], following[3])
+            assert not op[0] == following[0] == 'equal'
+
+def test_tab_diff_ignores_a_result_for_a_replaced_base():
+    text = FakeText('a\nb\nc')
+    tab = FakeTab(text)
+    diff = catsrtxv0.TabDiff(tab)
+    diff.set_base('a\nb\nc')
+    pending = []
+    tab._run_background = lambda work, done, error=None: pending.append((work, done))
+    diff.run()
+    diff.set_base('x\ny')
+    work, done = pending.pop()
+    done(work())
+    assert diff.opcodes == [] and diff.full
@@ -0,0 +1,103 @@
+import gzip
+import random
+import re
+
+import pytest
+
+import catsrtxv0
+from fakes import FakeText
+
+
+def lcs_length(a, b):
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            prev, row[j + 1] = row[j + 1], prev + 1 if x == y else max(row[j + 1], row[j])
+    return row[-1]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_diff_sequences_is_minimal(seed):
+    rng = random.Random(seed)
+    a = [rng.randint(0, 4) for _ in range(rng.randint(0, 40))]
+    b = [rng.randint(0, 4) for _ in range(rng.randint(0, 40))]
+    opcodes = catsrtxv0.diff_sequences(a, b)
+    out, i, j = [], 0, 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+        out.extend(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b)) and out == b
+    assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') == lcs_length(a, b)
+
+
+def test_diff_sequences_timeout_still_covers_everything():
+    a, b = list(range(300)), list(range(300, 0, -1))
+    opcodes = catsrtxv0.diff_sequences(a, b, timeout=0)
+    assert opcodes[0][1::2] == (0, 0) and opcodes[-1][2::2] == (300, 300)
+
+
+def replace_all(source, *args, **kwargs):
+    """Apply plan_replace_all's edits the way the editor does: bottom-up on the buffer"""
+    count, edits = catsrtxv0.plan_replace_all(source, *args, **kwargs)
+    text = FakeText(source)
+    for start, end, replacement in edits:
+        text.replace(start, end, replacement)
+    return count, edits, text.content
+
+
+SOURCE = "foo = 1\nbar(foo)\n\nfoo.foo()\nbaz\nFOO\nfoo"
+
+
+@pytest.mark.parametrize('max_edits', [200, 2])
+def test_replace_all_matches_re_sub(max_edits):
+    count, _, result = replace_all(SOURCE, 'foo', 'quux', max_edits=max_edits)
+    assert (count, result) == (5, SOURCE.replace('foo', 'quux'))
+    count, _, result = replace_all(SOURCE, r'(\w+)\((\w*)\)', r'\2<\1>', regex=True, max_edits=max_edits)
+    assert result == re.sub(r'(\w+)\((\w*)\)', r'\2<\1>', SOURCE, flags=re.M)
+    count, _, result = replace_all(SOURCE, 'foo', 'x', ignore_case=True, max_edits=max_edits)
+    assert count == 6 and 'FOO' not in result
+
+
+def test_replace_all_past_the_limit_edits_runs_of_lines():
+    count, edits, _ = replace_all(SOURCE, 'foo', 'x', max_edits=2)
+    # lines 1-2 form one run; the blank line 3 and lines 5-6 leave 4 and 7 on their own
+    assert count == 5
+    assert [start for start, _, _ in edits] == ['7.0', '4.0', '1.0']
+
+
+def test_replace_all_multiline_and_bad_pattern():
+    assert replace_all("a\nb\na\nb", r'a\nb', 'c', regex=True)[2] == "c\nc"
+    with pytest.raises(re.error):
+        catsrtxv0.plan_replace_all(SOURCE, '(', 'x', regex=True)
+    assert catsrtxv0.plan_replace_all(SOURCE, 'nothing', 'x') == (0, [])
+
+
+def test_session_round_trip(tmp_path):
+    store = catsrtxv0.SessionStore(str(tmp_path / 'session.json.gz'))
+    assert store.load() is None
+    data = {'tabs': [{'path': '/x.py', 'cursor': '3.4', 'yview': 0.5},
+                     {'path': None, 'cursor': '1.0', 'yview': 0, 'content': 'draft ✓'}],
+            'active': 1, 'persist_undo': False}
+    store.save(data)
+    assert store.load() == dict(data, version=catsrtxv0.SessionStore.VERSION)
+    with gzip.open(store.path, 'wt') as f:
+        f.write('{"version": 0}')
+    assert store.load() is None
+    (tmp_path / 'session.json.gz').write_bytes(b'not gzip')
+    assert store.load() is None
+
+
+class PendingTab:
+    loaded = False
+    pending_state = {'path': '/x.py', 'cursor': '2.0', 'yview': 0, 'undo': {'steps': []}}
+
+
+def test_unloaded_tab_snapshot_honours_persist_undo():
+    tab = PendingTab()
+    assert 'undo' not in catsrtxv0.EditorTab.snapshot(tab)
+    assert catsrtxv0.EditorTab.snapshot(tab, undo=True)['undo'] == {'steps': []}
+    assert 'undo' in tab.pending_state